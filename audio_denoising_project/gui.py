@@ -10,15 +10,17 @@ from tkinter import ttk, filedialog, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
-import sounddevice as sd
 import soundfile as sf
 from pathlib import Path
-import threading
 import time
 
 from utils.analysis import plot_time_domain, plot_frequency_domain, plot_comparison, calculate_snr
 from utils.noise import add_gaussian_noise, add_narrowband_noise, add_single_frequency_interference
-from utils.filters import design_lowpass_filter, design_bandpass_filter, design_notch_filter
+from utils.filters import (design_lowpass_filter, design_bandpass_filter, design_notch_filter,
+                           AdaptiveNoiseCanceller)
+from utils.audio_io import ConcurrentAudioWriter
+from utils.denoise import spectral_denoise
+from utils.playback import PlaybackEngine
 
 class AudioDenoisingGUI:
     """音频降噪GUI界面"""
@@ -35,6 +37,15 @@ class AudioDenoisingGUI:
         self.noisy_signals = {}
         self.filtered_signals = {}
         
+        # 自适应噪声抵消: 参考录音和抵消器 (多次运行之间保留权值)
+        self.reference_data = None
+        self.canceller = None
+        
+        # 播放引擎 (首次播放时创建) 和正在播放的版本组
+        self.player = None
+        self._player_tracks = None
+        self._polling = False
+        
         # 创建界面
         self.create_widgets()
         
@@ -112,6 +123,21 @@ class AudioDenoisingGUI:
                   command=lambda: self.apply_filter('bandpass')).pack(fill=tk.X, pady=2)
         ttk.Button(filter_frame, text="应用陷波滤波器", 
                   command=lambda: self.apply_filter('notch')).pack(fill=tk.X, pady=2)
+        ttk.Button(filter_frame, text="谱减法降噪", 
+                  command=lambda: self.apply_denoiser('spectral_subtraction')).pack(fill=tk.X, pady=2)
+        ttk.Button(filter_frame, text="Log-MMSE降噪", 
+                  command=lambda: self.apply_denoiser('log_mmse')).pack(fill=tk.X, pady=2)
+        
+        # 自适应噪声抵消
+        anc_frame = ttk.LabelFrame(control_frame, text="自适应降噪", padding="5")
+        anc_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Button(anc_frame, text="加载参考噪声录音", command=self.load_reference_file).pack(fill=tk.X, pady=2)
+        ttk.Label(anc_frame, text="步长 mu:").pack(anchor=tk.W)
+        self.anc_mu_var = tk.StringVar(value="0.5")
+        ttk.Entry(anc_frame, textvariable=self.anc_mu_var, width=10).pack(fill=tk.X, pady=2)
+        ttk.Button(anc_frame, text="运行自适应降噪", 
+                  command=self.run_adaptive_cancellation).pack(fill=tk.X, pady=2)
         
         # 音频播放
         play_frame = ttk.LabelFrame(control_frame, text="音频播放", padding="5")
@@ -123,6 +149,20 @@ class AudioDenoisingGUI:
                   command=lambda: self.play_audio('noisy')).pack(fill=tk.X, pady=2)
         ttk.Button(play_frame, text="播放滤波后音频", 
                   command=lambda: self.play_audio('filtered')).pack(fill=tk.X, pady=2)
+        ttk.Button(play_frame, text="依次播放全部", 
+                  command=self.play_all).pack(fill=tk.X, pady=2)
+        
+        control_row = ttk.Frame(play_frame)
+        control_row.pack(fill=tk.X, pady=2)
+        ttk.Button(control_row, text="暂停/继续", 
+                  command=self.toggle_pause).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        ttk.Button(control_row, text="停止", 
+                  command=self.stop_playback).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        
+        # 播放进度 (拖动跳转)
+        self.seek_var = tk.DoubleVar(value=0.0)
+        ttk.Scale(play_frame, from_=0.0, to=1.0, orient=tk.HORIZONTAL, variable=self.seek_var,
+                  command=self.seek_playback).pack(fill=tk.X, pady=2)
         
         # 分析功能
         analysis_frame = ttk.LabelFrame(control_frame, text="信号分析", padding="5")
@@ -173,6 +213,71 @@ class AudioDenoisingGUI:
             except Exception as e:
                 messagebox.showerror("错误", f"加载文件失败: {e}")
     
+    def load_reference_file(self):
+        """加载参考噪声录音"""
+        file_path = filedialog.askopenfilename(
+            title="选择参考噪声录音",
+            filetypes=[("WAV files", "*.wav"), ("All files", "*.*")]
+        )
+        
+        if file_path:
+            try:
+                reference, reference_rate = sf.read(file_path)
+                if self.sample_rate is not None and reference_rate != self.sample_rate:
+                    raise ValueError(f"采样率 {reference_rate}Hz 与音频 {self.sample_rate}Hz 不一致")
+                self.reference_data = reference.mean(axis=1) if reference.ndim > 1 else reference
+                self.status_var.set(f"已加载参考录音: {Path(file_path).name}")
+            except Exception as e:
+                messagebox.showerror("错误", f"加载参考录音失败: {e}")
+    
+    def run_adaptive_cancellation(self):
+        """运行自适应噪声抵消 (再次运行时从上次的权值继续收敛)"""
+        if self.audio_data is None:
+            messagebox.showwarning("警告", "请先加载音频文件")
+            return
+        
+        try:
+            mu = float(self.anc_mu_var.get())
+            if self.reference_data is not None:
+                primary = self.audio_data.mean(axis=1) if self.audio_data.ndim > 1 else self.audio_data
+                reference = self.reference_data
+            elif self.audio_data.ndim > 1 and self.audio_data.shape[1] >= 2:
+                # 没有参考录音时, 第1声道为主通道, 第2声道为参考通道
+                primary, reference = self.audio_data[:, 0], self.audio_data[:, 1]
+            else:
+                messagebox.showwarning("警告", "请先加载参考噪声录音, 或使用双声道 (主通道+参考通道) 音频")
+                return
+            
+            if self.canceller is None or self.canceller.mu != mu or self.canceller.sample_rate != self.sample_rate:
+                self.canceller = AdaptiveNoiseCanceller(mu=mu, sample_rate=self.sample_rate)
+            
+            self.filtered_signals['adaptive'] = self.canceller.run(primary, reference)
+            metrics = self.canceller.metrics()
+            convergence = metrics['convergence_time']
+            self.status_var.set(
+                f"自适应降噪完成: 残余功率 {metrics['final_error_db']:.1f}dB, "
+                f"收敛时间 {'未知' if convergence is None else f'{convergence:.2f}秒'}, "
+                f"速度 {metrics['realtime_factor']:.0f}倍实时"
+            )
+            self.plot_filtered_signal('adaptive')
+            
+        except ValueError as e:
+            messagebox.showerror("错误", f"参数错误: {e}")
+        except Exception as e:
+            messagebox.showerror("错误", f"自适应降噪失败: {e}")
+    
+    def _compute_noise(self, noise_type, noise_func, random=True, **params):
+        """添加噪声; 处理器启用了缓存时复用之前的结果"""
+        if self.processor is not None:
+            return self.processor.compute_noise(self.audio_data, noise_type, noise_func, random, **params)
+        return noise_func(self.audio_data, **params)
+    
+    def _filter(self, filter_obj, signal_data, noise_type):
+        """应用滤波器; 处理器启用了缓存时复用之前的结果 (整段处理, 处理器的有声段只对应它自己的音频)"""
+        if self.processor is not None:
+            return self.processor.filter_cached(filter_obj, signal_data, f"noisy/{noise_type}")
+        return filter_obj.filter(signal_data)
+    
     def add_noise(self, noise_type):
         """添加噪声"""
         if self.audio_data is None:
@@ -182,21 +287,25 @@ class AudioDenoisingGUI:
         try:
             if noise_type == 'gaussian':
                 snr = float(self.gaussian_snr_var.get())
-                self.noisy_signals['gaussian'] = add_gaussian_noise(self.audio_data, snr)
+                self.noisy_signals['gaussian'] = self._compute_noise(
+                    'gaussian', add_gaussian_noise, snr_db=snr
+                )
                 self.status_var.set(f"已添加高斯白噪声 (SNR: {snr}dB)")
                 
             elif noise_type == 'narrowband':
                 low_freq = float(self.low_freq_var.get())
                 high_freq = float(self.high_freq_var.get())
-                self.noisy_signals['narrowband'] = add_narrowband_noise(
-                    self.audio_data, self.sample_rate, low_freq, high_freq
+                self.noisy_signals['narrowband'] = self._compute_noise(
+                    'narrowband', add_narrowband_noise,
+                    sample_rate=self.sample_rate, low_freq=low_freq, high_freq=high_freq
                 )
                 self.status_var.set(f"已添加窄带噪声 ({low_freq}-{high_freq}Hz)")
                 
             elif noise_type == 'single_freq':
                 freq = float(self.single_freq_var.get())
-                self.noisy_signals['single_freq'] = add_single_frequency_interference(
-                    self.audio_data, self.sample_rate, freq
+                self.noisy_signals['single_freq'] = self._compute_noise(
+                    'single_freq', add_single_frequency_interference, random=False,
+                    sample_rate=self.sample_rate, frequency=freq
                 )
                 self.status_var.set(f"已添加单频干扰 ({freq}Hz)")
             
@@ -217,17 +326,17 @@ class AudioDenoisingGUI:
             if filter_type == 'lowpass':
                 filter_obj = design_lowpass_filter(3000, self.sample_rate)
                 for noise_type, noisy_signal in self.noisy_signals.items():
-                    self.filtered_signals[f"{noise_type}_lowpass"] = filter_obj.filter(noisy_signal)
+                    self.filtered_signals[f"{noise_type}_lowpass"] = self._filter(filter_obj, noisy_signal, noise_type)
                     
             elif filter_type == 'bandpass':
                 filter_obj = design_bandpass_filter(200, 8000, self.sample_rate)
                 for noise_type, noisy_signal in self.noisy_signals.items():
-                    self.filtered_signals[f"{noise_type}_bandpass"] = filter_obj.filter(noisy_signal)
+                    self.filtered_signals[f"{noise_type}_bandpass"] = self._filter(filter_obj, noisy_signal, noise_type)
                     
             elif filter_type == 'notch':
                 filter_obj = design_notch_filter(1500, self.sample_rate)
                 for noise_type, noisy_signal in self.noisy_signals.items():
-                    self.filtered_signals[f"{noise_type}_notch"] = filter_obj.filter(noisy_signal)
+                    self.filtered_signals[f"{noise_type}_notch"] = self._filter(filter_obj, noisy_signal, noise_type)
             
             self.status_var.set(f"已应用{filter_type}滤波器")
             self.plot_filtered_signal(filter_type)
@@ -235,32 +344,138 @@ class AudioDenoisingGUI:
         except Exception as e:
             messagebox.showerror("错误", f"应用滤波器失败: {e}")
     
+    def _denoise(self, signal_data, noise_type, method):
+        """谱降噪; 处理器启用了缓存时复用之前的结果"""
+        if self.processor is not None:
+            return self.processor.denoise_cached(signal_data, f"noisy/{noise_type}", method,
+                                                 sample_rate=self.sample_rate)
+        return spectral_denoise(signal_data, self.sample_rate, method)
+    
+    def apply_denoiser(self, method):
+        """应用谱降噪 (谱减法或 Log-MMSE)"""
+        if not self.noisy_signals:
+            messagebox.showwarning("警告", "请先添加噪声")
+            return
+        
+        try:
+            for noise_type, noisy_signal in self.noisy_signals.items():
+                self.filtered_signals[f"{noise_type}_{method}"] = self._denoise(noisy_signal, noise_type, method)
+            
+            self.status_var.set(f"已应用{method}降噪")
+            self.plot_filtered_signal(method)
+            
+        except Exception as e:
+            messagebox.showerror("错误", f"谱降噪失败: {e}")
+    
+    def _playback_tracks(self):
+        """当前可对比播放的版本: 原始、第一个带噪信号、第一个滤波后信号"""
+        tracks = {}
+        if self.audio_data is not None:
+            tracks['original'] = self.audio_data
+        if self.noisy_signals:
+            tracks['noisy'] = next(iter(self.noisy_signals.values()))
+        if self.filtered_signals:
+            tracks['filtered'] = next(iter(self.filtered_signals.values()))
+        return tracks
+    
+    def _get_player(self):
+        """获取播放引擎 (采样率或声道数变化时重新创建)"""
+        channels = 1 if self.audio_data.ndim == 1 else self.audio_data.shape[1]
+        if self.player is not None and (self.player.sample_rate != self.sample_rate
+                                        or self.player.channels not in (None, channels)):
+            self.player.close()
+            self.player = None
+        if self.player is None:
+            self.player = PlaybackEngine(self.sample_rate, channels=channels)
+            self._player_tracks = None
+        return self.player
+    
     def play_audio(self, audio_type):
-        """播放音频"""
-        if audio_type == 'original' and self.audio_data is not None:
-            self.play_audio_thread(self.audio_data, "原始音频")
-        elif audio_type == 'noisy' and self.noisy_signals:
-            # 播放第一个带噪信号
-            noise_type = list(self.noisy_signals.keys())[0]
-            self.play_audio_thread(self.noisy_signals[noise_type], f"{noise_type}噪声音频")
-        elif audio_type == 'filtered' and self.filtered_signals:
-            # 播放第一个滤波后信号
-            filter_type = list(self.filtered_signals.keys())[0]
-            self.play_audio_thread(self.filtered_signals[filter_type], f"{filter_type}滤波后音频")
-        else:
+        """播放音频 (正在播放同一组音频时只切换版本, 保持播放位置)"""
+        tracks = self._playback_tracks()
+        if audio_type not in tracks:
+            messagebox.showwarning("警告", "没有可播放的音频")
+            return
+        
+        try:
+            player = self._get_player()
+            same_tracks = (player.current_label == "对比播放" and self._player_tracks is not None
+                           and self._player_tracks.keys() == tracks.keys()
+                           and all(self._player_tracks[name] is data for name, data in tracks.items()))
+            if same_tracks:
+                player.select(audio_type)
+            else:
+                player.play(tracks, audio_type, label="对比播放")
+                self._player_tracks = tracks
+        except Exception as e:
+            messagebox.showerror("错误", f"播放失败: {e}")
+            return
+        self._poll_playback()
+    
+    def play_all(self):
+        """原始、带噪、滤波后音频依次无缝播放"""
+        if self.audio_data is None:
             messagebox.showwarning("警告", "没有可播放的音频")
+            return
+        
+        try:
+            player = self._get_player()
+            player.stop()
+            player.enqueue(self.audio_data, "原始音频")
+            for noise_type, noisy_signal in self.noisy_signals.items():
+                player.enqueue(noisy_signal, f"{noise_type}噪声音频")
+            for filter_type, filtered_signal in self.filtered_signals.items():
+                player.enqueue(filtered_signal, f"{filter_type}滤波后音频")
+            player.start()
+            self._player_tracks = None
+        except Exception as e:
+            messagebox.showerror("错误", f"播放失败: {e}")
+            return
+        self._poll_playback()
     
-    def play_audio_thread(self, audio_data, description):
-        """在独立线程中播放音频"""
-        def play():
-            self.status_var.set(f"正在播放: {description}")
-            sd.play(audio_data, self.sample_rate)
-            sd.wait()
-            self.status_var.set("播放完成")
-        
-        thread = threading.Thread(target=play)
-        thread.daemon = True
-        thread.start()
+    def toggle_pause(self):
+        """暂停或继续播放"""
+        if self.player is None:
+            return
+        if self.player.paused:
+            self.player.resume()
+        else:
+            self.player.pause()
+    
+    def stop_playback(self):
+        """停止播放"""
+        if self.player is not None:
+            self.player.stop()
+    
+    def seek_playback(self, value):
+        """拖动进度条跳转"""
+        if self.player is not None and self.player.duration > 0:
+            self.player.seek(float(value) * self.player.duration)
+    
+    def _poll_playback(self):
+        """定时刷新播放状态和进度条"""
+        if self._polling:
+            return
+        self._polling = True
+        
+        def update():
+            player = self.player
+            if player is None or player.current_label is None:
+                self._polling = False
+                self.seek_var.set(0.0)
+                self.status_var.set("播放完成")
+                return
+            
+            description = player.current_label
+            if len(player.variants) > 1:
+                description += f" [{player.selected}]"
+            state = "已暂停" if player.paused else "正在播放"
+            self.status_var.set(f"{state}: {description} {player.position:.1f}/{player.duration:.1f} 秒")
+            if player.duration > 0:
+                self.seek_var.set(player.position / player.duration)
+            self.root.after(200, update)
+        
+        update()
     
     def plot_original_signal(self):
         """绘制原始信号"""
@@ -393,9 +608,14 @@ class AudioDenoisingGUI:
         save_dir = filedialog.askdirectory(title="选择保存目录")
         if save_dir:
             try:
-                for name, signal_data in self.filtered_signals.items():
-                    file_path = Path(save_dir) / f"{name}_filtered.wav"
-                    sf.write(str(file_path), signal_data, self.sample_rate)
+                # 在后台线程中逐块写入各文件
+                with ConcurrentAudioWriter() as writer:
+                    for name, signal_data in self.filtered_signals.items():
+                        file_path = Path(save_dir) / f"{name}_filtered.wav"
+                        writer.submit(str(file_path), signal_data, self.sample_rate)
+                    errors = [error for _, error in writer.wait() if error is not None]
+                if errors:
+                    raise errors[0]
                 
                 self.status_var.set(f"结果已保存到: {save_dir}")
                 messagebox.showinfo("成功", "处理结果已保存")
@@ -405,4 +625,8 @@ class AudioDenoisingGUI:
     
     def run(self):
         """运行GUI"""
-        self.root.mainloop() 
\ No newline at end of file
+        try:
+            self.root.mainloop()
+        finally:
+            if self.player is not None:
+                self.player.close() 
\ No newline at end of file
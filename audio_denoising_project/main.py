@@ -5,28 +5,100 @@
 实现音频信号采集、噪声添加、滤波处理和GUI界面展示
 """
 
+import json
 import numpy as np
 import soundfile as sf
-import sounddevice as sd
-import matplotlib.pyplot as plt
 import os
+import time
+import zlib
 from pathlib import Path
 
 from utils.noise import add_gaussian_noise, add_narrowband_noise, add_single_frequency_interference
-from utils.filters import design_lowpass_filter, design_bandpass_filter, design_notch_filter
-from utils.analysis import plot_time_domain, plot_frequency_domain, plot_filter_response
-from gui import AudioDenoisingGUI
+from utils.filters import (design_lowpass_filter, design_bandpass_filter, design_notch_filter,
+                           AdaptiveNoiseCanceller)
+from utils.analysis import (plot_time_domain, plot_frequency_domain, plot_filter_response, plot_spectrogram,
+                            calculate_snr, calculate_psnr)
+from utils.shared import SharedAudioArray, map_channels
+from utils.response import filter_key
+from utils.audio_io import ConcurrentAudioWriter
+from utils.cache import ResultCache
+from utils.playback import PlaybackEngine
+from utils.vad import detect_voice_activity
+from utils.pcm import load_pcm
+from utils.batch import BatchRunner, CausalFilterStage
+from utils.store import MetricsStore
+from utils.denoise import DENOISE_METHODS, SpectralDenoiser, spectral_denoise
+
+# 噪声类型 -> 对应的滤波器
+NOISE_FILTERS = {
+    'gaussian': 'lowpass',      # 低通滤波器去除高斯白噪声
+    'narrowband': 'bandpass',   # 带通滤波器去除窄带噪声
+    'single_freq': 'notch',     # 陷波滤波器去除单频干扰
+}
+
+# 启用谱降噪时改用降噪器处理的噪声类型 (与信号频带重叠的宽带噪声)
+SPECTRAL_NOISE_TYPES = ('gaussian', 'narrowband')
 
 class AudioDenoisingProcessor:
     """音频降噪处理器"""
     
-    def __init__(self, input_file="chinese-beat-190047.wav"):
+    def __init__(self, input_file="chinese-beat-190047.wav", cache_dir=None, seed=None,
+                 cache_max_bytes=2 * 1024 ** 3, reference_file=None, use_vad=False, vad_params=None,
+                 channel_mode='mix', pcm_dtype=None, metrics_db=None, denoise_method=None,
+                 denoise_params=None):
+        """
+        参数:
+            input_file: 输入音频文件
+            cache_dir: 结果缓存目录, 为None时不缓存
+            seed: 噪声随机种子; 只有指定种子时带噪信号才可复用
+            cache_max_bytes: 缓存总大小上限 (字节)
+            reference_file: 参考噪声录音; 提供时流程中增加自适应噪声抵消
+            use_vad: 是否检测有声段; 启用后滤波只处理有声段 (静音段输出置零),
+                     信噪比和频谱分析只统计有声段
+            vad_params: 传给 detect_voice_activity 的参数
+            channel_mode: 多声道音频的频谱分析方式 ('mix', 'per_channel', 'mid_side')
+            pcm_dtype: 'int16' 或 'int32' 时以整数PCM读取原始音频 (保存原始音频时直接写回整数),
+                       处理用的 audio_data 由PCM按块转换为 float32, 不经过 float64
+            metrics_db: 指标库 (SQLite) 路径; 提供时每次运行的SNR/PSNR/耗时和输出文件清单写入其中
+            denoise_method: 'spectral_subtraction' 或 'log_mmse' 时, 高斯白噪声和窄带噪声改用
+                            谱降噪 (代替低通/带通滤波器, 保留与噪声重叠频带的内容)
+            denoise_params: 传给 SpectralDenoiser 的参数
+        """
+        if denoise_method is not None and denoise_method not in DENOISE_METHODS:
+            raise ValueError(f"不支持的降噪方法: {denoise_method}, 可选: {DENOISE_METHODS}")
         self.input_file = input_file
         self.sample_rate = None
         self.audio_data = None
+        self.pcm_dtype = pcm_dtype
+        self.audio_pcm = None
         self.noisy_signals = {}
         self.filtered_signals = {}
         self.filters = {}
+        self.shared_arrays = {}
+        
+        # 结果缓存: 信号名称 -> (内容键, 数组); 各阶段的缓存键及是否命中 (None 表示不可缓存)
+        self.seed = seed
+        self.cache = ResultCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.signal_keys = {}
+        self.stage_keys = {}
+        self.stage_hits = {}
+        # 各阶段耗时 (秒) 和本次生成的输出文件 (名称 -> 路径)
+        self.stage_times = {}
+        self.output_files = {}
+        self.metrics_store = MetricsStore(metrics_db) if metrics_db else None
+        
+        # 自适应噪声抵消: 抵消器在多次运行之间保留 (权值继续收敛)
+        self.reference_file = reference_file
+        self.canceller = None
+        self.anc_metrics = None
+        
+        # 有声段索引: 由原始音频检测一次, 各阶段复用
+        self.use_vad = use_vad
+        self.vad_params = dict(vad_params or {})
+        self.segments = None
+        self.channel_mode = channel_mode
+        self.denoise_method = denoise_method
+        self.denoise_params = dict(denoise_params or {})
         
         # 创建输出目录
         self.output_dirs = {
@@ -42,160 +114,573 @@ class AudioDenoisingProcessor:
         """加载音频文件"""
         print("正在加载音频文件...")
         try:
-            self.audio_data, self.sample_rate = sf.read(self.input_file)
+            if self.pcm_dtype is None:
+                self.audio_data, self.sample_rate = sf.read(self.input_file)
+                self.audio_pcm = None
+            else:
+                self.audio_pcm = load_pcm(self.input_file, self.pcm_dtype)
+                self.sample_rate = self.audio_pcm.sample_rate
+                self.audio_data = self.audio_pcm.to_float(np.float32)
+            self.stage_keys = {}
+            self.stage_hits = {}
+            self.stage_times = {}
+            self.output_files = {}
             print(f"音频加载成功: 采样率={self.sample_rate}Hz, 时长={len(self.audio_data)/self.sample_rate:.2f}秒")
+            self.segments = None
+            if self.use_vad:
+                self.segments = detect_voice_activity(self.audio_data, self.sample_rate, **self.vad_params)
+                print(f"有声段检测: {len(self.segments)} 段, 占 {self.segments.active_ratio:.1%}")
             return True
         except Exception as e:
             print(f"音频加载失败: {e}")
             return False
     
+    def _signal_key(self, name, array):
+        """信号的内容键 (数组未变化时复用, 否则重新计算哈希)"""
+        entry = self.signal_keys.get(name)
+        if entry is not None and entry[1] is array:
+            return entry[0]
+        key = ResultCache.hash_array(array)
+        self.signal_keys[name] = (key, array)
+        return key
+    
+    def _noise_rng(self, noise_type):
+        """每种噪声使用由种子派生的独立随机数生成器"""
+        if self.seed is None:
+            return None
+        return np.random.default_rng([self.seed, zlib.crc32(noise_type.encode())])
+    
+    def compute_noise(self, audio_data, noise_type, noise_func, random=True, **params):
+        """
+        添加一种噪声 (启用缓存时复用之前的结果)
+        
+        参数:
+            audio_data: 原始音频
+            noise_type: 噪声名称
+            noise_func: add_*_noise 函数
+            random: 噪声是否随机; 随机噪声只有指定 seed 时才缓存
+            **params: 传给 noise_func 的参数
+        
+        返回:
+            带噪音频
+        """
+        if random:
+            params['rng'] = self._noise_rng(noise_type)
+        
+        start = time.perf_counter()
+        if self.cache is None or (random and self.seed is None):
+            self.stage_hits[f"noisy/{noise_type}"] = None
+            result = noise_func(audio_data, **params)
+            self.stage_times[f"noisy/{noise_type}"] = time.perf_counter() - start
+            return result
+        
+        key_params = {k: v for k, v in params.items() if k != 'rng'}
+        key = self.cache.make_key('noise', self._signal_key('audio', audio_data), noise_type,
+                                  noise_func.__name__, key_params, self.seed if random else None)
+        result, hit = self.cache.get_or_compute(key, lambda: noise_func(audio_data, **params))
+        self.stage_times[f"noisy/{noise_type}"] = time.perf_counter() - start
+        self.stage_keys[f"noisy/{noise_type}"] = key
+        self.stage_hits[f"noisy/{noise_type}"] = hit
+        self.signal_keys[f"noisy/{noise_type}"] = (key, result)
+        return result
+    
+    def filter_cached(self, filter_obj, signal_data, signal_name, segments=None):
+        """
+        应用滤波器 (启用缓存时复用之前的结果)
+        
+        参数:
+            filter_obj: Filter 或 FilterChain 对象
+            signal_data: 输入信号
+            signal_name: 输入信号名称, 如 'noisy/gaussian'
+            segments: SegmentIndex (须由 signal_data 对应的音频检测得到), 提供时只处理有声段
+        
+        返回:
+            滤波后的信号
+        """
+        if segments is None:
+            compute = lambda: filter_obj.filter(signal_data)
+            extra = ()
+        else:
+            # 只处理有声段, 两侧带上冲激响应长度的上下文
+            context = filter_obj.impulse_response_length()
+            compute = lambda: segments.apply(filter_obj.filter, signal_data, context=context)
+            extra = (segments.key,)
+        
+        start = time.perf_counter()
+        if self.cache is None:
+            result = compute()
+            self.stage_times[f"filter/{signal_name}"] = time.perf_counter() - start
+            return result
+        
+        # filter_key 按系数 (级联按各二阶节) 和采样率计算
+        key = self.cache.make_key('filter', self._signal_key(signal_name, signal_data),
+                                  filter_obj.filter_type, filter_key(filter_obj), *extra)
+        result, hit = self.cache.get_or_compute(key, compute)
+        self.stage_times[f"filter/{signal_name}"] = time.perf_counter() - start
+        self.stage_keys[f"filter/{signal_name}"] = key
+        self.stage_hits[f"filter/{signal_name}"] = hit
+        return result
+    
     def add_noise(self):
         """添加三种不同类型的噪声"""
         print("正在添加噪声...")
         
         # 1. 高斯白噪声
-        self.noisy_signals['gaussian'] = add_gaussian_noise(
-            self.audio_data, snr_db=10
+        self.noisy_signals['gaussian'] = self.compute_noise(
+            self.audio_data, 'gaussian', add_gaussian_noise, snr_db=10
         )
         
         # 2. 窄带高斯噪声 (1000Hz-2000Hz)
-        self.noisy_signals['narrowband'] = add_narrowband_noise(
-            self.audio_data, self.sample_rate, 
-            low_freq=1000, high_freq=2000, snr_db=15
+        self.noisy_signals['narrowband'] = self.compute_noise(
+            self.audio_data, 'narrowband', add_narrowband_noise,
+            sample_rate=self.sample_rate, low_freq=1000, high_freq=2000, snr_db=15
         )
         
         # 3. 单频干扰 (1500Hz正弦波)
-        self.noisy_signals['single_freq'] = add_single_frequency_interference(
-            self.audio_data, self.sample_rate, 
-            frequency=1500, amplitude=0.3
+        self.noisy_signals['single_freq'] = self.compute_noise(
+            self.audio_data, 'single_freq', add_single_frequency_interference, random=False,
+            sample_rate=self.sample_rate, frequency=1500, amplitude=0.3
         )
         
         print("噪声添加完成")
     
+    @staticmethod
+    def _filter_designs():
+        """滤波器名称 -> 设计函数 (参数为采样率)"""
+        return {
+            # 低通滤波器 (用于高斯白噪声)
+            'lowpass': lambda sample_rate: design_lowpass_filter(
+                cutoff_freq=3000, sample_rate=sample_rate
+            ),
+            # 带通滤波器 (用于窄带噪声)
+            'bandpass': lambda sample_rate: design_bandpass_filter(
+                low_freq=200, high_freq=8000, sample_rate=sample_rate
+            ),
+            # 陷波滤波器 (用于单频干扰)
+            'notch': lambda sample_rate: design_notch_filter(
+                notch_freq=1500, sample_rate=sample_rate
+            ),
+        }
+    
     def design_filters(self):
         """设计滤波器"""
         print("正在设计滤波器...")
         
-        # 低通滤波器 (用于高斯白噪声)
-        self.filters['lowpass'] = design_lowpass_filter(
-            cutoff_freq=3000, sample_rate=self.sample_rate
-        )
+        for name, design in self._filter_designs().items():
+            self.filters[name] = design(self.sample_rate)
         
-        # 带通滤波器 (用于窄带噪声)
-        self.filters['bandpass'] = design_bandpass_filter(
-            low_freq=200, high_freq=8000, sample_rate=self.sample_rate
-        )
+        print("滤波器设计完成")
+    
+    def denoise_cached(self, signal_data, signal_name, method=None, sample_rate=None):
+        """
+        谱降噪 (启用缓存时复用之前的结果)
         
-        # 陷波滤波器 (用于单频干扰)
-        self.filters['notch'] = design_notch_filter(
-            notch_freq=1500, sample_rate=self.sample_rate
-        )
+        降噪器依靠静音段持续跟踪噪声谱, 因此始终处理整段信号, 不按有声段处理。
         
-        print("滤波器设计完成")
+        参数:
+            signal_data: 输入信号
+            signal_name: 输入信号名称, 如 'noisy/gaussian'
+            method: 降噪方法, 默认为 denoise_method (未设置时为 'log_mmse')
+            sample_rate: signal_data 的采样率, 默认为处理器加载的音频的采样率
+        
+        返回:
+            降噪后的信号
+        """
+        method = method or self.denoise_method or 'log_mmse'
+        sample_rate = sample_rate or self.sample_rate
+        compute = lambda: spectral_denoise(signal_data, sample_rate, method, **self.denoise_params)
+        
+        start = time.perf_counter()
+        if self.cache is None:
+            result = compute()
+        else:
+            key = self.cache.make_key('denoise', self._signal_key(signal_name, signal_data), method,
+                                      self.denoise_params, sample_rate)
+            result, hit = self.cache.get_or_compute(key, compute)
+            self.stage_keys[f"denoise/{signal_name}"] = key
+            self.stage_hits[f"denoise/{signal_name}"] = hit
+        self.stage_times[f"denoise/{signal_name}"] = time.perf_counter() - start
+        return result
+    
+    def filter_name(self, noise_type):
+        """噪声类型实际使用的滤波器或降噪方法"""
+        if self.denoise_method is not None and noise_type in SPECTRAL_NOISE_TYPES:
+            return self.denoise_method
+        return NOISE_FILTERS.get(noise_type, 'none')
+    
+    def _filter_stage(self, noise_type):
+        """噪声类型的滤波阶段名称: 'filter' 或改用降噪器时的 'denoise'"""
+        return 'filter' if self.filter_name(noise_type) == NOISE_FILTERS.get(noise_type) else 'denoise'
     
     def apply_filters(self):
-        """应用滤波器"""
+        """应用滤波器 (启用谱降噪时宽带噪声改用降噪器)"""
         print("正在应用滤波器...")
         
-        # 对高斯白噪声信号应用低通滤波器
-        self.filtered_signals['gaussian'] = self.filters['lowpass'].filter(
-            self.noisy_signals['gaussian']
-        )
+        for noise_type, filter_type in NOISE_FILTERS.items():
+            noisy_signal = self.noisy_signals[noise_type]
+            signal_name = f"noisy/{noise_type}"
+            if self.filter_name(noise_type) == filter_type:
+                self.filtered_signals[noise_type] = self.filter_cached(
+                    self.filters[filter_type], noisy_signal, signal_name, self.segments
+                )
+            else:
+                self.filtered_signals[noise_type] = self.denoise_cached(noisy_signal, signal_name)
         
-        # 对窄带噪声信号应用带通滤波器
-        self.filtered_signals['narrowband'] = self.filters['bandpass'].filter(
-            self.noisy_signals['narrowband']
-        )
+        print("滤波处理完成")
+    
+    def evaluate_snr(self):
+        """
+        计算各噪声类型滤波前后的信噪比 (启用有声段检测时只统计有声段)
         
-        # 对单频干扰信号应用陷波滤波器
-        self.filtered_signals['single_freq'] = self.filters['notch'].filter(
-            self.noisy_signals['single_freq']
-        )
+        返回:
+            {噪声类型: {'noisy': 带噪SNR, 'filtered': 滤波后SNR}} (dB)
+        """
+        results = {}
+        for noise_type, noisy_signal in self.noisy_signals.items():
+            entry = {'noisy': float(calculate_snr(self.audio_data, noisy_signal, self.segments))}
+            filtered_signal = self.filtered_signals.get(noise_type)
+            if filtered_signal is not None:
+                entry['filtered'] = float(calculate_snr(self.audio_data, filtered_signal, self.segments))
+            results[noise_type] = entry
+        return results
+    
+    def record_metrics(self, store=None, label=None):
+        """
+        把本次处理的指标和输出文件清单写入指标库
+        
+        每种噪声一行: 滤波前后的 SNR/PSNR (启用有声段检测时SNR只统计有声段)、
+        加噪和滤波耗时 (命中缓存时为读取缓存的耗时)。
+        
+        参数:
+            store: MetricsStore对象, 默认使用 metrics_db 打开的指标库
+            label: 运行名称
+        
+        返回:
+            运行编号
+        """
+        store = store or self.metrics_store
+        if store is None:
+            raise ValueError("没有指定指标库")
+        
+        run_id = store.start_run(label, {'seed': self.seed, 'use_vad': self.use_vad,
+                                         'channel_mode': self.channel_mode, 'pcm_dtype': self.pcm_dtype,
+                                         'denoise_method': self.denoise_method,
+                                         'denoise_params': self.denoise_params})
+        file = str(self.input_file)
+        for noise_type, snr in self.evaluate_snr().items():
+            noisy_signal = self.noisy_signals[noise_type]
+            filtered_signal = self.filtered_signals.get(noise_type)
+            store.add_metrics(
+                run_id, file, noise_type, self.filter_name(noise_type),
+                snr_noisy=snr['noisy'], snr_filtered=snr.get('filtered'),
+                psnr_noisy=float(calculate_psnr(self.audio_data, noisy_signal)),
+                psnr_filtered=(None if filtered_signal is None
+                               else float(calculate_psnr(self.audio_data, filtered_signal))),
+                noise_seconds=self.stage_times.get(f"noisy/{noise_type}"),
+                filter_seconds=self.stage_times.get(f"{self._filter_stage(noise_type)}/noisy/{noise_type}"),
+                samples=len(self.audio_data), sample_rate=self.sample_rate
+            )
+        for name, path in self.output_files.items():
+            store.add_output(run_id, file, name, path)
+        store.flush()
+        return run_id
+    
+    def cancel_noise(self, primary=None, reference=None, primary_channel=0, reference_channel=1,
+                     filter_length=64, mu=0.5, algorithm='nlms', chunk_size=65536, reset=False):
+        """
+        自适应噪声抵消
+        
+        主通道和参考通道可以直接给出, 或取自 reference_file (参考噪声录音,
+        主通道为输入音频各声道的平均), 或取自输入音频的两个声道。
+        抵消器保留在处理器中, 再次调用时从上次的权值继续 (参数改变或 reset=True 时重新开始)。
+        
+        参数:
+            primary: 主通道信号 (信号 + 噪声)
+            reference: 参考通道信号 (与噪声相关)
+            primary_channel: 从输入音频取主通道时的声道号
+            reference_channel: 从输入音频取参考通道时的声道号
+            filter_length: 滤波器长度
+            mu: 步长
+            algorithm: 'lms' 或 'nlms'
+            chunk_size: 每次送入抵消器的采样数
+            reset: 是否清除之前的权值
+        
+        返回:
+            降噪后的信号
+        """
+        print("正在进行自适应噪声抵消...")
+        
+        if primary is None or reference is None:
+            if self.reference_file is not None:
+                reference, reference_rate = sf.read(self.reference_file)
+                if reference_rate != self.sample_rate:
+                    raise ValueError(f"参考录音采样率 {reference_rate}Hz 与输入音频 {self.sample_rate}Hz 不一致")
+                primary = self.audio_data.mean(axis=1) if self.audio_data.ndim > 1 else self.audio_data
+                reference = reference.mean(axis=1) if reference.ndim > 1 else reference
+            else:
+                if self.audio_data.ndim < 2 or self.audio_data.shape[1] < 2:
+                    raise ValueError("没有参考录音时, 输入音频需要包含主通道和参考通道两个声道")
+                primary = self.audio_data[:, primary_channel]
+                reference = self.audio_data[:, reference_channel]
+        
+        params = (filter_length, mu, algorithm)
+        current = self.canceller
+        if reset or current is None or (current.filter_length, current.mu, current.algorithm) != params:
+            self.canceller = AdaptiveNoiseCanceller(filter_length, mu, algorithm,
+                                                    sample_rate=self.sample_rate)
+        
+        output = self.canceller.run(primary, reference, chunk_size)
+        self.filtered_signals['adaptive'] = output
+        self.anc_metrics = self.canceller.metrics()
+        
+        metrics = self.anc_metrics
+        convergence = metrics['convergence_time']
+        print(f"自适应噪声抵消完成: 残余功率={metrics['final_error_db']:.2f}dB, "
+              f"收敛时间={'未知' if convergence is None else f'{convergence:.2f}秒'}, "
+              f"速度={metrics['realtime_factor']:.1f}倍实时")
+        return output
+    
+    def share_signals(self):
+        """
+        把音频数据移入共享内存
+        
+        audio_data、noisy_signals 和 filtered_signals 被替换为共享内存视图，
+        返回的句柄可直接作为多进程任务参数 (只序列化共享内存名称)。
+        
+        返回:
+            {'audio': 句柄, 'noisy/<类型>': 句柄, 'filtered/<类型>': 句柄}
+        """
+        def share(key, array):
+            shared = self.shared_arrays.get(key)
+            if shared is not None and shared.array is array:
+                return array
+            if shared is not None and shared.shape == array.shape and shared.dtype == array.dtype:
+                # 信号已更新，复用原有共享内存块
+                shared.array[...] = array
+                return shared.array
+            if shared is not None:
+                shared.close()
+            self.shared_arrays[key] = SharedAudioArray.from_array(array)
+            return self.shared_arrays[key].array
+        
+        if self.audio_data is not None:
+            self.audio_data = share('audio', self.audio_data)
+        for noise_type, noisy_signal in self.noisy_signals.items():
+            self.noisy_signals[noise_type] = share(f"noisy/{noise_type}", noisy_signal)
+        for noise_type, filtered_signal in self.filtered_signals.items():
+            self.filtered_signals[noise_type] = share(f"filtered/{noise_type}", filtered_signal)
+        
+        return dict(self.shared_arrays)
+    
+    def release_shared(self):
+        """把共享内存中的数据复制回私有内存并释放共享内存"""
+        if not self.shared_arrays:
+            return
+        
+        def unshare(array):
+            return np.array(array) if array is not None else None
+        
+        self.audio_data = unshare(self.audio_data)
+        self.noisy_signals = {k: unshare(v) for k, v in self.noisy_signals.items()}
+        self.filtered_signals = {k: unshare(v) for k, v in self.filtered_signals.items()}
+        
+        for shared in self.shared_arrays.values():
+            shared.close()
+        self.shared_arrays = {}
+    
+    def apply_filters_parallel(self, max_workers=None):
+        """
+        多进程应用滤波器 (按声道并行)
+        
+        输入和输出都放在共享内存中，工作进程直接读取带噪信号并
+        把滤波结果写入输出数组，不在进程间复制音频数据。
+        启用谱降噪的噪声类型在本进程内处理 (降噪器一次处理全部声道)。
+        
+        参数:
+            max_workers: 进程数, 默认 min(CPU核数, 声道数)
+        """
+        print("正在并行应用滤波器...")
+        
+        self.share_signals()
+        
+        for noise_type, filter_type in NOISE_FILTERS.items():
+            if self.filter_name(noise_type) != filter_type:
+                self.filtered_signals[noise_type] = self.denoise_cached(
+                    self.noisy_signals[noise_type], f"noisy/{noise_type}"
+                )
+                continue
+            source = self.shared_arrays[f"noisy/{noise_type}"]
+            key = f"filtered/{noise_type}"
+            if key not in self.shared_arrays:
+                self.shared_arrays[key] = SharedAudioArray(source.shape, np.float64)
+            dest = self.shared_arrays[key]
+            map_channels(self.filters[filter_type].filter, source, dest, max_workers)
+            self.filtered_signals[noise_type] = dest.array
         
         print("滤波处理完成")
     
+    def _plot_path(self, name):
+        """图表保存路径 (同时登记到输出文件清单)"""
+        path = f"{self.output_dirs['plots']}/{name}.png"
+        self.output_files[f"plots/{name}"] = path
+        return path
+    
+    def _plots_manifest(self):
+        """图表目录中记录最近一次绘图对应结果的清单文件"""
+        return Path(self.output_dirs['plots']) / 'manifest.json'
+    
+    def _reusable_plots(self, plots_key):
+        """
+        图表目录中的图表是否由同一组结果 (plots_key) 生成且仍然完整
+        
+        返回:
+            可复用时为 {名称: 路径}, 否则为 None
+        """
+        try:
+            with open(self._plots_manifest(), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        files = manifest.get('files', {})
+        if manifest.get('plots_key') != plots_key or not files:
+            return None
+        if not all(os.path.exists(path) for path in files.values()):
+            return None
+        return files
+    
+    def _write_plots_manifest(self, plots_key):
+        """记录本次生成的图表 (plots_key 为 None 时记录为不可复用)"""
+        files = {name: path for name, path in self.output_files.items() if name.startswith('plots/')}
+        with open(self._plots_manifest(), 'w', encoding='utf-8') as f:
+            json.dump({'plots_key': plots_key, 'files': files}, f, ensure_ascii=False, indent=2)
+    
+    def _analysis_channel_mode(self):
+        """图表使用的声道模式: 中/侧模式只适用于双声道, 其他声道数时退回为 'mix' (单声道) 或 'per_channel'"""
+        n_channels = self.audio_data.shape[1] if self.audio_data.ndim > 1 else 1
+        if self.channel_mode != 'mid_side' or n_channels == 2:
+            return self.channel_mode
+        fallback = 'mix' if n_channels < 2 else 'per_channel'
+        print(f"中/侧模式需要双声道输入, 当前为 {n_channels} 声道, 改用 '{fallback}'")
+        return fallback
+    
     def analyze_signals(self):
         """分析信号并生成图表"""
         print("正在生成分析图表...")
+        channel_mode = self._analysis_channel_mode()
         
         # 原始信号分析
         plot_time_domain(self.audio_data, self.sample_rate, "原始信号", 
-                        save_path=f"{self.output_dirs['plots']}/original_time.png")
+                        save_path=self._plot_path("original_time"))
         plot_frequency_domain(self.audio_data, self.sample_rate, "原始信号", 
-                             save_path=f"{self.output_dirs['plots']}/original_freq.png")
+                             save_path=self._plot_path("original_freq"),
+                             segments=self.segments, channel_mode=channel_mode)
+        plot_spectrogram(self.audio_data, self.sample_rate, "原始信号频谱图",
+                         save_path=self._plot_path("original_spectrogram"),
+                         channel_mode=channel_mode)
         
         # 带噪信号分析
         for noise_type, noisy_signal in self.noisy_signals.items():
             plot_time_domain(noisy_signal, self.sample_rate, f"{noise_type}噪声信号", 
-                           save_path=f"{self.output_dirs['plots']}/{noise_type}_noisy_time.png")
+                           save_path=self._plot_path(f"{noise_type}_noisy_time"))
             plot_frequency_domain(noisy_signal, self.sample_rate, f"{noise_type}噪声信号", 
-                                save_path=f"{self.output_dirs['plots']}/{noise_type}_noisy_freq.png")
+                                save_path=self._plot_path(f"{noise_type}_noisy_freq"),
+                                segments=self.segments, channel_mode=channel_mode)
         
         # 滤波后信号分析
         for noise_type, filtered_signal in self.filtered_signals.items():
             plot_time_domain(filtered_signal, self.sample_rate, f"{noise_type}滤波后信号", 
-                           save_path=f"{self.output_dirs['plots']}/{noise_type}_filtered_time.png")
+                           save_path=self._plot_path(f"{noise_type}_filtered_time"))
             plot_frequency_domain(filtered_signal, self.sample_rate, f"{noise_type}滤波后信号", 
-                                save_path=f"{self.output_dirs['plots']}/{noise_type}_filtered_freq.png")
+                                save_path=self._plot_path(f"{noise_type}_filtered_freq"),
+                                segments=self.segments, channel_mode=channel_mode)
+            plot_spectrogram(filtered_signal, self.sample_rate, f"{noise_type}滤波后信号频谱图",
+                             save_path=self._plot_path(f"{noise_type}_filtered_spectrogram"),
+                             channel_mode=channel_mode)
         
         # 滤波器响应
         for filter_type, filter_obj in self.filters.items():
             plot_filter_response(filter_obj, self.sample_rate, filter_type, 
-                               save_path=f"{self.output_dirs['plots']}/{filter_type}_response.png")
+                               save_path=self._plot_path(f"{filter_type}_response"))
         
         print("分析图表生成完成")
     
-    def save_audio_files(self):
-        """保存音频文件"""
+    def save_audio_files(self, subtype='PCM_16', file_format='wav', writer=None):
+        """
+        保存音频文件
+        
+        参数:
+            subtype: 采样格式 ('PCM_16', 'PCM_24', 'FLOAT')
+            file_format: 文件格式 ('wav' 或 'flac')
+            writer: 可选的 ConcurrentAudioWriter; 提供时只提交写入任务,
+                    由调用方等待完成, 便于与后续计算重叠
+        
+        写入成功的文件在完成回调中记录到 output_files, writer 关闭后才齐全。
+        """
         print("正在保存音频文件...")
-
-        # 保存原始音频
-        try:
-            sf.write(f"{self.output_dirs['noisy']}/original.wav",
-                     self.audio_data.astype(np.float32), self.sample_rate)
-        except Exception as e:
-            print(f"保存原始音频失败: {e}")
-
-        # 保存带噪音频
+        
+        own_writer = writer is None
+        if own_writer:
+            writer = ConcurrentAudioWriter()
+        
+        # (输出路径, 数据, 失败提示)
+        # 以PCM读取的原始音频直接写回整数采样
+        original = self.audio_pcm if self.audio_pcm is not None else self.audio_data
+        jobs = [(f"{self.output_dirs['noisy']}/original.{file_format}",
+                 original, "保存原始音频失败")]
+        
+        # 带噪音频
         for noise_type, noisy_signal in self.noisy_signals.items():
             if noisy_signal is not None and len(noisy_signal) > 0:
-                try:
-                    sf.write(f"{self.output_dirs['noisy']}/{noise_type}_noisy.wav",
-                             noisy_signal.astype(np.float32), self.sample_rate)
-                except Exception as e:
-                    print(f"保存{noise_type}噪声音频失败: {e}")
-
-        # 保存滤波后音频
+                jobs.append((f"{self.output_dirs['noisy']}/{noise_type}_noisy.{file_format}",
+                             noisy_signal, f"保存{noise_type}噪声音频失败"))
+        
+        # 滤波后音频
         for noise_type, filtered_signal in self.filtered_signals.items():
             if filtered_signal is not None and len(filtered_signal) > 0:
-                try:
-                    sf.write(f"{self.output_dirs['filtered']}/{noise_type}_filtered.wav",
-                             filtered_signal.astype(np.float32), self.sample_rate)
-                except Exception as e:
-                    print(f"保存{noise_type}滤波后音频失败: {e}")
-
-        print("音频文件保存完成")
+                jobs.append((f"{self.output_dirs['filtered']}/{noise_type}_filtered.{file_format}",
+                             filtered_signal, f"保存{noise_type}滤波后音频失败"))
+        
+        def record_result(path, message):
+            # 只记录写入成功的文件 (output_files 会写入指标库)
+            def callback(future):
+                if future.exception() is None:
+                    self.output_files[f"audio/{Path(path).stem}"] = path
+                else:
+                    print(f"{message}: {future.exception()}")
+            return callback
+        
+        # 逐块转换并在后台线程写入, 不再整段 astype(np.float32)
+        for path, data, message in jobs:
+            try:
+                future = writer.submit(path, data, self.sample_rate, subtype)
+            except Exception as e:
+                print(f"{message}: {e}")
+                continue
+            future.add_done_callback(record_result(path, message))
+        
+        if own_writer:
+            writer.close()
+            print("音频文件保存完成")
     
     def play_audio_comparison(self):
-        """播放音频对比"""
+        """播放音频对比 (原始、带噪、滤波后音频依次无缝播放)"""
         print("播放音频对比...")
         
-        # 播放原始音频
-        print("播放原始音频...")
-        sd.play(self.audio_data, self.sample_rate)
-        sd.wait()
-        
-        # 播放带噪音频
+        engine = PlaybackEngine(self.sample_rate)
+        engine.enqueue(self.audio_data, "原始音频")
         for noise_type, noisy_signal in self.noisy_signals.items():
-            print(f"播放{noise_type}噪声音频...")
-            sd.play(noisy_signal, self.sample_rate)
-            sd.wait()
-        
-        # 播放滤波后音频
+            engine.enqueue(noisy_signal, f"{noise_type}噪声音频")
         for noise_type, filtered_signal in self.filtered_signals.items():
-            print(f"播放{noise_type}滤波后音频...")
-            sd.play(filtered_signal, self.sample_rate)
-            sd.wait()
+            engine.enqueue(filtered_signal, f"{noise_type}滤波后音频")
+        
+        with engine:
+            engine.start()
+            label = None
+            while not engine.wait(0.1):
+                if engine.current_label != label:
+                    label = engine.current_label
+                    if label is not None:
+                        print(f"播放{label}...")
     
     def run_full_pipeline(self):
         """运行完整的处理流程"""
@@ -207,11 +692,84 @@ class AudioDenoisingProcessor:
         self.add_noise()
         self.design_filters()
         self.apply_filters()
-        self.analyze_signals()
-        self.save_audio_files()
+        if self.reference_file is not None:
+            self.cancel_noise()
+            # 自适应抵消的结果不经过缓存
+            self.stage_hits['adaptive'] = None
+        
+        for noise_type, snr in self.evaluate_snr().items():
+            if 'filtered' in snr:
+                print(f"{noise_type}: SNR {snr['noisy']:.2f}dB -> {snr['filtered']:.2f}dB")
+        
+        # 所有阶段都命中缓存, 且图表目录的清单表明现有图表正是由这组结果生成时, 跳过绘图
+        plots_key = None
+        if self.cache is not None and None not in self.stage_hits.values():
+            plots_key = self.cache.make_key('plots', sorted(self.stage_keys.items()))
+        reusable = None
+        if plots_key is not None and all(self.stage_hits.values()):
+            reusable = self._reusable_plots(plots_key)
+        
+        # 音频在后台线程写入, 同时生成分析图表
+        with ConcurrentAudioWriter() as writer:
+            self.save_audio_files(writer=writer)
+            if reusable is not None:
+                print("处理结果均来自缓存, 复用已有图表")
+                self.output_files.update(reusable)
+            else:
+                self.analyze_signals()
+                self._write_plots_manifest(plots_key)
+        print("音频文件保存完成")
+        
+        if self.metrics_store is not None:
+            run_id = self.record_metrics()
+            print(f"指标已写入 {self.metrics_store.path} (运行编号 {run_id})")
         
         print("处理流程完成！")
         return True
+    
+    def run_batch(self, files, output_dir='output/batch', preset='lowpass', checkpoint_path=None,
+                  **runner_params):
+        """
+        用因果滤波流式处理一批文件, 支持断点续跑
+        
+        参数:
+            files: 输入文件列表
+            output_dir: 输出目录
+            preset: 使用的滤波器 ('lowpass', 'bandpass', 'notch', 按各文件的采样率设计)
+                    或谱降噪方法 ('spectral_subtraction', 'log_mmse')
+            checkpoint_path: 检查点路径, 默认为输出目录下的 checkpoint.json
+            **runner_params: 传给 BatchRunner 的参数 (block_size, checkpoint_interval, subtype)
+        
+        启用指标库时, 本次处理的每个文件记录一行 (噪声类型为 'none') 和输出文件。
+        
+        返回:
+            输入文件 -> 输出文件 的字典
+        """
+        designs = self._filter_designs()
+        if preset not in designs and preset not in DENOISE_METHODS:
+            raise ValueError(f"未知的滤波器: {preset}, 可选: {list(designs) + list(DENOISE_METHODS)}")
+        
+        def make_stages(sample_rate, channels):
+            if preset in DENOISE_METHODS:
+                return [SpectralDenoiser(sample_rate, preset, **self.denoise_params)]
+            # 按该文件的采样率只设计用到的滤波器 (其余滤波器可能不适用于该采样率),
+            # 不改动处理器为已加载音频设计的滤波器和采样率
+            return [CausalFilterStage(designs[preset](sample_rate))]
+        
+        runner = BatchRunner(make_stages, output_dir, checkpoint_path, **runner_params)
+        try:
+            return runner.run(files)
+        finally:
+            # 中途失败时也记录已完成的文件
+            if self.metrics_store is not None and runner.file_stats:
+                store = self.metrics_store
+                run_id = store.start_run('batch', {'preset': preset, **runner_params})
+                for input_path, stats in runner.file_stats.items():
+                    store.add_metrics(run_id, input_path, 'none', preset,
+                                      filter_seconds=stats['seconds'], samples=stats['frames'],
+                                      sample_rate=stats['sample_rate'])
+                    store.add_output(run_id, input_path, 'batch', stats['output'])
+                store.flush()
 
 def main():
     """主函数"""
@@ -220,7 +778,9 @@ def main():
     
     # 运行处理流程
     if processor.run_full_pipeline():
-        # 启动GUI界面
+        # 启动GUI界面 (tkinter 只在需要界面时导入)
+        from gui import AudioDenoisingGUI
+        
         app = AudioDenoisingGUI(processor)
         app.run()
 
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+降噪服务
+基于 asyncio 的本地HTTP服务 (仅使用标准库)，供其他程序调用滤波降噪：
+
+    GET  /health            服务状态
+    GET  /filters           可用的滤波器设计及处理器预设
+    GET  /metrics           请求数、排队和延迟统计
+    POST /filter?design=lowpass&cutoff_freq=3000&sample_rate=16000&channels=1
+                            上传 float32 小端交错PCM (可分块传输), 边接收边返回滤波后的PCM
+    POST /denoise?preset=lowpass
+                            上传WAV文件, 由 AudioDenoisingProcessor 的滤波器处理后返回WAV
+
+CPU计算在有界进程池中执行；同时处理的请求数和排队数都有上限，
+超过时立即返回 503，客户端据此退避重试。
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+from utils.sweep import FILTER_DESIGNERS
+
+# 处理器中的滤波器预设
+PROCESSOR_PRESETS = ('lowpass', 'bandpass', 'notch')
+
+# 流式滤波时每次送入进程池的最少帧数
+DEFAULT_BLOCK_FRAMES = 8192
+
+# 响应体每块的字节数
+RESPONSE_CHUNK_BYTES = 65536
+
+_STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class HTTPError(Exception):
+    """返回给客户端的错误"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LatencyStats:
+    """最近若干次耗时的统计"""
+
+    def __init__(self, size=1024):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        """返回次数和毫秒为单位的均值/分位数"""
+        if not self.samples:
+            return {'count': self.count}
+        values = np.asarray(self.samples) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            'count': self.count,
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': float(values.max()),
+        }
+
+
+def _parse_value(text):
+    """把查询参数转换为 int/float, 其余保持字符串"""
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _filter_block(sos, block, zi):
+    """进程池任务: 对一块数据做带状态的因果滤波"""
+    return signal.sosfilt(sos, block, axis=0, zi=zi)
+
+
+def _denoise_wav(wav_bytes, preset):
+    """进程池任务: 用处理器的滤波器处理一个WAV文件"""
+    from main import AudioDenoisingProcessor
+
+    # 只按处理器的预设设计滤波器, 不创建处理器 (避免在服务的工作目录下创建 output/ 目录)
+    try:
+        audio_data, sample_rate = sf.read(io.BytesIO(wav_bytes))
+    except Exception:
+        raise ValueError("无法解析上传的WAV文件")
+    filter_obj = AudioDenoisingProcessor._filter_designs()[preset](sample_rate)
+    filtered = filter_obj.filter(audio_data)
+
+    output = io.BytesIO()
+    sf.write(output, filtered.astype(np.float32), sample_rate, format='WAV', subtype='FLOAT')
+    return output.getvalue()
+
+
+class DenoiseServer:
+    """降噪HTTP服务"""
+
+    def __init__(self, host='127.0.0.1', port=8765, max_workers=None, max_active=4, max_queue=16,
+                 block_frames=DEFAULT_BLOCK_FRAMES, max_upload_bytes=512 * 1024 ** 2):
+        """
+        参数:
+            host: 监听地址
+            port: 监听端口 (0 表示自动分配)
+            max_workers: 进程池大小, 默认CPU核数
+            max_active: 同时处理的请求数上限
+            max_queue: 等待处理的请求数上限, 超过时返回 503
+            block_frames: 流式滤波时每次处理的最少帧数
+            max_upload_bytes: /denoise 上传文件的大小上限
+        """
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.block_frames = block_frames
+        self.max_upload_bytes = max_upload_bytes
+
+        self._executor = None
+        self._server = None
+        self._slots = None
+        self._queued = 0
+        self._active = 0
+        self._thread = None
+        self._loop = None
+
+        self.stats = {
+            'requests': 0,
+            'rejected': 0,
+            'errors': 0,
+        }
+        self.latency = {
+            'request': LatencyStats(),
+            'queue_wait': LatencyStats(),
+            'chunk': LatencyStats(),
+        }
+
+    # ------------------------------------------------------------------ 生命周期
+
+    async def start(self):
+        """开始监听 (port 为 0 时, 实际端口写回 self.port)"""
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._slots = asyncio.Semaphore(self.max_active)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """停止监听并关闭进程池"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"降噪服务已启动: http://{self.host}:{self.port}")
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def start_background(self):
+        """
+        在后台线程中运行服务 (便于嵌入其他程序或测试)
+
+        返回:
+            self (self.port 为实际端口)
+        """
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start())
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="denoise-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop_background(self):
+        """停止后台线程中的服务"""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def _read_request(self, reader):
+        """读取请求行和请求头"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "请求行格式错误")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, headers
+
+    async def _iter_body(self, reader, headers):
+        """按到达的顺序产出请求体 (支持 Content-Length 和分块传输编码)"""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size_line = await reader.readuntil(b"\r\n")
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    # 跳过 trailer
+                    while (await reader.readuntil(b"\r\n")) != b"\r\n":
+                        pass
+                    return
+                data = await reader.readexactly(size)
+                await reader.readexactly(2)
+                yield data
+        else:
+            remaining = int(headers.get('content-length', 0))
+            while remaining > 0:
+                data = await reader.read(min(remaining, RESPONSE_CHUNK_BYTES))
+                if not data:
+                    raise HTTPError(400, "请求体不完整")
+                remaining -= len(data)
+                yield data
+
+    @staticmethod
+    def _head(status, content_type, extra=None):
+        lines = [f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 "Connection: close"]
+        for name, value in (extra or {}).items():
+            lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n").encode('latin-1')
+
+    async def _send_json(self, writer, status, payload, extra=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(self._head(status, 'application/json; charset=utf-8', extra)
+                     + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _start_stream(self, writer, response, content_type, extra=None):
+        response['started'] = True
+        writer.write(self._head(200, content_type, extra) + b"Transfer-Encoding: chunked\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _send_chunk(writer, data):
+        if data:
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            # 客户端读取慢时在这里等待, 不会无限堆积输出
+            await writer.drain()
+
+    @staticmethod
+    async def _end_stream(writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _handle_connection(self, reader, writer):
+        start = time.perf_counter()
+        # 流式响应开始后不能再改状态码
+        response = {'started': False}
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, target, headers = request
+            url = urlsplit(target)
+            query = {name: _parse_value(value) for name, value in parse_qsl(url.query)}
+
+            if url.path == '/health':
+                await self._send_json(writer, 200, {'status': 'ok'})
+            elif url.path == '/filters':
+                await self._send_json(writer, 200, {
+                    'designs': sorted(FILTER_DESIGNERS), 'presets': list(PROCESSOR_PRESETS)
+                })
+            elif url.path == '/metrics':
+                await self._send_json(writer, 200, self.metrics())
+            elif url.path in ('/filter', '/denoise'):
+                if method != 'POST':
+                    raise HTTPError(405, "只支持 POST")
+                self.stats['requests'] += 1
+                async with self._admission():
+                    if url.path == '/filter':
+                        await self._handle_filter(reader, writer, response, headers, query)
+                    else:
+                        await self._handle_denoise(reader, writer, response, headers, query)
+                self.latency['request'].record(time.perf_counter() - start)
+            else:
+                raise HTTPError(404, f"未知路径: {url.path}")
+        except HTTPError as e:
+            if e.status == 503:
+                self.stats['rejected'] += 1
+            else:
+                self.stats['errors'] += 1
+            extra = {'Retry-After': '1'} if e.status == 503 else None
+            await self._send_error(writer, response, e.status, e.message, extra)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.stats['errors'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            await self._send_error(writer, response, 500, f"{type(e).__name__}: {e}")
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _send_error(self, writer, response, status, message, extra=None):
+        """响应头尚未发送时返回错误信息, 否则只能直接断开连接"""
+        if response['started']:
+            return
+        try:
+            await self._send_json(writer, status, {'error': message}, extra)
+        except ConnectionError:
+            pass
+
+    @asynccontextmanager
+    async def _admission(self):
+        """请求准入: 处理中的请求已满且排队已满时拒绝"""
+        if self._slots.locked() and self._queued >= self.max_queue:
+            raise HTTPError(503, "服务繁忙, 请稍后重试")
+        self._queued += 1
+        wait_start = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self.latency['queue_wait'].record(time.perf_counter() - wait_start)
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._slots.release()
+
+    # ------------------------------------------------------------------ 处理
+
+    def _design_filter(self, query):
+        """按查询参数设计滤波器"""
+        params = dict(query)
+        design = params.pop('design', None)
+        if design not in FILTER_DESIGNERS:
+            raise HTTPError(400, f"design 必须是 {sorted(FILTER_DESIGNERS)} 之一")
+        params.pop('channels', None)
+        try:
+            filter_obj = FILTER_DESIGNERS[design](**params)
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, f"滤波器参数错误: {e}")
+        return filter_obj.to_sos()
+
+    async def _run(self, func, *args):
+        """在进程池中执行并记录耗时"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result = await loop.run_in_executor(self._executor, func, *args)
+        self.latency['chunk'].record(time.perf_counter() - start)
+        return result
+
+    async def _handle_filter(self, reader, writer, response, headers, query):
+        """流式因果滤波: 边接收边处理边返回, 块之间保留滤波器状态"""
+        if 'sample_rate' not in query:
+            raise HTTPError(400, "缺少 sample_rate 参数")
+        try:
+            channels = int(query.get('channels', 1))
+        except ValueError:
+            raise HTTPError(400, "channels 必须为正整数")
+        if channels < 1:
+            raise HTTPError(400, "channels 必须为正整数")
+        sos = self._design_filter(query)
+        zi = np.zeros((sos.shape[0], 2, channels))
+        frame_bytes = 4 * channels
+        min_bytes = self.block_frames * frame_bytes
+
+        await self._start_stream(writer, response, 'application/octet-stream',
+                                 {'X-Sample-Format': 'float32le', 'X-Channels': channels})
+
+        pending = bytearray()
+
+        async def flush(size):
+            nonlocal zi
+            frames = np.frombuffer(bytes(pending[:size]), dtype='<f4').reshape(-1, channels)
+            del pending[:size]
+            filtered, zi = await self._run(_filter_block, sos, frames.astype(np.float64), zi)
+            await self._send_chunk(writer, filtered.astype('<f4').tobytes())
+
+        async for data in self._iter_body(reader, headers):
+            pending += data
+            if len(pending) >= min_bytes:
+                await flush(len(pending) - len(pending) % frame_bytes)
+        if len(pending) % frame_bytes:
+            raise HTTPError(400, "数据长度不是整数帧")
+        if pending:
+            await flush(len(pending))
+        await self._end_stream(writer)
+
+    async def _handle_denoise(self, reader, writer, response, headers, query):
+        """整文件降噪: 接收WAV, 用处理器的滤波器处理后以分块方式返回WAV"""
+        preset = query.get('preset', 'lowpass')
+        if preset not in PROCESSOR_PRESETS:
+            raise HTTPError(400, f"preset 必须是 {list(PROCESSOR_PRESETS)} 之一")
+
+        upload = bytearray()
+        async for data in self._iter_body(reader, headers):
+            upload += data
+            if len(upload) > self.max_upload_bytes:
+                raise HTTPError(413, "上传文件过大")
+
+        try:
+            result = await self._run(_denoise_wav, bytes(upload), preset)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        await self._start_stream(writer, response, 'audio/wav')
+        for start in range(0, len(result), RESPONSE_CHUNK_BYTES):
+            await self._send_chunk(writer, result[start:start + RESPONSE_CHUNK_BYTES])
+        await self._end_stream(writer)
+
+    def metrics(self):
+        """服务统计"""
+        return {
+            **self.stats,
+            'active': self._active,
+            'queued': self._queued,
+            'max_active': self.max_active,
+            'max_queue': self.max_queue,
+            'latency': {name: stats.summary() for name, stats in self.latency.items()},
+        }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="音频降噪HTTP服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--workers', type=int, default=None, help="进程池大小")
+    parser.add_argument('--max-active', type=int, default=4, help="同时处理的请求数上限")
+    parser.add_argument('--max-queue', type=int, default=16, help="排队请求数上限")
+    args = parser.parse_args()
+
+    server = DenoiseServer(args.host, args.port, args.workers, args.max_active, args.max_queue)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -111,6 +111,1333 @@ def test_analysis_functions(audio_data, sample_rate):
         print(f"✗ 分析函数测试失败: {e}")
         return False
 
+def test_batch_metrics():
+    """测试批量评价指标"""
+    print("测试批量评价指标...")
+    try:
+        from utils.metrics import (calculate_snr_batch, calculate_segmental_snr,
+                                   calculate_psnr_batch, calculate_si_sdr, StreamingMetrics)
+        from utils.noise import calculate_snr
+        from utils.analysis import calculate_psnr
+        
+        rng = np.random.default_rng(0)
+        clean = rng.standard_normal((4096, 3))
+        noisy = clean + 0.1 * rng.standard_normal((4096, 3))
+        
+        # 批量结果与逐声道结果一致
+        snrs = calculate_snr_batch(clean, noisy)
+        for ch in range(3):
+            assert np.isclose(snrs[ch], calculate_snr(clean[:, ch], noisy[:, ch]))
+        assert np.isclose(np.mean(snrs), calculate_snr(clean, noisy))
+        assert np.isclose(calculate_psnr_batch(clean[:, 0], noisy[:, 0]),
+                          calculate_psnr(clean[:, 0], noisy[:, 0]))
+        
+        # (batch, samples) 布局
+        assert np.allclose(calculate_snr_batch(clean.T, noisy.T, axis=-1), snrs)
+        
+        # 误差为零时为 inf (与 calculate_snr 一致), 很小的信号不受防除零项影响
+        assert np.all(np.isinf(calculate_snr_batch(clean, clean)))
+        assert np.allclose(calculate_snr_batch(1e-7 * clean, 1e-7 * noisy), snrs)
+        
+        # SI-SDR 对幅度缩放不变
+        assert np.allclose(calculate_si_sdr(clean, noisy), calculate_si_sdr(clean, 3 * noisy))
+        
+        # 流式累加与一次性计算一致
+        stream = StreamingMetrics(frame_length=256)
+        for start in range(0, 4096, 1000):
+            stream.update(clean[start:start + 1000], noisy[start:start + 1000])
+        assert np.allclose(stream.snr, snrs)
+        assert np.allclose(stream.psnr, calculate_psnr_batch(clean, noisy))
+        assert np.allclose(stream.si_sdr(), calculate_si_sdr(clean, noisy))
+        assert np.allclose(stream.segmental_snr,
+                           calculate_segmental_snr(clean, noisy, frame_length=256))
+        
+        print("✓ 批量评价指标测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 批量评价指标测试失败: {e!r}")
+        return False
+
+def test_filter_sweep():
+    """测试滤波器参数扫描"""
+    print("测试滤波器参数扫描...")
+    try:
+        from utils.sweep import make_filter_grid, run_filter_sweep, format_sweep_table
+        
+        sample_rate = 16000
+        t = np.arange(sample_rate) / sample_rate
+        clean = np.sin(2 * np.pi * 440 * t)
+        noisy = clean + 0.3 * np.sin(2 * np.pi * 1500 * t)
+        
+        candidates = (
+            make_filter_grid('lowpass', cutoff_freq=[800, 6000], order=[2, 4],
+                             filter_type=['butterworth', 'elliptic'])
+            + make_filter_grid('notch', notch_freq=1500, quality_factor=[10, 30])
+            + make_filter_grid('lowpass', cutoff_freq=9000)  # 超过奈奎斯特频率, 应记录失败
+        )
+        assert len(candidates) == 11
+        
+        parallel = run_filter_sweep(noisy, clean, sample_rate, candidates, max_workers=2)
+        serial = run_filter_sweep(noisy, clean, sample_rate, candidates, max_workers=1)
+        
+        assert [r['params'] for r in parallel] == [r['params'] for r in serial]
+        assert np.allclose([r['snr'] for r in parallel], [r['snr'] for r in serial], equal_nan=True)
+        assert parallel[0]['snr_gain'] > 10
+        assert 'error' in parallel[-1]
+        print(format_sweep_table(parallel, limit=3))
+        
+        print("✓ 滤波器参数扫描测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 滤波器参数扫描测试失败: {e!r}")
+        return False
+
+def test_shared_arrays():
+    """测试共享内存数组"""
+    print("测试共享内存数组...")
+    try:
+        import pickle
+        from utils.shared import SharedAudioArray, map_channels
+        from utils.filters import design_lowpass_filter
+        from utils.noise import add_single_frequency_interference
+        
+        sample_rate = 8000
+        rng = np.random.default_rng(1)
+        stereo = rng.standard_normal((sample_rate, 2))
+        
+        with SharedAudioArray.from_array(stereo) as source, \
+                SharedAudioArray(stereo.shape) as dest:
+            # 序列化只包含共享内存名称, 反序列化后看到同一块数据
+            payload = pickle.dumps(source)
+            assert len(payload) < 200
+            attached = pickle.loads(payload)
+            assert np.array_equal(attached.array, stereo)
+            attached.close()
+            
+            # 多进程逐声道滤波, 结果写回共享输出
+            lowpass = design_lowpass_filter(1000, sample_rate)
+            map_channels(lowpass.filter, source, dest, max_workers=2)
+            assert np.allclose(dest.array, lowpass.filter(stereo))
+            
+            # 噪声函数同样可以写入共享输出
+            map_channels(add_single_frequency_interference, source, dest, max_workers=2,
+                         sample_rate=sample_rate, frequency=1500, amplitude=0.3)
+            assert np.allclose(dest.array, add_single_frequency_interference(stereo, sample_rate))
+        
+        assert source.closed and dest.closed
+        
+        print("✓ 共享内存数组测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 共享内存数组测试失败: {e!r}")
+        return False
+
+def test_chunked_filtering():
+    """测试分段并行零相位滤波"""
+    print("测试分段并行滤波...")
+    try:
+        from utils.filters import design_lowpass_filter, design_notch_filter, design_bandpass_filter
+        
+        sample_rate = 44100
+        rng = np.random.default_rng(2)
+        long_signal = rng.standard_normal((sample_rate * 5, 2))
+        
+        filters = [
+            design_lowpass_filter(3000, sample_rate),
+            design_notch_filter(1500, sample_rate),
+            design_bandpass_filter(200, 8000, sample_rate, filter_type='elliptic'),
+        ]
+        for filter_obj in filters:
+            reference = filter_obj.filter(long_signal)
+            chunked = filter_obj.filter_chunked(long_signal, chunk_size=20000, max_workers=4)
+            # 与整段 filtfilt 的误差受预热区衰减阈值约束
+            error = np.max(np.abs(chunked - reference)) / np.max(np.abs(long_signal))
+            assert error < 1e-5, f"{filter_obj.filter_type} 误差过大: {error}"
+            
+            mono = filter_obj.filter_chunked(long_signal[:, 0], chunk_size=20000)
+            assert np.max(np.abs(mono - reference[:, 0])) < 1e-5 * np.max(np.abs(long_signal))
+        
+        print("✓ 分段并行滤波测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 分段并行滤波测试失败: {e!r}")
+        return False
+
+def test_import_time():
+    """测试导入开销 (防止重量级依赖被重新提前导入)"""
+    print("测试导入开销...")
+    try:
+        import json
+        import subprocess
+        
+        probe = (
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "import utils\n"
+            "utils_time = time.perf_counter() - start\n"
+            "import main\n"
+            "total_time = time.perf_counter() - start\n"
+            "heavy = [m for m in ('matplotlib', 'sounddevice', 'tkinter') if m in sys.modules]\n"
+            "print(json.dumps({'utils': utils_time, 'total': total_time, 'heavy': heavy}))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        )
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"  import utils: {stats['utils'] * 1000:.1f}ms, import main: {stats['total'] * 1000:.1f}ms")
+        
+        assert stats['heavy'] == [], f"无界面导入时加载了: {stats['heavy']}"
+        assert stats['utils'] < 0.05, "import utils 不应导入任何子模块"
+        
+        # 访问导出名称时才加载对应子模块
+        import utils
+        assert callable(utils.calculate_snr_batch)
+        assert 'calculate_snr_batch' in dir(utils)
+        
+        print("✓ 导入开销测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 导入开销测试失败: {e!r}")
+        return False
+
+def test_audio_writer():
+    """测试逐块音频写入"""
+    print("测试逐块音频写入...")
+    try:
+        import tempfile
+        import soundfile as sf
+        from utils.audio_io import AudioSink, ConcurrentAudioWriter
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(3)
+        stereo = np.clip(0.3 * rng.standard_normal((sample_rate, 2)), -1, 1)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 块大小不整除总长度, 检查块边界
+            with AudioSink(f"{tmp_dir}/float.wav", sample_rate, 2, subtype='FLOAT',
+                           block_size=1000) as sink:
+                sink.write(stereo[:7000])
+                sink.write(stereo[7000:])
+            data, sr = sf.read(f"{tmp_dir}/float.wav")
+            assert sr == sample_rate and np.allclose(data, stereo, atol=1e-7)
+            
+            with ConcurrentAudioWriter(block_size=4096) as writer:
+                writer.submit(f"{tmp_dir}/pcm16.wav", stereo, sample_rate, 'PCM_16')
+                writer.submit(f"{tmp_dir}/pcm24.flac", stereo, sample_rate, 'PCM_24')
+                writer.submit(f"{tmp_dir}/clipped.wav", 2 * stereo[:, 0], sample_rate, 'PCM_16')
+                errors = [error for _, error in writer.wait() if error is not None]
+            assert not errors, errors
+            
+            # close 返回未等待过的任务结果, 写入失败时给出异常
+            writer = ConcurrentAudioWriter()
+            writer.submit(f"{tmp_dir}/missing/out.wav", stereo, sample_rate, 'PCM_16')
+            (path, error), = writer.close()
+            assert path is None and error is not None
+            
+            assert np.allclose(sf.read(f"{tmp_dir}/pcm16.wav")[0], stereo, atol=1 / 2 ** 15)
+            assert np.allclose(sf.read(f"{tmp_dir}/pcm24.flac")[0], stereo, atol=1 / 2 ** 23)
+            clipped = sf.read(f"{tmp_dir}/clipped.wav")[0]
+            assert np.max(np.abs(clipped)) <= 1.0
+            
+            # FLAC 不支持浮点采样格式
+            try:
+                AudioSink(f"{tmp_dir}/bad.flac", sample_rate, 2, subtype='FLOAT')
+                assert False, "应当拒绝 FLAC + FLOAT"
+            except ValueError:
+                pass
+        
+        print("✓ 逐块音频写入测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 逐块音频写入测试失败: {e!r}")
+        return False
+
+def test_spectrogram_engine():
+    """测试增量频谱图引擎"""
+    print("测试增量频谱图引擎...")
+    try:
+        import tempfile
+        from scipy import signal as sp_signal
+        from utils.spectrogram import (StreamingSTFT, compute_spectrogram,
+                                       downsample_spectrogram, SpectrogramStore)
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(4)
+        test_signal = rng.standard_normal(sample_rate * 3)
+        
+        # 与 scipy.signal.spectrogram 一致
+        f, t, Sxx = sp_signal.spectrogram(test_signal, sample_rate, nperseg=1024,
+                                          noverlap=512, window='hann', detrend=False)
+        frequencies, times, spec_db = compute_spectrogram(test_signal, sample_rate,
+                                                          block_size=3000)
+        assert np.allclose(frequencies, f) and np.allclose(times, t)
+        assert np.allclose(spec_db.T, 10 * np.log10(Sxx + 1e-10), atol=1e-3)
+        
+        # 任意块划分得到相同的帧
+        stft = StreamingSTFT(sample_rate)
+        frames = np.concatenate([stft.process(test_signal[i:i + 777])
+                                 for i in range(0, len(test_signal), 777)])
+        assert np.allclose(frames, spec_db)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for encoding, atol in (('float16', 0.05), ('uint8', 0.4)):
+                stored = compute_spectrogram(test_signal, sample_rate, store_path=f"{tmp_dir}/{encoding}.spec",
+                                             encoding=encoding)
+                assert isinstance(stored.frames, np.memmap)
+                assert np.allclose(stored.to_db(), spec_db, atol=atol)
+                del stored
+            
+            # 直接逐块追加写入, 再以内存映射方式读回
+            with SpectrogramStore(f"{tmp_dir}/direct.spec", stft.n_bins, sample_rate, stft.hop,
+                                  stft.nperseg) as store:
+                store.append(spec_db[:50])
+                store.append(spec_db[50:])
+            reopened = SpectrogramStore.open(f"{tmp_dir}/direct.spec")
+            assert len(reopened) == len(spec_db) and isinstance(reopened.frames, np.memmap)
+            assert np.allclose(reopened.to_db(), spec_db, atol=0.05)
+            del reopened
+            
+            # 显示降采样按块取最大值
+            image = downsample_spectrogram(spec_db, max_columns=10, max_rows=64)
+            assert image.shape[0] <= 64 and image.shape[1] == 10
+            assert np.isclose(image.max(), spec_db.max())
+        
+        print("✓ 增量频谱图引擎测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 增量频谱图引擎测试失败: {e!r}")
+        return False
+
+def test_result_cache():
+    """测试磁盘结果缓存"""
+    print("测试磁盘结果缓存...")
+    try:
+        import tempfile
+        import time
+        from utils.cache import ResultCache
+        from utils.noise import add_gaussian_noise
+        
+        rng = np.random.default_rng(5)
+        audio = rng.standard_normal((4000, 2))
+        
+        # 相同种子的噪声可以复现, 才能安全缓存
+        noisy_a = add_gaussian_noise(audio, 10, rng=np.random.default_rng(42))
+        noisy_b = add_gaussian_noise(audio, 10, rng=np.random.default_rng(42))
+        assert np.array_equal(noisy_a, noisy_b)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 每个结果约 64KB, 上限只能容纳两个
+            cache = ResultCache(tmp_dir, max_bytes=150 * 1024)
+            audio_key = ResultCache.hash_array(audio)
+            assert audio_key == ResultCache.hash_array(audio.copy())
+            
+            key = cache.make_key('noise', audio_key, 'gaussian', {'snr_db': 10}, 42)
+            calls = []
+            def compute():
+                calls.append(1)
+                return noisy_a
+            
+            first, hit = cache.get_or_compute(key, compute)
+            assert not hit
+            second, hit = cache.get_or_compute(key, compute)
+            assert hit and len(calls) == 1
+            assert isinstance(second, np.memmap) and np.array_equal(second, noisy_a)
+            # 命中与未命中返回的结果都只读, compute 返回的数组本身不受影响
+            assert not first.flags.writeable and not second.flags.writeable
+            assert noisy_a.flags.writeable
+            
+            # 超过总大小上限时淘汰最久未使用的结果
+            other_keys = [cache.make_key('noise', audio_key, 'gaussian', {'snr_db': snr}, 42)
+                          for snr in (20, 30)]
+            time.sleep(0.01)
+            cache.put(other_keys[0], noisy_a)
+            time.sleep(0.01)
+            assert cache.get(key) is not None  # 访问后成为最近使用
+            time.sleep(0.01)
+            cache.put(other_keys[1], noisy_a)
+            assert key in cache and other_keys[1] in cache
+            assert other_keys[0] not in cache
+            assert cache.total_bytes() <= cache.max_bytes
+            
+            # 仍被映射而无法删除的文件 (Windows) 在淘汰时跳过, 不中断写入
+            from pathlib import Path
+            from unittest import mock
+            original_unlink = Path.unlink
+            def unlink(path, *args, **kwargs):
+                if path.stem == key:
+                    raise PermissionError("文件正被映射")
+                return original_unlink(path, *args, **kwargs)
+            time.sleep(0.01)
+            with mock.patch.object(Path, 'unlink', unlink):
+                cache.put(other_keys[0], noisy_a)
+            assert key in cache and other_keys[0] in cache and other_keys[1] not in cache
+        
+        print("✓ 磁盘结果缓存测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 磁盘结果缓存测试失败: {e!r}")
+        return False
+
+def test_noise_synthesizer():
+    """测试频域噪声合成"""
+    print("测试频域噪声合成...")
+    try:
+        from scipy import signal as sp_signal
+        from utils.synth import synthesize_noise, NoiseStream
+        from utils.noise import add_narrowband_noise, add_colored_noise
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(11)
+        
+        # 目标功率精确 (每个声道)
+        noise = synthesize_noise(20001, sample_rate, 'pink', power=[0.5, 2.0], channels=2, rng=rng)
+        assert noise.shape == (20001, 2)
+        assert np.allclose(np.mean(noise ** 2, axis=0), [0.5, 2.0], rtol=1e-10)
+        
+        # 多频带噪声的能量集中在带内
+        bands = [(1000, 1500), (4000, 4500, -6)]
+        noise = synthesize_noise(32000, sample_rate, bands, power=1.0, rng=rng)
+        freqs, psd = sp_signal.welch(noise, sample_rate, nperseg=1024)
+        in_band = ((freqs >= 1000) & (freqs <= 1500)) | ((freqs >= 4000) & (freqs <= 4500))
+        assert np.sum(psd[in_band]) / np.sum(psd) > 0.95
+        
+        # 实测噪声谱 (freqs, psd) 作为谱形
+        profile = (freqs, psd)
+        noise = synthesize_noise(32000, sample_rate, profile, power=0.1, rng=rng)
+        assert np.isclose(np.mean(noise ** 2), 0.1)
+        
+        # 窄带噪声的信噪比精确, 同一种子可复现
+        audio = np.sin(2 * np.pi * 440 * np.arange(16000) / sample_rate)
+        noisy = add_narrowband_noise(audio, sample_rate, 1000, 2000, 15, rng=np.random.default_rng(3))
+        again = add_narrowband_noise(audio, sample_rate, 1000, 2000, 15, rng=np.random.default_rng(3))
+        assert np.array_equal(noisy, again)
+        snr = 10 * np.log10(np.mean(audio ** 2) / np.mean((noisy - audio) ** 2))
+        assert abs(snr - 15) < 1e-8
+        noisy = add_colored_noise(np.column_stack([audio, audio]), sample_rate, 'brown', 10, rng=rng)
+        assert noisy.shape == (16000, 2)
+        
+        # 流式生成: 分块读取与一次读取结果一致, 长期平均功率接近目标
+        stream_a = NoiseStream(sample_rate, 'pink', power=0.25, frame_size=2048,
+                               rng=np.random.default_rng(8))
+        stream_b = NoiseStream(sample_rate, 'pink', power=0.25, frame_size=2048,
+                               rng=np.random.default_rng(8))
+        whole = stream_a.read(200000)
+        parts = np.concatenate([stream_b.read(n) for n in (1, 999, 50000, 149000)])
+        assert np.array_equal(whole, parts)
+        assert abs(np.mean(whole ** 2) / 0.25 - 1) < 0.1
+        
+        print("✓ 频域噪声合成测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 频域噪声合成测试失败: {e!r}")
+        return False
+
+def test_noise_profiles():
+    """测试噪声谱库"""
+    print("测试噪声谱库...")
+    try:
+        import tempfile
+        from scipy import signal as sp_signal
+        from utils.profiles import (capture_noise_profile, generate_profile_noise, NoiseProfile,
+                                    NoiseProfileLibrary)
+        from utils.noise import add_profile_noise
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(21)
+        # 模拟录音: 前2秒只有低频嗡声 + 带限噪声
+        t = np.arange(4 * sample_rate) / sample_rate
+        hum = 0.1 * np.sin(2 * np.pi * 100 * t)
+        b, a = sp_signal.butter(4, [2000, 3000], btype='band', fs=sample_rate)
+        recording = hum + sp_signal.lfilter(b, a, 0.2 * rng.standard_normal(len(t)))
+        
+        profile = capture_noise_profile(recording, sample_rate, 'hum_band', end=2.0,
+                                        loop_seconds=0.5, source='synthetic')
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            library = NoiseProfileLibrary(tmp_dir)
+            library.save(profile)
+            # 重新打开目录, 从索引读取
+            library = NoiseProfileLibrary(tmp_dir)
+            assert library.names() == ['hum_band']
+            loaded = library.load('hum_band')
+            assert np.array_equal(loaded.psd, profile.psd) and len(loaded.loop) == 8000
+            
+            # 生成的噪声谱形与原噪声一致
+            noise = generate_profile_noise(loaded, 48000, sample_rate, power=1.0, rng=rng)
+            assert np.isclose(np.mean(noise ** 2), 1.0)
+            freqs, psd = sp_signal.welch(noise, sample_rate, nperseg=2048)
+            in_band = ((freqs >= 1900) & (freqs <= 3100)) | ((freqs >= 80) & (freqs <= 120))
+            assert np.sum(psd[in_band]) / np.sum(psd) > 0.9
+            
+            # 整形数组被缓存, 重复生成同样长度的噪声不再插值
+            assert loaded.shaping_psd(48000, sample_rate) is loaded.shaping_psd(48000, sample_rate)
+            
+            # 以指定信噪比添加 (谱合成与循环回放两种方式)
+            clean = np.column_stack([np.sin(2 * np.pi * 440 * t[:16000])] * 2)
+            for method in ('psd', 'loop'):
+                noisy = add_profile_noise(clean, sample_rate, loaded, snr_db=5, method=method, rng=rng)
+                snr = 10 * np.log10(np.mean(clean ** 2, axis=0) / np.mean((noisy - clean) ** 2, axis=0))
+                assert np.allclose(snr, 5)
+            
+            library.remove('hum_band')
+            assert 'hum_band' not in NoiseProfileLibrary(tmp_dir)
+            
+            # 名称用作文件名, 不允许写到库目录之外
+            for name in ('../escape', 'sub/dir', '..'):
+                escaped = NoiseProfile(name, sample_rate, profile.frequencies, profile.psd)
+                try:
+                    library.save(escaped)
+                    raise AssertionError(f"未拒绝名称 {name!r}")
+                except ValueError:
+                    pass
+            assert len(library) == 0 and not os.path.exists(os.path.join(tmp_dir, '..', 'escape.npz'))
+        
+        print("✓ 噪声谱库测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 噪声谱库测试失败: {e!r}")
+        return False
+
+def test_augmentation():
+    """测试数据增强生成器"""
+    print("测试数据增强生成器...")
+    try:
+        import tempfile
+        import soundfile as sf
+        from utils.augment import AugmentedBatches
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(9)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = []
+            for i, (frames, channels) in enumerate([(40000, 1), (25000, 2), (3000, 1)]):
+                path = os.path.join(tmp_dir, f"clip_{i}.wav")
+                sf.write(path, 0.3 * rng.uniform(-1, 1, (frames, channels)), sample_rate, subtype='FLOAT')
+                files.append(path)
+            
+            batches = AugmentedBatches(files, segment_length=4000, batch_size=6, seed=123,
+                                       batches_per_epoch=5, num_workers=2, prefetch=3)
+            first = list(batches.iter_epoch(0))
+            assert len(first) == 5
+            noisy, clean, params = first[0]
+            assert noisy.shape == clean.shape == (6, 4000)
+            assert noisy.dtype == clean.dtype == np.float32 and noisy.flags.c_contiguous
+            assert len(params) == 6 and not np.array_equal(noisy, clean)
+            
+            # 纯净片段就是文件中对应位置的数据 (短文件补零, 多声道取平均)
+            for row, item in enumerate(params):
+                data, _ = sf.read(item['file'], start=item['offset'], frames=4000,
+                                  dtype='float32', always_2d=True)
+                expected = np.zeros(4000, dtype=np.float32)
+                expected[:len(data)] = data.mean(axis=1)
+                assert np.allclose(clean[row], expected, atol=1e-7)
+            
+            # 同一轮次结果与线程数无关, 不同轮次结果不同
+            serial = AugmentedBatches(files, 4000, 6, seed=123, batches_per_epoch=5, num_workers=1)
+            again = list(serial.iter_epoch(0))
+            assert all(np.array_equal(a[0], b[0]) and a[2] == b[2] for a, b in zip(first, again))
+            other = next(iter(serial.iter_epoch(1)))
+            assert not np.array_equal(other[1], first[0][1])
+            
+            # 提前结束迭代不会卡住
+            for _ in batches:
+                break
+            assert batches.epoch == 1
+        
+        print("✓ 数据增强生成器测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 数据增强生成器测试失败: {e!r}")
+        return False
+
+def test_impulse_removal():
+    """测试稀疏脉冲噪声与脉冲去除"""
+    print("测试脉冲噪声去除...")
+    try:
+        from utils.noise import add_impulse_noise
+        from utils.filters import remove_impulse_noise, ImpulseRemover
+        
+        rng = np.random.default_rng(17)
+        t = np.arange(60000) / 16000
+        clean = np.column_stack([np.sin(2 * np.pi * 300 * t), np.sin(2 * np.pi * 700 * t)]) * 0.5
+        clean += 0.01 * rng.standard_normal(clean.shape)
+        
+        # 稀疏生成的脉冲个数符合给定概率
+        noisy = add_impulse_noise(clean, probability=0.01, amplitude=0.8, rng=rng)
+        impulses = noisy != clean
+        assert abs(impulses.sum() / impulses.size - 0.01) < 0.002
+        
+        # 检测出全部脉冲且几乎没有误检
+        cleaned, mask = remove_impulse_noise(noisy, return_mask=True)
+        assert np.all(mask[impulses]) and mask.sum() <= impulses.sum() * 1.05
+        error_before = np.sqrt(np.mean((noisy - clean) ** 2))
+        error_after = np.sqrt(np.mean((cleaned - clean) ** 2))
+        assert error_after < error_before / 10
+        interpolated = remove_impulse_noise(noisy, method='interpolate')
+        assert np.sqrt(np.mean((interpolated - clean) ** 2)) < error_after
+        
+        # 流式处理与整段处理逐点一致
+        remover = ImpulseRemover(scale=0.01)
+        blocks = [remover.process(noisy[i:i + 1001]) for i in range(0, len(noisy), 1001)]
+        streamed = np.concatenate(blocks + [remover.flush()])
+        assert np.array_equal(streamed, remove_impulse_noise(noisy, scale=0.01))
+        
+        print("✓ 脉冲噪声去除测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 脉冲噪声去除测试失败: {e!r}")
+        return False
+
+def test_adaptive_cancellation():
+    """测试自适应噪声抵消"""
+    print("测试自适应噪声抵消...")
+    try:
+        from scipy import signal as sp_signal
+        from utils.filters import AdaptiveNoiseCanceller
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(4)
+        n = 4 * sample_rate
+        clean = 0.5 * np.sin(2 * np.pi * 440 * np.arange(n) / sample_rate)
+        reference = rng.standard_normal(n)
+        # 参考噪声经过未知的声学路径进入主通道
+        noise = sp_signal.lfilter(sp_signal.firwin(32, 0.3), 1, reference)
+        primary = clean + noise
+        
+        canceller = AdaptiveNoiseCanceller(filter_length=64, mu=0.5, sample_rate=sample_rate)
+        output = canceller.run(primary, reference, chunk_size=4096)
+        tail = slice(-sample_rate, None)
+        residual = np.mean((output[tail] - clean[tail]) ** 2)
+        assert residual < np.mean(noise ** 2) / 100
+        
+        # 分块处理 (块长为更新块长的整数倍) 与一次处理结果相同, 状态在块之间保留
+        whole = AdaptiveNoiseCanceller(filter_length=64, mu=0.5).process(primary, reference)
+        assert np.allclose(whole, output)
+        
+        metrics = canceller.metrics()
+        assert metrics['samples'] == n and metrics['realtime_factor'] > 1
+        assert metrics['convergence_time'] is not None and metrics['convergence_time'] < 2
+        
+        # 继续处理时从已收敛的权值开始
+        again = canceller.run(primary[:4096], reference[:4096])
+        assert np.mean((again - clean[:4096]) ** 2) < np.mean(noise ** 2) / 100
+        
+        print("✓ 自适应噪声抵消测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 自适应噪声抵消测试失败: {e!r}")
+        return False
+
+def test_http_server():
+    """测试本地降噪服务"""
+    print("测试降噪HTTP服务...")
+    server = None
+    try:
+        import json
+        import socket
+        import time
+        import http.client
+        from scipy import signal as sp_signal
+        from server import DenoiseServer
+        from utils.filters import design_lowpass_filter
+        
+        server = DenoiseServer(port=0, max_workers=1, max_active=1, max_queue=0,
+                               block_frames=1000).start_background()
+        
+        # 分块上传, 流式返回; 结果与整段因果滤波一致
+        rng = np.random.default_rng(2)
+        audio = rng.standard_normal((12000, 2)).astype(np.float32)
+        body = audio.tobytes()
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        conn.request('POST', '/filter?design=lowpass&cutoff_freq=3000&sample_rate=16000&channels=2',
+                     body=(body[i:i + 5000] for i in range(0, len(body), 5000)), encode_chunked=True)
+        response = conn.getresponse()
+        assert response.status == 200
+        filtered = np.frombuffer(response.read(), dtype='<f4').reshape(-1, 2)
+        filter_obj = design_lowpass_filter(3000, 16000)
+        expected = sp_signal.sosfilt(sp_signal.tf2sos(filter_obj.b, filter_obj.a), audio, axis=0)
+        assert filtered.shape == audio.shape and np.allclose(filtered, expected, atol=1e-5)
+        
+        # 处理中的请求占满且不允许排队时返回 503
+        busy = socket.create_connection(('127.0.0.1', server.port))
+        busy.sendall(b"POST /filter?design=lowpass&cutoff_freq=3000&sample_rate=16000 HTTP/1.1\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        time.sleep(0.2)
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        conn.request('POST', '/filter?design=lowpass&cutoff_freq=3000&sample_rate=16000', body=b'')
+        response = conn.getresponse()
+        assert response.status == 503 and response.getheader('Retry-After') == '1'
+        response.read()
+        busy.sendall(b"0\r\n\r\n")
+        assert busy.recv(64).startswith(b"HTTP/1.1 200")
+        busy.close()
+        
+        # 参数错误返回 400
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        conn.request('POST', '/filter?design=unknown&sample_rate=16000', body=b'')
+        response = conn.getresponse()
+        assert response.status == 400
+        response.read()
+        
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        conn.request('POST', '/filter?design=lowpass&cutoff_freq=3000&sample_rate=16000&channels=two', body=b'')
+        response = conn.getresponse()
+        assert response.status == 400
+        response.read()
+        
+        # 上传WAV按处理器的预设滤波
+        import io
+        import soundfile as sf
+        wav = io.BytesIO()
+        sf.write(wav, audio, 16000, format='WAV', subtype='FLOAT')
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        conn.request('POST', '/denoise?preset=lowpass', body=wav.getvalue())
+        response = conn.getresponse()
+        assert response.status == 200
+        denoised, _ = sf.read(io.BytesIO(response.read()))
+        assert np.allclose(denoised, filter_obj.filter(audio.astype(np.float64)), atol=1e-5)
+        
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        conn.request('GET', '/metrics')
+        metrics = json.loads(conn.getresponse().read())
+        assert metrics['rejected'] == 1 and metrics['latency']['chunk']['count'] > 1
+        assert 'p95_ms' in metrics['latency']['request']
+        
+        print("✓ 降噪HTTP服务测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 降噪HTTP服务测试失败: {e!r}")
+        return False
+    finally:
+        if server is not None:
+            server.stop_background()
+
+def test_filter_chain():
+    """测试滤波器级联合并"""
+    print("测试滤波器级联...")
+    try:
+        from utils.filters import (Filter, FilterChain, design_lowpass_filter,
+                                   design_bandpass_filter, design_notch_filter)
+        
+        sample_rate = 44100
+        stages = [
+            design_lowpass_filter(8000, sample_rate),
+            design_bandpass_filter(200, 6000, sample_rate),
+            design_notch_filter(1500, sample_rate),
+        ]
+        identity = Filter(np.array([1.0]), np.array([1.0]), sample_rate, "Identity")
+        chain = FilterChain(stages + [identity])
+        assert chain.removed_stages == 1 and chain.n_sections == 7
+        
+        # 与逐级 filtfilt 等价 (边界处理不同, 只比较远离两端的部分)
+        audio = np.random.default_rng(6).standard_normal((5 * sample_rate, 2))
+        sequential = audio
+        for stage in stages:
+            sequential = stage.filter(sequential)
+        combined = chain.filter(audio)
+        interior = slice(sample_rate, -sample_rate)
+        assert np.allclose(combined[interior], sequential[interior], atol=1e-6)
+        
+        # 频率响应等于各级响应之积
+        _, magnitude, _ = chain.get_frequency_response(512)
+        product = np.prod([stage.get_frequency_response(512)[1] for stage in stages], axis=0)
+        assert np.allclose(magnitude, product, atol=1e-8)
+        
+        # 滤波器与其逆滤波器级联后零极点全部抵消
+        notch = stages[2]
+        inverse = Filter(notch.a, notch.b, sample_rate, "InverseNotch")
+        cancelled = FilterChain([notch, inverse])
+        assert cancelled.cancelled_pairs == 2 * (len(notch.a) - 1)
+        assert np.allclose(cancelled.filter(audio), audio)
+        
+        # 可代替 Filter 用于缓存键、参数扫描和有声段处理
+        from utils.response import filter_key
+        from utils.vad import SegmentIndex
+        assert chain.order == sum(stage.order for stage in stages)
+        assert chain.impulse_response_length() >= max(stage.impulse_response_length() for stage in stages)
+        assert filter_key(chain) != filter_key(stages[0])
+        mask = np.zeros(len(audio), dtype=bool)
+        mask[2 * sample_rate:3 * sample_rate] = True
+        segments = SegmentIndex.from_mask(mask, sample_rate)
+        partial = segments.apply(chain.filter, audio, context=chain.impulse_response_length())
+        assert np.allclose(partial[mask], combined[mask], atol=1e-6)
+        
+        print("✓ 滤波器级联测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 滤波器级联测试失败: {e!r}")
+        return False
+
+def test_filter_response():
+    """测试批量滤波器响应分析"""
+    print("测试滤波器响应分析...")
+    try:
+        from scipy import signal
+        from utils.filters import (FilterChain, design_lowpass_filter, design_highpass_filter,
+                                   design_notch_filter)
+        from utils.response import (ResponseCache, batch_frequency_response, analyze_filters,
+                                    frequency_grid)
+        
+        sample_rate = 44100
+        filters = [design_lowpass_filter(cutoff, sample_rate, order=order, filter_type=kind)
+                   for cutoff in (1000, 4000) for order in (4, 6)
+                   for kind in ('butterworth', 'chebyshev1', 'elliptic')]
+        filters.append(design_notch_filter(1000, sample_rate))
+        chain = FilterChain([filters[0], design_highpass_filter(100, sample_rate)])
+        filters.append(chain)
+        
+        cache = ResponseCache()
+        frequencies, response, group_delay = batch_frequency_response(filters, cache=cache)
+        assert response.shape == (len(filters), 1024) and cache.misses == len(filters)
+        
+        # 与 scipy 逐个计算的结果一致 (群延迟按二阶节求和作参考, 只在通带内比较)
+        for i, f in enumerate(filters[:-1]):
+            _, h = signal.freqz(f.b, f.a, worN=1024)
+            gd = sum(signal.group_delay((section[:3], section[3:]), w=1024)[1]
+                     for section in signal.tf2sos(f.b, f.a))
+            assert np.allclose(response[i], h, atol=1e-8)
+            passband = np.abs(h) > 0.5
+            assert np.allclose(group_delay[i][passband], gd[passband], rtol=1e-4, atol=1e-4)
+        _, h = signal.sosfreqz(chain.sos, worN=1024)
+        assert np.allclose(response[-1], h, atol=1e-8)
+        
+        # 重复计算命中缓存
+        _, cached_response, _ = batch_frequency_response(filters, cache=cache)
+        assert cache.hits == len(filters) and np.array_equal(cached_response, response)
+        
+        # 指标: -3 dB 点在截止频率附近, 阻带衰减足够大
+        metrics = analyze_filters([filters[0]], stopband=(4000, 20000), cache=cache)[0]
+        assert abs(metrics['cutoff_3db'][0] - 1000) < 30
+        assert metrics['stopband_attenuation_db'] > 40 and metrics['group_delay_ms'] > 0
+        
+        # 对数网格
+        grid = frequency_grid(sample_rate, 256, log=True)
+        assert np.isclose(grid[0], 10) and np.isclose(grid[-1], sample_rate / 2)
+        
+        # Filter.get_frequency_response 结果被缓存
+        assert filters[0].get_frequency_response(512)[1] is filters[0].get_frequency_response(512)[1]
+        
+        print("✓ 滤波器响应分析测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 滤波器响应分析测试失败: {e!r}")
+        return False
+
+def test_profiling():
+    """测试性能剖析"""
+    print("测试性能剖析...")
+    try:
+        import json
+        import pstats
+        import tempfile
+        from utils.profiling import Profiler, profile_calls
+        from utils.filters import design_lowpass_filter
+        from utils.noise import add_gaussian_noise
+        
+        sample_rate = 44100
+        audio = np.random.default_rng(8).standard_normal(2 * sample_rate)
+        lowpass = design_lowpass_filter(4000, sample_rate)
+        
+        # 未启用时不记录
+        profiler = Profiler()
+        lowpass.filter(audio)
+        assert profiler.stats == {}
+        
+        with profile_calls(profiler, trace_memory=True):
+            noisy = add_gaussian_noise(audio, 10)
+            lowpass.filter(noisy)
+            lowpass.filter_chunked(noisy)
+        lowpass.filter(audio)
+        
+        stats = profiler.to_dict()
+        filter_stats = stats['utils.filters.Filter.filter']
+        assert filter_stats['calls'] == 2 and filter_stats['samples'] == 2 * len(audio)
+        assert filter_stats['bytes'] > audio.nbytes
+        assert stats['utils.noise.add_gaussian_noise']['calls'] == 1
+        # 嵌套调用的耗时计入外层累计时间, 不计入外层自身时间
+        chunked = stats['utils.filters.Filter.filter_chunked']
+        assert chunked['own_time'] <= chunked['total_time']
+        
+        # utils.filters 已导入 (子模块 utils.profiling 已绑定到包上) 后仍能从 utils 导入上下文管理器
+        from utils import profile_calls as exported
+        assert exported is profile_calls
+        with exported() as session:
+            lowpass.filter(audio)
+        assert session.to_dict()['utils.filters.Filter.filter']['calls'] == 1
+        
+        assert json.loads(profiler.to_json())['utils.noise.add_gaussian_noise']['samples'] == len(audio)
+        assert 'Filter.filter' in profiler.report()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'profile.prof')
+            profiler.dump_stats(path)
+            assert pstats.Stats(path).total_calls == sum(row['calls'] for row in stats.values())
+        
+        print("✓ 性能剖析测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 性能剖析测试失败: {e!r}")
+        return False
+
+def test_playback_engine():
+    """测试播放引擎 (直接调用音频回调, 不打开音频设备)"""
+    print("测试播放引擎...")
+    try:
+        from utils.playback import PlaybackEngine
+        
+        sample_rate = 1000
+        ramp = np.arange(sample_rate, dtype=np.float32) / sample_rate
+        engine = PlaybackEngine(sample_rate, channels=2)
+        engine.enqueue({'original': ramp, 'filtered': -ramp}, "对比")
+        engine.enqueue(np.ones((300, 2)), "下一段")
+        out = np.empty((256, 2), dtype=np.float32)
+        
+        # 单声道数据广播到两个声道
+        engine.callback(out, 256, None, None)
+        assert np.array_equal(out[:, 0], ramp[:256]) and np.array_equal(out[:, 1], ramp[:256])
+        
+        # A/B 切换保持播放位置
+        engine.select('filtered')
+        engine.callback(out, 256, None, None)
+        assert np.array_equal(out[:, 0], -ramp[256:512])
+        
+        # 暂停时输出静音且位置不变
+        engine.pause()
+        engine.callback(out, 256, None, None)
+        assert not out.any() and engine.position == 0.512
+        engine.resume()
+        
+        # 跳转到片段末尾, 下一段无缝衔接
+        engine.seek(0.9)
+        engine.callback(out, 256, None, None)
+        assert np.array_equal(out[:100, 0], -ramp[900:]) and np.all(out[100:] == 1)
+        assert engine.current_label == "下一段" and not engine.wait(0)
+        
+        engine.callback(out, 256, None, None)
+        assert np.all(out[:144] == 1) and not out[144:].any() and engine.wait(0)
+        
+        try:
+            engine.enqueue(np.zeros((10, 3)))
+            raise AssertionError("声道数不匹配时应报错")
+        except ValueError:
+            pass
+        
+        print("✓ 播放引擎测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 播放引擎测试失败: {e!r}")
+        return False
+
+def test_voice_activity():
+    """测试有声段检测"""
+    print("测试有声段检测...")
+    try:
+        from utils.vad import SegmentIndex, detect_voice_activity
+        from utils.filters import design_lowpass_filter
+        from utils.analysis import calculate_snr
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(9)
+        t = np.arange(10 * sample_rate) / sample_rate
+        audio = 1e-3 * rng.standard_normal(len(t))
+        bursts = [(1.0, 2.0), (5.0, 5.5)]
+        for start, end in bursts:
+            inside = (t >= start) & (t < end)
+            audio[inside] += 0.3 * np.sin(2 * np.pi * 440 * t[inside])
+        # 能量不高但有音调结构的段由频谱平坦度检出
+        quiet = (t >= 8.0) & (t < 8.5)
+        audio[quiet] += 3e-3 * np.sin(2 * np.pi * 1000 * t[quiet])
+        
+        segments = detect_voice_activity(audio, sample_rate)
+        found = [(start / sample_rate, end / sample_rate) for start, end in segments]
+        assert len(found) == 3, found
+        for (start, end), (found_start, found_end) in zip(bursts + [(8.0, 8.5)], found):
+            assert found_start <= start and found_end >= end and found_end - found_start < end - start + 0.2
+        assert segments.active_ratio < 0.3
+        assert np.array_equal(SegmentIndex.from_mask(segments.mask, sample_rate).starts, segments.starts)
+        assert SegmentIndex.from_dict(segments.to_dict()).key == segments.key
+        
+        # 只滤波有声段: 段内与整段滤波一致, 静音段置零
+        lowpass = design_lowpass_filter(2000, sample_rate)
+        full = lowpass.filter(audio)
+        partial = segments.apply(lowpass.filter, audio, context=lowpass.impulse_response_length())
+        assert np.allclose(partial[segments.mask], full[segments.mask], atol=1e-6)
+        assert not partial[~segments.mask].any()
+        
+        # 有声段SNR不受静音段中噪声的影响
+        noisy = audio.copy()
+        noisy[~segments.mask] += 0.1 * rng.standard_normal(np.count_nonzero(~segments.mask))
+        assert calculate_snr(audio, noisy, segments) > 100 > calculate_snr(audio, noisy)
+        
+        print("✓ 有声段检测测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 有声段检测测试失败: {e!r}")
+        return False
+
+def test_multichannel_analysis():
+    """测试多声道频谱分析"""
+    print("测试多声道频谱分析...")
+    try:
+        from utils.analysis import calculate_spectral_centroid, calculate_spectral_rolloff
+        from utils.spectrogram import compute_spectrogram
+        
+        sample_rate = 8000
+        t = np.arange(sample_rate) / sample_rate
+        left = np.sin(2 * np.pi * 500 * t)
+        right = np.sin(2 * np.pi * 2000 * t)
+        stereo = np.column_stack([left, right])
+        
+        # 沿采样轴计算, 逐声道结果与单独计算一致
+        assert np.isclose(calculate_spectral_centroid(left, sample_rate), 500)
+        per_channel = calculate_spectral_centroid(stereo, sample_rate, channel_mode='per_channel')
+        assert np.allclose(per_channel, [500, 2000])
+        assert np.allclose(calculate_spectral_rolloff(stereo, sample_rate, channel_mode='per_channel'),
+                           [500, 2000])
+        # 混合与中声道等于 (L+R)/2 的结果
+        mix = calculate_spectral_centroid(stereo, sample_rate)
+        mid_side = calculate_spectral_centroid(stereo, sample_rate, channel_mode='mid_side')
+        assert np.isclose(mix, 1250) and np.allclose(mid_side, 1250)
+        
+        _, _, spec = compute_spectrogram(stereo, sample_rate, channel_mode='mid_side')
+        _, _, mid = compute_spectrogram((left + right) / 2, sample_rate)
+        _, _, side = compute_spectrogram((left - right) / 2, sample_rate)
+        assert spec.shape == (len(mid), 2, mid.shape[1])
+        assert np.allclose(spec[:, 0], mid, atol=1e-3) and np.allclose(spec[:, 1], side, atol=1e-3)
+        
+        try:
+            calculate_spectral_centroid(left, sample_rate, channel_mode='mid_side')
+            raise AssertionError("单声道输入不应支持中/侧模式")
+        except ValueError:
+            pass
+        
+        print("✓ 多声道频谱分析测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 多声道频谱分析测试失败: {e!r}")
+        return False
+
+def test_pcm():
+    """测试整数PCM读写"""
+    print("测试整数PCM读写...")
+    try:
+        import tempfile
+        import soundfile as sf
+        from utils.pcm import PCMArray, load_pcm
+        from utils.audio_io import AudioSink
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(5)
+        stereo = np.clip(0.3 * rng.standard_normal((sample_rate, 2)), -1, 1)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sf.write(f"{tmp_dir}/source.wav", stereo, sample_rate, subtype='PCM_16')
+            pcm = load_pcm(f"{tmp_dir}/source.wav")
+            assert pcm.dtype == np.int16 and pcm.subtype == 'PCM_16'
+            assert pcm.nbytes * 4 == stereo.nbytes
+            
+            # 按块转换的结果与 soundfile 直接读取浮点一致
+            reference = sf.read(f"{tmp_dir}/source.wav", dtype='float32')[0]
+            assert np.array_equal(pcm.to_float(np.float32, block_size=1000), reference)
+            blocks = np.concatenate([block.copy() for _, block in pcm.blocks(block_size=3000)])
+            assert np.array_equal(blocks, reference)
+            
+            # 量化结果与 libsndfile 写 PCM_16 一致
+            quantized = PCMArray.from_float(stereo, sample_rate, block_size=777)
+            assert np.array_equal(quantized.data, pcm.data)
+            
+            # PCM 直接写回整数采样, 无损
+            with AudioSink(f"{tmp_dir}/copy.wav", sample_rate, 2, subtype='PCM_16',
+                           block_size=1000) as sink:
+                sink.write(pcm[:5000])
+                sink.write(pcm[5000:])
+            assert np.array_equal(sf.read(f"{tmp_dir}/copy.wav", dtype='int16')[0], pcm.data)
+            
+            try:
+                PCMArray(stereo, sample_rate)
+                assert False, "应当拒绝浮点数据"
+            except ValueError:
+                pass
+        
+        print("✓ 整数PCM读写测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 整数PCM读写测试失败: {e!r}")
+        return False
+
+def test_batch_resume():
+    """测试批处理断点续跑"""
+    print("测试批处理断点续跑...")
+    try:
+        import tempfile
+        import soundfile as sf
+        from utils.batch import BatchRunner, CausalFilterStage, GaussianNoiseStage
+        from utils.filters import design_lowpass_filter
+        
+        class CrashStage:
+            """处理到第 n 块时模拟崩溃"""
+            def __init__(self, n):
+                self.n = n
+            def process(self, block):
+                self.n -= 1
+                if self.n < 0:
+                    raise RuntimeError("模拟崩溃")
+                return block
+            def get_state(self):
+                return {}
+            def set_state(self, state):
+                pass
+        
+        def make_stages(sample_rate, channels, crash_after=None):
+            stages = [GaussianNoiseStage(0.05, seed=7),
+                      CausalFilterStage(design_lowpass_filter(3000, sample_rate))]
+            return stages + [CrashStage(10 ** 9 if crash_after is None else crash_after)]
+        
+        sample_rate = 16000
+        rng = np.random.default_rng(6)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = [f"{tmp_dir}/a.wav", f"{tmp_dir}/b.wav"]
+            sf.write(files[0], 0.3 * rng.uniform(-1, 1, (50000, 2)), sample_rate)
+            sf.write(files[1], 0.3 * rng.uniform(-1, 1, 30000), sample_rate)
+            params = dict(block_size=4000, checkpoint_interval=3)
+            reference = BatchRunner(make_stages, f"{tmp_dir}/ref", **params).run(files)
+            
+            # 第一个文件处理到第11块时崩溃, 检查点停在第9块
+            crashing = lambda sr, ch: make_stages(sr, ch, crash_after=11)
+            try:
+                BatchRunner(crashing, f"{tmp_dir}/out", **params).run(files)
+                assert False, "应当模拟崩溃"
+            except RuntimeError:
+                pass
+            runner = BatchRunner(make_stages, f"{tmp_dir}/out", **params)
+            assert runner.checkpoint.current['offset'] == 36000
+            assert not runner.checkpoint.completed
+            
+            # 续跑结果与不中断时逐位相同, 已完成的文件不再处理
+            results = runner.run(files)
+            for path in files:
+                assert np.array_equal(sf.read(results[path], dtype='int16')[0],
+                                      sf.read(reference[path], dtype='int16')[0])
+            assert runner.checkpoint.current is None
+            rerun = BatchRunner(lambda sr, ch: make_stages(sr, ch, crash_after=0),
+                                f"{tmp_dir}/out", **params)
+            assert rerun.run(files) == results
+            
+            # 块大小变化时无法逐位续跑
+            try:
+                BatchRunner(make_stages, f"{tmp_dir}/out", block_size=2000)
+                assert False, "应当拒绝不同的块大小"
+            except ValueError:
+                pass
+        
+        print("✓ 批处理断点续跑测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 批处理断点续跑测试失败: {e!r}")
+        return False
+
+def _append_metrics(store, run_id, worker):
+    """进程池任务: 向指标库追加一批指标 (store 在子进程中按路径重新打开)"""
+    for i in range(50):
+        store.add_metrics(run_id, f"file_{i % 5}.wav", 'gaussian', f"filter_{worker}",
+                          snr_noisy=5.0, snr_filtered=5.0 + worker, filter_seconds=0.01)
+    store.close()
+    return worker
+
+
+def test_metrics_store():
+    """测试指标库"""
+    print("测试指标库...")
+    try:
+        import tempfile
+        from concurrent.futures import ProcessPoolExecutor
+        from utils.store import MetricsStore
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with MetricsStore(f"{tmp_dir}/metrics.db", buffer_size=16) as store:
+                run_id = store.start_run('test', {'seed': 1})
+                
+                # 多个进程同时追加
+                with ProcessPoolExecutor(max_workers=2) as pool:
+                    workers = list(pool.map(_append_metrics, [store] * 3, [run_id] * 3, range(3)))
+                assert workers == [0, 1, 2]
+                
+                store.add_output(run_id, 'file_0.wav', 'audio/filtered', f"{tmp_dir}/metrics.db")
+                rows = store.query(run_id=run_id)
+                assert len(rows) == 150
+                assert len(store.query(file='file_3.wav', filter_name='filter_2')) == 10
+                
+                summary = store.summary(group_by='filter_name')
+                assert [row['filter_name'] for row in summary] == ['filter_0', 'filter_1', 'filter_2']
+                assert [row['n'] for row in summary] == [50, 50, 50]
+                assert np.allclose([row['snr_gain'] for row in summary], [0.0, 1.0, 2.0])
+                
+                outputs = store.outputs(file='file_0.wav')
+                assert len(outputs) == 1 and outputs[0]['bytes'] > 0
+                
+                try:
+                    store.add_metrics(run_id, 'file_0.wav', 'gaussian', 'lowpass', unknown=1.0)
+                    assert False, "应当拒绝未知指标"
+                except ValueError:
+                    pass
+        
+        print("✓ 指标库测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 指标库测试失败: {e!r}")
+        return False
+
+def test_spectral_denoiser():
+    """测试流式谱降噪"""
+    print("测试流式谱降噪...")
+    try:
+        import json
+        import tempfile
+        import soundfile as sf
+        from utils.analysis import calculate_snr
+        from utils.batch import BatchRunner
+        from utils.denoise import SpectralDenoiser, spectral_denoise
+        
+        sample_rate = 16000
+        t = np.arange(4 * sample_rate) / sample_rate
+        rng = np.random.default_rng(0)
+        # 断续的谐波信号 (开头即有信号) + 白噪声, SNR 5 dB
+        clean = sum(0.3 / k * np.sin(2 * np.pi * 220 * k * t) for k in range(1, 6))
+        clean *= np.sin(2 * np.pi * 0.5 * t) > 0
+        noise = rng.standard_normal(len(t))
+        noise *= np.sqrt(np.mean(clean ** 2) / np.mean(noise ** 2) / 10 ** 0.5)
+        noisy = clean + noise
+        
+        # 增益恒为1时完全重建 (内部延迟已扣除)
+        unity = spectral_denoise(noisy, sample_rate, 'spectral_subtraction', alpha=0.0, floor=1.0)
+        assert len(unity) == len(noisy) and np.allclose(unity, noisy, atol=1e-10)
+        
+        for method in ('spectral_subtraction', 'log_mmse'):
+            denoised = spectral_denoise(noisy, sample_rate, method)
+            assert len(denoised) == len(noisy)
+            gain = calculate_snr(clean, denoised) - calculate_snr(clean, noisy)
+            assert gain > 3.0, f"{method} SNR提升 {gain:.1f} dB"
+            # 分块方式不影响结果
+            assert np.array_equal(spectral_denoise(noisy, sample_rate, method, block_size=1000), denoised)
+        
+        # 状态经JSON往返后继续处理, 结果逐位相同
+        stereo = np.column_stack([noisy, noisy[::-1]])
+        reference = SpectralDenoiser(sample_rate)
+        expected = np.concatenate([reference.process(stereo), reference.flush()])
+        first = SpectralDenoiser(sample_rate)
+        head = first.process(stereo[:20000])
+        second = SpectralDenoiser(sample_rate)
+        second.set_state(json.loads(json.dumps(first.get_state())))
+        resumed = np.concatenate([head, second.process(stereo[20000:]), second.flush()])
+        assert resumed.shape == stereo.shape and np.array_equal(resumed, expected)
+        assert spectral_denoise(np.zeros((0, 2)), sample_rate).shape == (0, 2)
+        
+        # 作为批处理阶段: 中断后续跑与不中断时逐位相同
+        class CrashDenoiser(SpectralDenoiser):
+            def process(self, block):
+                if self.samples_in >= 3 * 4096:
+                    raise KeyboardInterrupt
+                return super().process(block)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = f"{tmp_dir}/input.wav"
+            sf.write(input_file, noisy, sample_rate, subtype='FLOAT')
+            params = dict(block_size=4096, checkpoint_interval=2, subtype='FLOAT')
+            
+            full = BatchRunner(lambda sr, ch: [SpectralDenoiser(sr)], f"{tmp_dir}/full", **params)
+            expected, _ = sf.read(full.run([input_file])[input_file])
+            assert len(expected) == len(noisy)
+            
+            crashing = BatchRunner(lambda sr, ch: [CrashDenoiser(sr)], f"{tmp_dir}/resume", **params)
+            try:
+                crashing.run([input_file])
+                assert False, "应当在处理中途中断"
+            except KeyboardInterrupt:
+                pass
+            resumed = BatchRunner(lambda sr, ch: [SpectralDenoiser(sr)], f"{tmp_dir}/resume", **params)
+            output, _ = sf.read(resumed.run([input_file])[input_file])
+            assert np.array_equal(output, expected)
+        
+        print("✓ 流式谱降噪测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 流式谱降噪测试失败: {e!r}")
+        return False
+
+def test_kernels():
+    """测试逐采样计算内核 (numba 与 NumPy 实现结果一致)"""
+    print("测试逐采样计算内核...")
+    try:
+        from scipy.ndimage import median_filter
+        from utils import kernels
+        from utils.filters import design_adaptive_filter, AdaptiveNoiseCanceller
+        
+        backends = ['numpy', 'numba'] if kernels.HAVE_NUMBA else ['numpy']
+        print(f"  可用实现: {backends}")
+        rng = np.random.default_rng(7)
+        
+        # 滑动中值与 scipy 的 'reflect' 边界完全相同 (含重复值和短于窗口的信号)
+        for shape, kernel_size in [((1000,), 5), ((4000, 2), 31), ((3, 2), 9)]:
+            data = rng.standard_normal(shape)
+            data[::5] = 0.25
+            size = (kernel_size,) + (1,) * (len(shape) - 1)
+            expected = median_filter(data, size=size, mode='reflect')
+            for backend in backends:
+                assert np.array_equal(kernels.sliding_median(data, kernel_size, backend), expected)
+        
+        # 增益平滑与逐采样递归完全相同, 分块处理与整段处理相同
+        gain = rng.random((5000, 2))
+        for attack, release in [(0.9, 0.9), (0.99, 0.5)]:
+            expected = np.empty_like(gain)
+            state = gain[0].copy()
+            for n in range(len(gain)):
+                coeff = np.where(gain[n] < state, attack, release)
+                state = coeff * state + (1.0 - coeff) * gain[n]
+                expected[n] = state
+            for backend in backends:
+                smoothed = kernels.smooth_gain(gain, attack, release, backend=backend)
+                assert np.array_equal(smoothed, expected)
+                head = kernels.smooth_gain(gain[:1234], attack, release, backend=backend)
+                tail = kernels.smooth_gain(gain[1234:], attack, release, initial=head[-1], backend=backend)
+                assert np.array_equal(np.concatenate([head, tail]), expected)
+        
+        # 逐采样 LMS 与原始循环实现一致 (点积求和顺序不同, 只差舍入误差)
+        n, taps = 8000, 16
+        reference = rng.standard_normal(n)
+        desired = np.convolve(reference, 0.3 * rng.standard_normal(taps))[:n]
+        expected = np.zeros(n)
+        weights = np.zeros(taps)
+        for i in range(taps, n):
+            x = reference[i - taps + 1:i + 1][::-1]
+            expected[i] = np.dot(weights, x)
+            weights = weights + 0.01 * (desired[i] - expected[i]) * x
+        assert np.allclose(design_adaptive_filter(reference, desired, taps, 0.01), expected, rtol=0, atol=1e-10)
+        
+        data = np.concatenate([np.zeros(taps - 1), reference])
+        results = [kernels.lms_filter(data, desired, np.zeros(taps), 0.5, normalized=True, backend=backend)
+                   for backend in backends]
+        for output, error in results:
+            assert np.allclose(output, results[0][0], rtol=0, atol=1e-10)
+            assert np.mean(error[-1000:] ** 2) < 1e-6
+        
+        # 抵消器 block_size=1 时使用逐采样内核, 状态在块之间保留
+        canceller = AdaptiveNoiseCanceller(filter_length=taps, mu=0.5, block_size=1)
+        chunked = canceller.run(desired, reference, chunk_size=3000)
+        assert np.allclose(chunked, results[0][1], rtol=0, atol=1e-10)
+        
+        try:
+            kernels.sliding_median(gain, 5, backend='cython')
+            assert False, "应当拒绝未知的实现"
+        except ValueError:
+            pass
+        
+        print("✓ 逐采样计算内核测试成功")
+        return True
+    except Exception as e:
+        print(f"✗ 逐采样计算内核测试失败: {e!r}")
+        return False
+
 def main():
     """主测试函数"""
     print("=== 音频降噪项目测试 ===")
@@ -123,6 +1450,181 @@ def main():
     
     print()
     
+    # 测试导入开销
+    if not test_import_time():
+        print("测试失败：导入开销有问题")
+        return False
+    
+    print()
+    
+    # 测试批量评价指标（使用合成信号）
+    if not test_batch_metrics():
+        print("测试失败：批量评价指标有问题")
+        return False
+    
+    print()
+    
+    # 测试滤波器参数扫描（使用合成信号）
+    if not test_filter_sweep():
+        print("测试失败：滤波器参数扫描有问题")
+        return False
+    
+    print()
+    
+    # 测试共享内存数组（使用合成信号）
+    if not test_shared_arrays():
+        print("测试失败：共享内存数组有问题")
+        return False
+    
+    print()
+    
+    # 测试分段并行滤波（使用合成信号）
+    if not test_chunked_filtering():
+        print("测试失败：分段并行滤波有问题")
+        return False
+    
+    print()
+    
+    # 测试逐块音频写入（使用合成信号）
+    if not test_audio_writer():
+        print("测试失败：逐块音频写入有问题")
+        return False
+    
+    print()
+    
+    # 测试增量频谱图引擎（使用合成信号）
+    if not test_spectrogram_engine():
+        print("测试失败：增量频谱图引擎有问题")
+        return False
+    
+    print()
+    
+    # 测试磁盘结果缓存（使用合成信号）
+    if not test_result_cache():
+        print("测试失败：磁盘结果缓存有问题")
+        return False
+    
+    print()
+    
+    # 测试频域噪声合成（使用合成信号）
+    if not test_noise_synthesizer():
+        print("测试失败：频域噪声合成有问题")
+        return False
+    
+    print()
+    
+    # 测试噪声谱库（使用合成信号）
+    if not test_noise_profiles():
+        print("测试失败：噪声谱库有问题")
+        return False
+    
+    print()
+    
+    # 测试数据增强生成器（使用合成音频文件）
+    if not test_augmentation():
+        print("测试失败：数据增强生成器有问题")
+        return False
+    
+    print()
+    
+    # 测试脉冲噪声去除（使用合成信号）
+    if not test_impulse_removal():
+        print("测试失败：脉冲噪声去除有问题")
+        return False
+    
+    print()
+    
+    # 测试自适应噪声抵消（使用合成信号）
+    if not test_adaptive_cancellation():
+        print("测试失败：自适应噪声抵消有问题")
+        return False
+    
+    print()
+    
+    # 测试降噪HTTP服务（本地回环地址）
+    if not test_http_server():
+        print("测试失败：降噪HTTP服务有问题")
+        return False
+    
+    print()
+    
+    # 测试滤波器级联（使用合成信号）
+    if not test_filter_chain():
+        print("测试失败：滤波器级联有问题")
+        return False
+    
+    print()
+    
+    # 测试滤波器响应分析（使用合成信号）
+    if not test_filter_response():
+        print("测试失败：滤波器响应分析有问题")
+        return False
+    
+    print()
+    
+    # 测试性能剖析（使用合成信号）
+    if not test_profiling():
+        print("测试失败：性能剖析有问题")
+        return False
+    
+    print()
+    
+    # 测试播放引擎（使用合成信号）
+    if not test_playback_engine():
+        print("测试失败：播放引擎有问题")
+        return False
+    
+    print()
+    
+    # 测试有声段检测（使用合成信号）
+    if not test_voice_activity():
+        print("测试失败：有声段检测有问题")
+        return False
+    
+    print()
+    
+    # 测试多声道频谱分析（使用合成信号）
+    if not test_multichannel_analysis():
+        print("测试失败：多声道频谱分析有问题")
+        return False
+    
+    print()
+    
+    # 测试整数PCM读写（使用合成信号）
+    if not test_pcm():
+        print("测试失败：整数PCM读写有问题")
+        return False
+    
+    print()
+    
+    # 测试批处理断点续跑（使用合成信号）
+    if not test_batch_resume():
+        print("测试失败：批处理断点续跑有问题")
+        return False
+    
+    print()
+    
+    # 测试指标库
+    if not test_metrics_store():
+        print("测试失败：指标库有问题")
+        return False
+    
+    print()
+    
+    # 测试流式谱降噪（使用合成信号）
+    if not test_spectral_denoiser():
+        print("测试失败：流式谱降噪有问题")
+        return False
+    
+    print()
+    
+    # 测试逐采样计算内核（使用合成信号）
+    if not test_kernels():
+        print("测试失败：逐采样计算内核有问题")
+        return False
+    
+    print()
+    
     # 测试音频加载
     audio_data, sample_rate = test_audio_loading()
     if audio_data is None:
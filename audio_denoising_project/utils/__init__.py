@@ -2,64 +2,153 @@
 # -*- coding: utf-8 -*-
 """
 音频降噪项目工具包
+
+子模块按需导入: 访问 utils.xxx 时才加载对应模块，
+因此 import utils 不会引入 matplotlib 等重量级依赖。
 """
 
-from .noise import (
-    add_gaussian_noise,
-    add_narrowband_noise,
-    add_single_frequency_interference,
-    calculate_snr,
-    add_impulse_noise
-)
-
-from .filters import (
-    Filter,
-    design_lowpass_filter,
-    design_highpass_filter,
-    design_bandpass_filter,
-    design_bandstop_filter,
-    design_notch_filter,
-    design_adaptive_filter,
-    design_wiener_filter
-)
-
-from .analysis import (
-    plot_time_domain,
-    plot_frequency_domain,
-    plot_filter_response,
-    plot_comparison,
-    calculate_snr,
-    calculate_psnr,
-    calculate_spectral_centroid,
-    calculate_spectral_rolloff,
-    plot_spectrogram
-)
-
-__all__ = [
+import importlib
+
+# 导出名称 -> 所在子模块
+_LAZY_IMPORTS = {
     # 噪声相关
-    'add_gaussian_noise',
-    'add_narrowband_noise',
-    'add_single_frequency_interference',
-    'calculate_snr',
-    'add_impulse_noise',
-    
+    'add_gaussian_noise': 'noise',
+    'add_narrowband_noise': 'noise',
+    'add_single_frequency_interference': 'noise',
+    'add_impulse_noise': 'noise',
+    'add_colored_noise': 'noise',
+    'add_profile_noise': 'noise',
+
     # 滤波器相关
-    'Filter',
-    'design_lowpass_filter',
-    'design_highpass_filter',
-    'design_bandpass_filter',
-    'design_bandstop_filter',
-    'design_notch_filter',
-    'design_adaptive_filter',
-    'design_wiener_filter',
-    
-    # 分析相关
-    'plot_time_domain',
-    'plot_frequency_domain',
-    'plot_filter_response',
-    'plot_comparison',
-    'calculate_psnr',
-    'calculate_spectral_centroid',
-    'calculate_spectral_rolloff',
-    'plot_spectrogram'
-] 
\ No newline at end of file
+    'Filter': 'filters',
+    'FilterChain': 'filters',
+    'design_lowpass_filter': 'filters',
+    'design_highpass_filter': 'filters',
+    'design_bandpass_filter': 'filters',
+    'design_bandstop_filter': 'filters',
+    'design_notch_filter': 'filters',
+    'design_adaptive_filter': 'filters',
+    'AdaptiveNoiseCanceller': 'filters',
+    'design_wiener_filter': 'filters',
+    'remove_impulse_noise': 'filters',
+    'ImpulseRemover': 'filters',
+
+    # 分析相关 (calculate_snr 沿用 analysis 中合并所有声道的版本)
+    'plot_time_domain': 'analysis',
+    'plot_frequency_domain': 'analysis',
+    'plot_filter_response': 'analysis',
+    'plot_comparison': 'analysis',
+    'calculate_snr': 'analysis',
+    'calculate_psnr': 'analysis',
+    'calculate_spectral_centroid': 'analysis',
+    'calculate_spectral_rolloff': 'analysis',
+    'plot_spectrogram': 'analysis',
+
+    # 评价指标
+    'calculate_snr_batch': 'metrics',
+    'calculate_segmental_snr': 'metrics',
+    'calculate_psnr_batch': 'metrics',
+    'calculate_si_sdr': 'metrics',
+    'StreamingMetrics': 'metrics',
+
+    # 参数扫描
+    'make_filter_grid': 'sweep',
+    'run_filter_sweep': 'sweep',
+    'format_sweep_table': 'sweep',
+
+    # 共享内存
+    'SharedAudioArray': 'shared',
+    'map_channels': 'shared',
+
+    # 音频写入
+    'AudioSink': 'audio_io',
+    'ConcurrentAudioWriter': 'audio_io',
+    'write_audio': 'audio_io',
+
+    # 频谱图
+    'StreamingSTFT': 'spectrogram',
+    'SpectrogramStore': 'spectrogram',
+    'compute_spectrogram': 'spectrogram',
+    'stream_file_spectrogram': 'spectrogram',
+    'render_spectrogram': 'spectrogram',
+
+    # 结果缓存
+    'ResultCache': 'cache',
+
+    # 频域噪声合成
+    'synthesize_noise': 'synth',
+    'NoiseStream': 'synth',
+
+    # 噪声谱库
+    'NoiseProfile': 'profiles',
+    'NoiseProfileLibrary': 'profiles',
+    'capture_noise_profile': 'profiles',
+    'generate_profile_noise': 'profiles',
+
+    # 数据增强
+    'AugmentedBatches': 'augment',
+    'NOISE_RECIPES': 'augment',
+
+    # 滤波器响应
+    'frequency_grid': 'response',
+    'batch_frequency_response': 'response',
+    'response_metrics': 'response',
+    'analyze_filters': 'response',
+    'ResponseCache': 'response',
+
+    # 性能剖析
+    'profiled': 'profiling',
+    'profile_calls': 'profiling',
+    'Profiler': 'profiling',
+
+    # 音频播放
+    'PlaybackEngine': 'playback',
+
+    # 有声段检测
+    'SegmentIndex': 'vad',
+    'detect_voice_activity': 'vad',
+
+    # 声道组合
+    'CHANNEL_MODES': 'channels',
+    'combine_channels': 'channels',
+
+    # 整数PCM
+    'PCMArray': 'pcm',
+    'load_pcm': 'pcm',
+
+    # 批处理断点续跑
+    'BatchRunner': 'batch',
+    'BatchCheckpoint': 'batch',
+    'CausalFilterStage': 'batch',
+    'GaussianNoiseStage': 'batch',
+
+    # 指标库
+    'MetricsStore': 'store',
+
+    # 谱降噪
+    'SpectralDenoiser': 'denoise',
+    'spectral_denoise': 'denoise',
+    'DENOISE_METHODS': 'denoise',
+
+    # 逐采样计算内核
+    'lms_filter': 'kernels',
+    'sliding_median': 'kernels',
+    'smooth_gain': 'kernels',
+    'HAVE_NUMBA': 'kernels',
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # 缓存到模块命名空间, 之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -6,12 +6,47 @@
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy import signal
-from scipy.fft import fft, fftfreq
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
+from scipy.fft import rfft, rfftfreq
+
+from .metrics import calculate_snr_batch, calculate_psnr_batch
+from .spectrogram import compute_spectrogram, render_spectrogram
+from .channels import check_channel_mode, combine_channels, channel_labels
+
+# matplotlib 导入较慢, 首次绘图时才加载
+_pyplot = None
+
+def _get_pyplot():
+    """按需导入 matplotlib.pyplot 并设置中文字体"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        import matplotlib.pyplot as plt
+        matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+        _pyplot = plt
+    return _pyplot
+
+def _channel_spectra(signal_data, channel_mode='mix'):
+    """
+    计算各输出声道的单边频谱
+    
+    'mix' 模式在时域取平均后只做一次FFT; 其余模式沿第0轴对所有声道做一次批量rFFT,
+    中/侧频谱由左右声道频谱线性组合得到, 不生成中间的时域数组。
+    
+    返回:
+        (spectrum, labels): spectrum 形如 (n_bins,) 或 (n_bins, n_outputs); labels 为声道名称或 None
+    """
+    check_channel_mode(channel_mode)
+    signal_data = np.asarray(signal_data)
+    if channel_mode == 'mix':
+        if signal_data.ndim > 1:
+            signal_data = signal_data.mean(axis=1)
+        return rfft(signal_data), None
+    
+    if signal_data.ndim == 1:
+        signal_data = signal_data[:, None]
+    spectrum = combine_channels(rfft(signal_data, axis=0), channel_mode, axis=1)
+    return spectrum, channel_labels(channel_mode, signal_data.shape[1])
 
 def plot_time_domain(signal_data, sample_rate, title="时域信号", save_path=None, max_duration=10):
     """
@@ -24,6 +59,8 @@ def plot_time_domain(signal_data, sample_rate, title="时域信号", save_path=N
         save_path: 保存路径
         max_duration: 最大显示时长(秒)
     """
+    plt = _get_pyplot()
+    
     # 计算时间轴
     duration = len(signal_data) / sample_rate
     time_axis = np.linspace(0, duration, len(signal_data))
@@ -48,31 +85,35 @@ def plot_time_domain(signal_data, sample_rate, title="时域信号", save_path=N
     
     plt.show()
 
-def plot_frequency_domain(signal_data, sample_rate, title="频域信号", save_path=None):
+def plot_frequency_domain(signal_data, sample_rate, title="频域信号", save_path=None, segments=None,
+                          channel_mode='mix'):
     """
     绘制频域图 (FFT)
     
     参数:
-        signal_data: 信号数据
+        signal_data: 信号数据, 形如 (samples,) 或 (samples, channels)
         sample_rate: 采样率
         title: 图表标题
         save_path: 保存路径
+        segments: SegmentIndex, 提供时只对有声段做FFT
+        channel_mode: 'mix' 混合为单声道; 'per_channel' 每个声道一条曲线; 'mid_side' 中/侧两条曲线
     """
-    # 计算FFT
-    n = len(signal_data)
-    fft_result = fft(signal_data)
-    frequencies = fftfreq(n, 1/sample_rate)
+    plt = _get_pyplot()
+    
+    if segments is not None:
+        signal_data = segments.gather(signal_data)
     
-    # 只显示正频率部分
-    positive_freq_mask = frequencies >= 0
-    frequencies = frequencies[positive_freq_mask]
-    magnitude = np.abs(fft_result[positive_freq_mask])
+    # 计算单边频谱 (所有声道一次FFT)
+    spectrum, labels = _channel_spectra(signal_data, channel_mode)
+    frequencies = rfftfreq(len(signal_data), 1/sample_rate)
     
     # 转换为dB
-    magnitude_db = 20 * np.log10(magnitude + 1e-10)
+    magnitude_db = 20 * np.log10(np.abs(spectrum) + 1e-10)
     
     plt.figure(figsize=(12, 6))
     plt.plot(frequencies, magnitude_db, linewidth=0.5)
+    if labels:
+        plt.legend(labels)
     plt.title(title, fontsize=14, fontweight='bold')
     plt.xlabel('频率 (Hz)', fontsize=12)
     plt.ylabel('幅度 (dB)', fontsize=12)
@@ -96,6 +137,8 @@ def plot_filter_response(filter_obj, sample_rate, filter_name="滤波器", save_
         filter_name: 滤波器名称
         save_path: 保存路径
     """
+    plt = _get_pyplot()
+    
     frequencies, magnitude, phase = filter_obj.get_frequency_response()
     
     # 转换为dB
@@ -139,6 +182,8 @@ def plot_comparison(original, processed, sample_rate, title="信号对比", save
         title: 图表标题
         save_path: 保存路径
     """
+    plt = _get_pyplot()
+    
     # 计算时间轴
     duration = len(original) / sample_rate
     time_axis = np.linspace(0, duration, len(original))
@@ -163,18 +208,12 @@ def plot_comparison(original, processed, sample_rate, title="信号对比", save
     ax1.legend()
     ax1.grid(True, alpha=0.3)
     
-    # 频域对比
-    # 计算FFT
+    # 频域对比 (多声道混合为单声道)
+    # 计算单边频谱
     n = len(original)
-    fft_original = fft(original)
-    fft_processed = fft(processed)
-    frequencies = fftfreq(n, 1/sample_rate)
-    
-    # 只显示正频率部分
-    positive_freq_mask = frequencies >= 0
-    frequencies = frequencies[positive_freq_mask]
-    magnitude_original = np.abs(fft_original[positive_freq_mask])
-    magnitude_processed = np.abs(fft_processed[positive_freq_mask])
+    frequencies = rfftfreq(n, 1/sample_rate)
+    magnitude_original = np.abs(_channel_spectra(original)[0])
+    magnitude_processed = np.abs(_channel_spectra(processed)[0])
     
     # 转换为dB
     magnitude_original_db = 20 * np.log10(magnitude_original + 1e-10)
@@ -197,28 +236,23 @@ def plot_comparison(original, processed, sample_rate, title="信号对比", save
     
     plt.show()
 
-def calculate_snr(original_signal, noisy_signal):
+def calculate_snr(original_signal, noisy_signal, segments=None):
     """
     计算信噪比
     
     参数:
         original_signal: 原始信号
         noisy_signal: 带噪信号
+        segments: SegmentIndex, 提供时只统计有声段
     
     返回:
         信噪比 (dB)
     """
-    # 计算信号功率
-    signal_power = np.mean(original_signal ** 2)
-    
-    # 计算噪声功率
-    noise = noisy_signal - original_signal
-    noise_power = np.mean(noise ** 2)
-    
-    # 计算信噪比
-    snr = 10 * np.log10(signal_power / noise_power)
-    
-    return snr
+    if segments is not None:
+        original_signal = segments.gather(original_signal)
+        noisy_signal = segments.gather(noisy_signal)
+    # 所有声道合并计算
+    return calculate_snr_batch(original_signal, noisy_signal, axis=None)
 
 def calculate_psnr(original_signal, processed_signal):
     """
@@ -231,97 +265,111 @@ def calculate_psnr(original_signal, processed_signal):
     返回:
         峰值信噪比 (dB)
     """
-    # 计算峰值
-    max_value = np.max(np.abs(original_signal))
-    
-    # 计算均方误差
-    mse = np.mean((original_signal - processed_signal) ** 2)
-    
-    # 计算PSNR
-    psnr = 20 * np.log10(max_value / np.sqrt(mse))
-    
-    return psnr
+    # 所有声道合并计算
+    return calculate_psnr_batch(original_signal, processed_signal, axis=None)
 
-def calculate_spectral_centroid(signal_data, sample_rate):
+def calculate_spectral_centroid(signal_data, sample_rate, segments=None, channel_mode='mix'):
     """
     计算频谱质心
     
     参数:
-        signal_data: 信号数据
+        signal_data: 信号数据, 形如 (samples,) 或 (samples, channels)
         sample_rate: 采样率
+        segments: SegmentIndex, 提供时只统计有声段
+        channel_mode: 'mix', 'per_channel' 或 'mid_side'
     
     返回:
-        频谱质心频率
+        频谱质心频率; 非 'mix' 模式返回每个输出声道一个值的数组
     """
-    # 计算FFT
-    fft_result = fft(signal_data)
-    frequencies = fftfreq(len(signal_data), 1/sample_rate)
+    if segments is not None:
+        signal_data = segments.gather(signal_data)
     
-    # 计算功率谱
-    power_spectrum = np.abs(fft_result) ** 2
+    # 计算单边功率谱
+    spectrum, _ = _channel_spectra(signal_data, channel_mode)
+    frequencies = rfftfreq(len(signal_data), 1/sample_rate)
+    power_spectrum = spectrum.real ** 2 + spectrum.imag ** 2
     
-    # 计算频谱质心
-    centroid = np.sum(frequencies * power_spectrum) / np.sum(power_spectrum)
+    # 计算频谱质心 (各声道沿频率轴加权平均)
+    centroid = frequencies @ power_spectrum / np.sum(power_spectrum, axis=0)
     
     return centroid
 
-def calculate_spectral_rolloff(signal_data, sample_rate, percentile=85):
+def calculate_spectral_rolloff(signal_data, sample_rate, percentile=85, segments=None, channel_mode='mix'):
     """
     计算频谱滚降点
     
     参数:
-        signal_data: 信号数据
+        signal_data: 信号数据, 形如 (samples,) 或 (samples, channels)
         sample_rate: 采样率
         percentile: 百分位数
+        segments: SegmentIndex, 提供时只统计有声段
+        channel_mode: 'mix', 'per_channel' 或 'mid_side'
     
     返回:
-        频谱滚降频率
+        频谱滚降频率; 非 'mix' 模式返回每个输出声道一个值的数组
     """
-    # 计算FFT
-    fft_result = fft(signal_data)
-    frequencies = fftfreq(len(signal_data), 1/sample_rate)
+    if segments is not None:
+        signal_data = segments.gather(signal_data)
     
-    # 计算功率谱
-    power_spectrum = np.abs(fft_result) ** 2
-    
-    # 只考虑正频率
-    positive_mask = frequencies >= 0
-    frequencies = frequencies[positive_mask]
-    power_spectrum = power_spectrum[positive_mask]
+    # 计算单边功率谱
+    spectrum, _ = _channel_spectra(signal_data, channel_mode)
+    frequencies = rfftfreq(len(signal_data), 1/sample_rate)
+    power_spectrum = spectrum.real ** 2 + spectrum.imag ** 2
     
     # 计算累积功率
-    total_power = np.sum(power_spectrum)
-    cumulative_power = np.cumsum(power_spectrum)
+    cumulative_power = np.cumsum(power_spectrum, axis=0)
     
-    # 找到滚降点
-    threshold = total_power * percentile / 100
-    rolloff_idx = np.where(cumulative_power >= threshold)[0][0]
+    # 找到滚降点 (各声道分别取第一个达到阈值的频点)
+    threshold = cumulative_power[-1] * percentile / 100
+    rolloff_idx = np.argmax(cumulative_power >= threshold, axis=0)
     rolloff_freq = frequencies[rolloff_idx]
     
     return rolloff_freq
 
-def plot_spectrogram(signal_data, sample_rate, title="频谱图", save_path=None):
+def plot_spectrogram(signal_data, sample_rate, title="频谱图", save_path=None,
+                     nperseg=1024, hop=512, store_path=None, max_columns=2000, channel_mode='mix'):
     """
     绘制频谱图
     
     参数:
-        signal_data: 信号数据
+        signal_data: 信号数据, 形如 (samples,) 或 (samples, channels)
         sample_rate: 采样率
         title: 图表标题
         save_path: 保存路径
+        nperseg: 每帧长度
+        hop: 帧移
+        store_path: 可选, 把频谱帧以内存映射文件保存到该路径 (适合很长的信号, 仅 'mix' 模式)
+        max_columns: 时间方向的显示分辨率
+        channel_mode: 'mix' 一张频谱图; 'per_channel' / 'mid_side' 每个输出声道一张子图
     """
-    plt.figure(figsize=(12, 6))
-    
-    # 计算频谱图
-    f, t, Sxx = signal.spectrogram(signal_data, sample_rate, nperseg=1024, noverlap=512)
-    
-    # 绘制频谱图
-    plt.pcolormesh(t, f, 10 * np.log10(Sxx + 1e-10), shading='gouraud')
-    plt.title(title, fontsize=14, fontweight='bold')
-    plt.xlabel('时间 (秒)', fontsize=12)
-    plt.ylabel('频率 (Hz)', fontsize=12)
-    plt.colorbar(label='功率谱密度 (dB/Hz)')
-    plt.ylim(0, sample_rate/2)
+    plt = _get_pyplot()
+    
+    # 增量计算频谱图, 按显示分辨率降采样后用 imshow 绘制
+    spec = compute_spectrogram(signal_data, sample_rate, nperseg=nperseg, hop=hop,
+                               store_path=store_path, channel_mode=channel_mode)
+    
+    if channel_mode == 'mix':
+        plt.figure(figsize=(12, 6))
+        image = render_spectrogram(spec, sample_rate, max_columns=max_columns)
+        plt.title(title, fontsize=14, fontweight='bold')
+        plt.xlabel('时间 (秒)', fontsize=12)
+        plt.ylabel('频率 (Hz)', fontsize=12)
+        plt.colorbar(image, label='功率谱密度 (dB/Hz)')
+        plt.ylim(0, sample_rate/2)
+    else:
+        frequencies, times, spec_db = spec
+        n_channels = np.shape(signal_data)[1] if np.ndim(signal_data) > 1 else 1
+        labels = channel_labels(channel_mode, n_channels)
+        fig, axes = plt.subplots(len(labels), 1, figsize=(12, 3 * len(labels) + 1),
+                                 sharex=True, squeeze=False)
+        for i, (ax, label) in enumerate(zip(axes[:, 0], labels)):
+            image = render_spectrogram((frequencies, times, spec_db[:, i]), sample_rate, ax=ax,
+                                       max_columns=max_columns)
+            ax.set_title(f'{title} - {label}', fontsize=12)
+            ax.set_ylabel('频率 (Hz)', fontsize=12)
+            ax.set_ylim(0, sample_rate/2)
+            fig.colorbar(image, ax=ax, label='dB/Hz')
+        axes[-1, 0].set_xlabel('时间 (秒)', fontsize=12)
     
     plt.tight_layout()
     
@@ -329,4 +377,4 @@ def plot_spectrogram(signal_data, sample_rate, title="频谱图", save_path=None
         plt.savefig(save_path, dpi=300, bbox_inches='tight')
         print(f"频谱图保存至: {save_path}")
     
-    plt.show() 
\ No newline at end of file
+    plt.show()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频写入模块
+通过 soundfile.SoundFile 逐块写入音频, 按块转换数据类型,
+并在后台I/O线程中并发写出多个文件, 使计算与磁盘写入重叠
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from .pcm import PCMArray
+
+# 每次写入的帧数
+DEFAULT_BLOCK_SIZE = 65536
+
+# 各文件格式支持的采样格式
+SUPPORTED_SUBTYPES = {
+    'WAV': ('FLOAT', 'DOUBLE', 'PCM_16', 'PCM_24', 'PCM_32'),
+    'FLAC': ('PCM_16', 'PCM_24'),
+}
+
+# 文件扩展名 -> 文件格式
+_EXTENSION_FORMATS = {
+    '.wav': 'WAV',
+    '.flac': 'FLAC',
+}
+
+
+def _resolve_format(path, file_format, subtype):
+    """确定文件格式并检查采样格式是否支持"""
+    if file_format is None:
+        file_format = _EXTENSION_FORMATS.get(Path(path).suffix.lower())
+        if file_format is None:
+            raise ValueError(f"无法从扩展名判断文件格式: {path}")
+    file_format = file_format.upper()
+
+    if file_format not in SUPPORTED_SUBTYPES:
+        raise ValueError(f"不支持的文件格式: {file_format}")
+    if subtype not in SUPPORTED_SUBTYPES[file_format]:
+        raise ValueError(
+            f"{file_format} 不支持采样格式 {subtype}, 可选: {SUPPORTED_SUBTYPES[file_format]}"
+        )
+    return file_format
+
+
+class AudioSink:
+    """
+    逐块写入的音频文件
+
+    浮点数据按块转换为 float32 (PCM输出时先限幅到 [-1, 1])，
+    整数PCM数据 (包括 PCMArray) 直接写入，不产生整段数组的临时副本。
+    """
+
+    def __init__(self, path, sample_rate, channels=1, subtype='PCM_16', file_format=None,
+                 block_size=DEFAULT_BLOCK_SIZE, start=None):
+        """
+        参数:
+            path: 输出路径
+            sample_rate: 采样率
+            channels: 声道数
+            subtype: 采样格式 ('PCM_16', 'PCM_24', 'FLOAT' 等), 默认与 sf.write 一致
+            file_format: 文件格式 ('WAV', 'FLAC'), 默认由扩展名决定
+            block_size: 每次写入的帧数
+            start: 续写的起始帧; 指定时以读写方式打开已有文件, 从该帧开始覆盖写入 (仅限 WAV)
+        """
+        self.path = str(path)
+        self.subtype = subtype
+        self.file_format = _resolve_format(path, file_format, subtype)
+        self.block_size = block_size
+        self.channels = channels
+        self.frames_written = 0
+        self._clip = subtype.startswith('PCM')
+        self._buffer = None
+        if start is None:
+            self._file = sf.SoundFile(
+                self.path, 'w', samplerate=int(sample_rate), channels=channels,
+                subtype=subtype, format=self.file_format
+            )
+            return
+
+        if self.file_format != 'WAV':
+            raise ValueError(f"{self.file_format} 不支持续写, 只能续写 WAV 文件")
+        self._file = sf.SoundFile(self.path, 'r+')
+        existing = (self._file.samplerate, self._file.channels, self._file.subtype)
+        if existing != (int(sample_rate), channels, subtype):
+            self._file.close()
+            raise ValueError(f"已有文件的格式与续写参数不一致: {self.path}")
+        if start > self._file.frames:
+            self._file.close()
+            raise ValueError(f"续写起始帧 {start} 超出已有文件长度 {self._file.frames}")
+        self._file.seek(start)
+
+    def _convert_block(self, block):
+        """把一块浮点数据转换为 float32 (复用同一个缓冲区)"""
+        if self._buffer is None or self._buffer.shape[1:] != block.shape[1:]:
+            self._buffer = np.empty((self.block_size,) + block.shape[1:], dtype=np.float32)
+        out = self._buffer[:len(block)]
+        if self._clip:
+            np.clip(block, -1.0, 1.0, out=out, casting='same_kind')
+        else:
+            out[...] = block
+        return out
+
+    def write(self, data):
+        """
+        写入一段音频 (可多次调用, 依次追加)
+
+        参数:
+            data: 形如 (frames,) 或 (frames, channels) 的浮点或整数数组, 或 PCMArray (整数直接写入)
+        """
+        if isinstance(data, PCMArray):
+            data = data.data
+        data = np.asarray(data)
+        is_float = np.issubdtype(data.dtype, np.floating)
+        for start in range(0, len(data), self.block_size):
+            block = data[start:start + self.block_size]
+            if is_float:
+                block = self._convert_block(block)
+            self._file.write(block)
+        self.frames_written += len(data)
+
+    def flush(self):
+        """把已写入的数据和文件头写到磁盘 (之后即使进程崩溃, 文件也包含这些帧)"""
+        self._file.flush()
+
+    def close(self):
+        """关闭文件"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_audio(path, data, sample_rate, subtype='PCM_16', file_format=None,
+                block_size=DEFAULT_BLOCK_SIZE):
+    """
+    逐块写入整段音频
+
+    参数:
+        path: 输出路径
+        data: 音频数据
+        sample_rate: 采样率
+        subtype: 采样格式
+        file_format: 文件格式, 默认由扩展名决定
+        block_size: 每次写入的帧数
+
+    返回:
+        输出路径
+    """
+    channels = data.shape[1] if data.ndim > 1 else 1
+    with AudioSink(path, sample_rate, channels, subtype, file_format, block_size) as sink:
+        sink.write(data)
+    return path
+
+
+class ConcurrentAudioWriter:
+    """
+    后台音频写入器
+
+    submit 立即返回 Future，写入在后台I/O线程中进行；
+    待写入的任务数超过 max_pending 时 submit 阻塞，限制内存占用。
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, block_size=DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="audio-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+
+    def submit(self, path, data, sample_rate, subtype='PCM_16', file_format=None):
+        """
+        提交一个写入任务
+
+        参数:
+            path: 输出路径
+            data: 音频数据 (写入完成前不要修改)
+            sample_rate: 采样率
+            subtype: 采样格式
+            file_format: 文件格式
+
+        返回:
+            concurrent.futures.Future, 结果为输出路径
+        """
+        # 先在调用线程检查格式, 让参数错误立即暴露
+        _resolve_format(path, file_format, subtype)
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(
+                write_audio, path, data, sample_rate, subtype, file_format, self.block_size
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """
+        等待所有已提交的任务完成
+
+        返回:
+            [(输出路径或None, 异常或None), ...]
+        """
+        results = []
+        for future in self._futures:
+            error = future.exception()
+            results.append((None if error else future.result(), error))
+        self._futures = []
+        return results
+
+    def close(self):
+        """
+        等待任务完成并停止后台线程
+
+        返回:
+            与 wait() 相同的 [(输出路径或None, 异常或None), ...]
+        """
+        results = self.wait()
+        self._executor.shutdown(wait=True)
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
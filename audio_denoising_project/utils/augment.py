@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据增强模块
+从音频文件语料中随机截取定长片段并添加随机噪声,
+以 (batch, samples) float32 连续数组批量产出 (带噪, 纯净, 参数) 训练样本
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from .noise import (add_gaussian_noise, add_narrowband_noise,
+                    add_single_frequency_interference, add_impulse_noise)
+
+
+def _gaussian_recipe(clean, sample_rate, rng, snr_range):
+    snr_db = rng.uniform(*snr_range)
+    return add_gaussian_noise(clean, snr_db, rng=rng), {'snr_db': snr_db}
+
+
+def _narrowband_recipe(clean, sample_rate, rng, snr_range):
+    snr_db = rng.uniform(*snr_range)
+    low_freq = rng.uniform(100, sample_rate / 4)
+    high_freq = min(low_freq + rng.uniform(200, 2000), sample_rate / 2 * 0.95)
+    noisy = add_narrowband_noise(clean, sample_rate, low_freq, high_freq, snr_db, rng=rng)
+    return noisy, {'snr_db': snr_db, 'low_freq': low_freq, 'high_freq': high_freq}
+
+
+def _single_frequency_recipe(clean, sample_rate, rng, snr_range):
+    snr_db = rng.uniform(*snr_range)
+    frequency = rng.uniform(50, sample_rate / 2 * 0.9)
+    # 正弦波功率为 A^2/2, 按信噪比确定幅度
+    signal_power = np.mean(clean ** 2)
+    amplitude = np.sqrt(2 * signal_power / (10 ** (snr_db / 10)))
+    noisy = add_single_frequency_interference(clean, sample_rate, frequency, amplitude)
+    return noisy, {'snr_db': snr_db, 'frequency': frequency, 'amplitude': amplitude}
+
+
+def _impulse_recipe(clean, sample_rate, rng, snr_range):
+    probability = rng.uniform(0.001, 0.02)
+    amplitude = rng.uniform(0.1, 0.8)
+    noisy = add_impulse_noise(clean, probability, amplitude, rng=rng)
+    return noisy, {'probability': probability, 'amplitude': amplitude}
+
+
+# 噪声类型 -> 生成函数 (clean, sample_rate, rng, snr_range) -> (noisy, params)
+NOISE_RECIPES = {
+    'gaussian': _gaussian_recipe,
+    'narrowband': _narrowband_recipe,
+    'single_frequency': _single_frequency_recipe,
+    'impulse': _impulse_recipe,
+}
+
+
+class AugmentedBatches:
+    """
+    带噪/纯净训练样本批量生成器
+
+    每批数据由 SeedSequence([seed, epoch, batch]) 单独播种, 因此结果与线程调度、
+    预取深度无关, 同一 (seed, epoch) 总是产出完全相同的批次序列。
+    片段通过 SoundFile.seek/read 按需读取, 不载入整个文件；多声道文件混合为单声道。
+    """
+
+    def __init__(self, files, segment_length, batch_size=16, noise_types=None,
+                 snr_range=(0.0, 20.0), seed=0, batches_per_epoch=None,
+                 num_workers=2, prefetch=4):
+        """
+        参数:
+            files: 音频文件路径列表 (采样率必须一致)
+            segment_length: 每个片段的采样点数
+            batch_size: 每批片段数
+            noise_types: 使用的噪声类型列表 (NOISE_RECIPES 的键) 或 {名称: 生成函数} 字典
+            snr_range: 信噪比随机范围 (dB)
+            seed: 随机种子
+            batches_per_epoch: 每轮批数, 默认约为语料总长度 / (batch_size * segment_length)
+            num_workers: 预取线程数
+            prefetch: 最多提前准备的批数
+        """
+        if not files:
+            raise ValueError("文件列表为空")
+        if isinstance(noise_types, dict):
+            self.recipes = dict(noise_types)
+        else:
+            names = list(NOISE_RECIPES) if noise_types is None else list(noise_types)
+            unknown = [name for name in names if name not in NOISE_RECIPES]
+            if unknown:
+                raise ValueError(f"不支持的噪声类型: {unknown}, 可选: {list(NOISE_RECIPES)}")
+            self.recipes = {name: NOISE_RECIPES[name] for name in names}
+        self.recipe_names = list(self.recipes)
+
+        self.files = [str(path) for path in files]
+        infos = [sf.info(path) for path in self.files]
+        rates = {info.samplerate for info in infos}
+        if len(rates) > 1:
+            raise ValueError(f"语料采样率不一致: {sorted(rates)}")
+        self.sample_rate = rates.pop()
+        self.frames = np.array([info.frames for info in infos], dtype=np.int64)
+
+        self.segment_length = segment_length
+        self.batch_size = batch_size
+        self.snr_range = snr_range
+        self.seed = seed
+        self.num_workers = num_workers
+        self.prefetch = max(1, prefetch)
+        if batches_per_epoch is None:
+            batches_per_epoch = max(1, int(self.frames.sum() // (batch_size * segment_length)))
+        self.batches_per_epoch = batches_per_epoch
+        self.epoch = 0
+
+        # 按文件长度加权选择文件, 使每个采样被截取的概率大致相同
+        self._file_weights = self.frames / self.frames.sum()
+        self._local = threading.local()
+
+    def __len__(self):
+        return self.batches_per_epoch
+
+    def _open(self, path):
+        """每个线程各自持有打开的文件句柄"""
+        handles = getattr(self._local, 'handles', None)
+        if handles is None:
+            handles = self._local.handles = {}
+        handle = handles.get(path)
+        if handle is None:
+            handle = handles[path] = sf.SoundFile(path)
+        return handle
+
+    def _read_segment(self, file_index, offset, out):
+        """把一个片段读入 out (不足部分补零)"""
+        handle = self._open(self.files[file_index])
+        handle.seek(offset)
+        data = handle.read(self.segment_length, dtype='float32', always_2d=True)
+        n = len(data)
+        if data.shape[1] == 1:
+            out[:n] = data[:, 0]
+        else:
+            np.mean(data, axis=1, out=out[:n])
+        out[n:] = 0
+
+    def make_batch(self, epoch, index):
+        """
+        生成指定轮次中的第 index 批
+
+        返回:
+            (noisy, clean, params): 两个 (batch_size, segment_length) float32 数组和参数字典列表
+        """
+        rng = np.random.default_rng(np.random.SeedSequence([self.seed, epoch, index]))
+        clean = np.empty((self.batch_size, self.segment_length), dtype=np.float32)
+        noisy = np.empty_like(clean)
+        params = []
+
+        file_indices = rng.choice(len(self.files), size=self.batch_size, p=self._file_weights)
+        for row, file_index in enumerate(file_indices):
+            max_offset = max(0, int(self.frames[file_index]) - self.segment_length)
+            offset = int(rng.integers(0, max_offset + 1))
+            self._read_segment(file_index, offset, clean[row])
+
+            noise_type = self.recipe_names[rng.integers(len(self.recipe_names))]
+            noisy[row], recipe_params = self.recipes[noise_type](
+                clean[row].astype(np.float64), self.sample_rate, rng, self.snr_range
+            )
+            params.append({'file': self.files[file_index], 'offset': offset,
+                           'noise_type': noise_type, **recipe_params})
+
+        return noisy, clean, params
+
+    def iter_epoch(self, epoch):
+        """
+        按顺序产出一轮的所有批次, 后台线程提前准备至多 prefetch 批
+
+        参数:
+            epoch: 轮次编号 (决定随机种子)
+        """
+        executor = ThreadPoolExecutor(max_workers=self.num_workers,
+                                      thread_name_prefix="augment")
+        pending = deque()
+        next_index = 0
+        try:
+            while next_index < self.batches_per_epoch or pending:
+                while next_index < self.batches_per_epoch and len(pending) < self.prefetch:
+                    pending.append(executor.submit(self.make_batch, epoch, next_index))
+                    next_index += 1
+                yield pending.popleft().result()
+        finally:
+            # 提前结束迭代时取消未开始的任务
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def __iter__(self):
+        """产出当前轮次的批次, 结束后轮次加一"""
+        epoch = self.epoch
+        self.epoch += 1
+        return self.iter_epoch(epoch)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理断点续跑模块
+按块流式处理一批音频文件，定期把进度 (已完成的文件、当前文件的块偏移) 和各处理阶段的
+状态 (滤波器 zi、随机数生成器状态) 原子写入 JSON 检查点。中断后用同样的参数重新运行，
+已完成的文件直接跳过，未完成的文件从最近的检查点继续，输出与不中断时逐位相同。
+
+处理阶段是带 process(block)、get_state()、set_state(state) 的对象,
+状态必须可JSON序列化 (浮点数组转为列表即可逐位还原)。有内部延迟的阶段
+(输出长度与输入不同, 如谱降噪) 还需提供 flush(), 在文件结尾返回剩余输出。
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+from .audio_io import SUPPORTED_SUBTYPES, AudioSink
+
+# 每块帧数
+DEFAULT_BLOCK_SIZE = 65536
+
+# 检查点文件格式版本
+_CHECKPOINT_VERSION = 1
+
+
+class CausalFilterStage:
+    """
+    因果滤波阶段
+
+    用 sosfilt 带状态逐块滤波: 输出只依赖已处理的采样, 分块处理与整段处理逐位相同,
+    状态即各二阶节的 zi (与 Filter.filter 的零相位 filtfilt 不同, 会引入相位延迟)。
+    """
+
+    def __init__(self, filter_obj):
+        """
+        参数:
+            filter_obj: Filter 或 FilterChain 对象
+        """
+        self.sos = np.asarray(filter_obj.to_sos(), dtype=np.float64)
+        self.filter_type = filter_obj.filter_type
+        # 首块到来时按声道数创建
+        self.zi = None
+
+    def process(self, block):
+        """滤波一块数据 (沿第0轴)"""
+        if self.zi is None:
+            self.zi = np.zeros((len(self.sos), 2) + block.shape[1:])
+        output, self.zi = signal.sosfilt(self.sos, block, axis=0, zi=self.zi)
+        return output
+
+    def get_state(self):
+        return {'zi': None if self.zi is None else self.zi.tolist()}
+
+    def set_state(self, state):
+        self.zi = None if state['zi'] is None else np.asarray(state['zi'], dtype=np.float64)
+
+
+class GaussianNoiseStage:
+    """加性高斯白噪声阶段, 状态为随机数生成器的位生成器状态"""
+
+    def __init__(self, noise_std, seed=None):
+        """
+        参数:
+            noise_std: 噪声标准差
+            seed: 随机种子
+        """
+        self.noise_std = noise_std
+        self.rng = np.random.default_rng(seed)
+
+    def process(self, block):
+        return block + self.noise_std * self.rng.standard_normal(block.shape)
+
+    def get_state(self):
+        return {'rng': self.rng.bit_generator.state}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['rng']
+
+
+class BatchCheckpoint:
+    """
+    批处理检查点
+
+    completed: 已完成的输入文件 -> 输出文件
+    current: 当前文件的进度 {'input', 'output', 'offset' (已读入的帧), 'output_offset' (已写出的帧),
+             'stages'}, 没有未完成的文件时为 None
+    """
+
+    def __init__(self, path, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        参数:
+            path: 检查点文件路径 (存在时载入)
+            block_size: 每块帧数 (续跑时必须与检查点一致, 否则块边界不同, 输出无法逐位相同)
+        """
+        self.path = Path(path)
+        self.block_size = block_size
+        self.completed = {}
+        self.current = None
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != _CHECKPOINT_VERSION:
+                raise ValueError(f"不支持的检查点版本: {data.get('version')}")
+            if data['block_size'] != block_size:
+                raise ValueError(f"检查点的块大小 {data['block_size']} 与当前设置 {block_size} 不一致")
+            self.completed = data['completed']
+            self.current = data['current']
+
+    def save(self):
+        """先写临时文件并落盘, 再原子替换 (任何时刻崩溃都只会留下完整的旧检查点或新检查点)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': _CHECKPOINT_VERSION,
+            'block_size': self.block_size,
+            'completed': self.completed,
+            'current': self.current,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        """删除检查点, 下次运行从头开始"""
+        self.completed = {}
+        self.current = None
+        if self.path.exists():
+            self.path.unlink()
+
+
+class BatchRunner:
+    """
+    可断点续跑的批处理
+
+    每个文件按块读取, 依次经过各处理阶段后写入 WAV。每处理 checkpoint_interval 块,
+    先把输出文件落盘, 再记录块偏移和各阶段状态; 续跑时以读写方式打开输出文件,
+    从记录的偏移处覆盖写入 (检查点之后、崩溃之前写出的部分会被重新计算的相同数据覆盖)。
+    """
+
+    def __init__(self, make_stages, output_dir, checkpoint_path=None, block_size=DEFAULT_BLOCK_SIZE,
+                 checkpoint_interval=16, subtype='PCM_16'):
+        """
+        参数:
+            make_stages: 函数 (采样率, 声道数) -> 处理阶段列表, 每个文件调用一次
+            output_dir: 输出目录 (输出文件名为输入文件名去掉扩展名加 .wav)
+            checkpoint_path: 检查点路径, 默认为输出目录下的 checkpoint.json
+            block_size: 每块帧数
+            checkpoint_interval: 每处理多少块保存一次检查点
+            subtype: 输出采样格式 (WAV 支持的格式)
+        """
+        if subtype not in SUPPORTED_SUBTYPES['WAV']:
+            raise ValueError(f"WAV 不支持采样格式 {subtype}, 可选: {SUPPORTED_SUBTYPES['WAV']}")
+        if checkpoint_interval < 1:
+            raise ValueError("checkpoint_interval 必须为正整数")
+        self.make_stages = make_stages
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.block_size = block_size
+        self.checkpoint_interval = checkpoint_interval
+        self.subtype = subtype
+        self.checkpoint = BatchCheckpoint(
+            checkpoint_path or self.output_dir / 'checkpoint.json', block_size
+        )
+        # 本次运行处理过的文件 -> {'output', 'seconds', 'frames', 'sample_rate'}
+        # (续跑的文件只计本次处理的部分)
+        self.file_stats = {}
+
+    def output_path(self, input_path):
+        return str(self.output_dir / f"{Path(input_path).stem}.wav")
+
+    def _resume_offsets(self, input_path, output_path, stages):
+        """
+        检查点对应当前文件且输出文件完好时恢复各阶段状态
+
+        返回:
+            (输入续读的起始帧, 输出续写的起始帧)
+        """
+        current = self.checkpoint.current
+        if current is None or current['input'] != input_path or current['output'] != output_path:
+            return 0, 0
+        output_offset = current.get('output_offset', current['offset'])
+        # 输出文件缺失或比记录的短 (例如被手动删除) 时从头处理
+        if not os.path.exists(output_path) or sf.info(output_path).frames < output_offset:
+            return 0, 0
+        if len(current['stages']) != len(stages):
+            raise ValueError(f"检查点记录了 {len(current['stages'])} 个处理阶段, 当前为 {len(stages)} 个")
+        for stage, state in zip(stages, current['stages']):
+            stage.set_state(state)
+        return current['offset'], output_offset
+
+    def _save_progress(self, input_path, output_path, offset, output_offset, stages):
+        self.checkpoint.current = {
+            'input': input_path,
+            'output': output_path,
+            'offset': offset,
+            'output_offset': output_offset,
+            'stages': [stage.get_state() for stage in stages],
+        }
+        self.checkpoint.save()
+
+    @staticmethod
+    def _flush_stages(stages):
+        """文件结尾: 依次取出各阶段的剩余输出, 并送入其后的阶段"""
+        tail = None
+        for stage in stages:
+            if tail is not None and len(tail):
+                tail = stage.process(tail)
+            flush = getattr(stage, 'flush', None)
+            if flush is not None:
+                remaining = flush()
+                tail = remaining if tail is None or not len(tail) else np.concatenate([tail, remaining])
+        return tail
+
+    def process_file(self, input_path):
+        """
+        处理单个文件 (有该文件的检查点时从检查点继续)
+
+        参数:
+            input_path: 输入文件
+
+        返回:
+            输出文件路径
+        """
+        input_path = str(input_path)
+        output_path = self.output_path(input_path)
+        start_time = time.perf_counter()
+        with sf.SoundFile(input_path) as source:
+            stages = self.make_stages(source.samplerate, source.channels)
+            offset, output_offset = self._resume_offsets(input_path, output_path, stages)
+            if offset:
+                print(f"从第 {offset} 帧继续处理: {input_path}")
+            source.seek(offset)
+            start_offset = offset
+
+            with AudioSink(output_path, source.samplerate, source.channels, self.subtype, 'WAV',
+                           self.block_size, start=output_offset or None) as sink:
+                blocks = 0
+                while offset < source.frames:
+                    block = source.read(self.block_size, dtype='float64')
+                    offset += len(block)
+                    for stage in stages:
+                        block = stage.process(block)
+                    sink.write(block)
+                    output_offset += len(block)
+                    blocks += 1
+                    if blocks % self.checkpoint_interval == 0 and offset < source.frames:
+                        # 先让输出落盘, 检查点记录的帧一定已在文件中
+                        sink.flush()
+                        self._save_progress(input_path, output_path, offset, output_offset, stages)
+                tail = self._flush_stages(stages)
+                if tail is not None and len(tail):
+                    sink.write(tail)
+
+        self.checkpoint.completed[input_path] = output_path
+        self.checkpoint.current = None
+        self.checkpoint.save()
+        self.file_stats[input_path] = {
+            'output': output_path,
+            'seconds': time.perf_counter() - start_time,
+            'frames': offset - start_offset,
+            'sample_rate': source.samplerate,
+        }
+        return output_path
+
+    def run(self, files):
+        """
+        处理一批文件 (中断后用同一批文件再次调用即可续跑)
+
+        参数:
+            files: 输入文件列表
+
+        返回:
+            输入文件 -> 输出文件 的字典 (按输入顺序)
+        """
+        results = {}
+        for input_path in map(str, files):
+            output_path = self.checkpoint.completed.get(input_path)
+            if output_path is None:
+                output_path = self.process_file(input_path)
+            results[input_path] = output_path
+        return results
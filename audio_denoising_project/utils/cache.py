@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果缓存模块
+按内容寻址 (输入音频哈希 + 处理参数 + 随机种子) 把中间结果保存为 .npy 文件,
+以内存映射方式读回, 总大小超过上限时按最近最少使用 (LRU) 淘汰
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+class ResultCache:
+    """
+    磁盘结果缓存
+
+    每个结果保存为 <cache_dir>/<key>.npy；读取时更新文件的修改时间,
+    淘汰时优先删除修改时间最早 (最久未使用) 的文件。
+    命中时返回只读的内存映射数组; get_or_compute 未命中时返回的结果同样只读,
+    调用方需要修改时应先复制。仍被映射的文件 (Windows 上无法删除) 在淘汰时跳过。
+    """
+
+    def __init__(self, cache_dir='output/cache', max_bytes=2 * 1024 ** 3):
+        """
+        参数:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限 (字节)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def hash_array(array):
+        """
+        计算数组内容的哈希 (包含形状和数据类型)
+
+        参数:
+            array: NumPy 数组
+
+        返回:
+            十六进制哈希字符串
+        """
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha256()
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast('B'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        由处理阶段名称、上游哈希、参数和种子等组成缓存键
+
+        参数:
+            *parts: 可JSON序列化的任意内容 (NumPy 数组会先转为列表)
+
+        返回:
+            十六进制哈希字符串
+        """
+        def default(value):
+            if isinstance(value, np.ndarray):
+                return value.tolist()
+            if isinstance(value, np.generic):
+                return value.item()
+            return str(value)
+
+        text = json.dumps(parts, sort_keys=True, default=default)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.npy"
+
+    def get(self, key, mmap=True):
+        """
+        读取缓存结果
+
+        参数:
+            key: 缓存键
+            mmap: 是否以只读内存映射方式打开
+
+        返回:
+            数组; 未命中时返回 None
+        """
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode='r' if mmap else None)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        # 记录最近使用时间
+        os.utime(path)
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """
+        写入缓存 (先写临时文件再原子替换, 并发写入同一个键也不会损坏)
+
+        参数:
+            key: 缓存键
+            array: 结果数组
+        """
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(array))
+            try:
+                os.replace(tmp_path, path)
+            except PermissionError:
+                # Windows 上已有结果正被映射时无法替换; 同一个键的内容相同, 保留已有文件
+                if not path.exists():
+                    raise
+                os.remove(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        命中时返回缓存结果, 否则计算并写入缓存
+
+        参数:
+            key: 缓存键
+            compute: 无参数的计算函数
+
+        返回:
+            (结果数组, 是否命中); 两种情况下结果都是只读的
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+        result = np.asarray(compute())
+        self.put(key, result)
+        # 与命中时的只读映射一致 (只读视图, 不影响 compute 返回的数组本身)
+        result = result.view()
+        result.flags.writeable = False
+        return result, False
+
+    def __contains__(self, key):
+        return self._path(key).exists()
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob('*.npy'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def total_bytes(self):
+        """缓存当前占用的字节数"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """删除最久未使用的结果, 直到总大小不超过上限"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # 文件仍被内存映射 (Windows 上删除会失败), 跳过, 下次淘汰时再删
+                continue
+            total -= size
+
+    def clear(self):
+        """清空缓存"""
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+            except OSError:
+                # 已被删除, 或仍被内存映射 (Windows)
+                pass
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+声道组合模块
+分析函数的多声道输出方式: 混合为单声道、逐声道或中/侧 (mid/side)。
+组合是线性的, 可以在时域做, 也可以对批量FFT的结果直接做
+"""
+
+import numpy as np
+
+# 支持的声道模式
+CHANNEL_MODES = ('mix', 'per_channel', 'mid_side')
+
+
+def check_channel_mode(channel_mode):
+    """检查声道模式"""
+    if channel_mode not in CHANNEL_MODES:
+        raise ValueError(f"不支持的声道模式: {channel_mode}, 可选: {CHANNEL_MODES}")
+
+
+def combine_channels(data, channel_mode='mix', axis=-1):
+    """
+    按声道模式组合声道
+
+    参数:
+        data: 含声道轴的数组 (时域采样或频谱)
+        channel_mode: 'mix' 取平均 (去掉声道轴); 'per_channel' 原样返回;
+                      'mid_side' 输出 (L+R)/2 和 (L-R)/2 两路 (仅限双声道)
+        axis: 声道轴
+
+    返回:
+        组合后的数组
+    """
+    check_channel_mode(channel_mode)
+    if channel_mode == 'per_channel':
+        return data
+    if channel_mode == 'mix':
+        return data.mean(axis=axis)
+    if data.shape[axis] != 2:
+        raise ValueError(f"中/侧模式需要双声道输入, 实际为 {data.shape[axis]} 声道")
+    left = np.take(data, 0, axis=axis)
+    right = np.take(data, 1, axis=axis)
+    return np.stack(((left + right) / 2, (left - right) / 2), axis=axis)
+
+
+def channel_labels(channel_mode, n_channels):
+    """
+    各输出声道的名称
+
+    参数:
+        channel_mode: 声道模式
+        n_channels: 输入声道数
+
+    返回:
+        名称列表; 'mix' 模式返回 None
+    """
+    check_channel_mode(channel_mode)
+    if channel_mode == 'mix':
+        return None
+    if channel_mode == 'mid_side':
+        return ['中 (Mid)', '侧 (Side)']
+    return [f'声道{i + 1}' for i in range(n_channels)]
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+谱降噪模块
+流式 STFT 谱减法 / 对数谱幅度 MMSE (log-MMSE) 降噪器。噪声谱由 MCRA (最小值控制的
+递归平均) 逐帧持续更新，不需要单独的纯噪声片段，适用于与语音/音乐频带重叠的宽带噪声。
+每块数据的所有帧一次批量FFT，只有递归的噪声跟踪和增益计算逐帧进行，
+逐帧状态保存在预分配的数组中原地更新。
+持续时间超过最小值搜索窗的平稳单频与单频干扰无法区分，会被当作噪声抑制。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.special import exp1
+
+from .profiling import profiled
+
+# 支持的增益估计方法
+DENOISE_METHODS = ('spectral_subtraction', 'log_mmse')
+
+# 防止除零
+_EPS = 1e-12
+
+# 初始噪声谱估计的频率邻域 (频点数, 取中值)
+_INIT_MEDIAN_BINS = 17
+
+# 逐帧状态数组 (形如 (channels, n_bins))
+_STATE_ARRAYS = ('smoothed', 'minimum', 'minimum_tmp', 'presence', 'noise', 'prior_snr')
+
+
+def default_frame_length(sample_rate, duration=0.032):
+    """与 duration 最接近的2的幂帧长"""
+    return int(2 ** round(np.log2(duration * sample_rate)))
+
+
+class SpectralDenoiser:
+    """
+    流式谱降噪器
+
+    分析和合成都使用平方根汉宁窗, 50% 重叠, 增益为1时可完全重建。
+    process() 每次返回已完成重叠相加的采样, flush() 返回剩余部分;
+    两者拼接后与输入等长且对齐 (内部延迟已扣除)。
+    """
+
+    def __init__(self, sample_rate, method='log_mmse', frame_length=None, alpha=2.0, floor=0.02,
+                 gain_floor=0.05, prior_weight=0.98, min_prior_snr_db=-25.0, min_window=1.0,
+                 smoothing=0.7, presence_threshold=5.0, presence_smoothing=0.2,
+                 noise_smoothing=0.95, min_bias=4.0):
+        """
+        参数:
+            sample_rate: 采样率
+            method: 'spectral_subtraction' (功率谱减) 或 'log_mmse'
+            frame_length: 帧长 (偶数), 默认约32毫秒的2的幂
+            alpha: 谱减法的过减系数
+            floor: 谱减法的功率增益下限 (抑制音乐噪声)
+            gain_floor: log-MMSE 的幅度增益下限
+            prior_weight: log-MMSE 判决引导 (decision-directed) 先验信噪比的平滑系数
+            min_prior_snr_db: 先验信噪比下限 (dB)
+            min_window: MCRA 最小值搜索窗长 (秒)
+            smoothing: 功率谱的时间平滑系数
+            presence_threshold: 平滑功率超过最小值的倍数时判为有信号
+            presence_smoothing: 信号存在概率的平滑系数
+            noise_smoothing: 无信号时噪声谱的平滑系数
+            min_bias: 噪声谱上限相对最小值的倍数 (最小值约为噪声均值的1/3,
+                      开头即有信号等情况下高估的噪声谱在一个搜索窗内被压回)
+        """
+        if method not in DENOISE_METHODS:
+            raise ValueError(f"不支持的降噪方法: {method}, 可选: {DENOISE_METHODS}")
+        frame_length = frame_length or default_frame_length(sample_rate)
+        if frame_length % 2 or frame_length < 4:
+            raise ValueError("frame_length 必须为不小于4的偶数")
+        self.sample_rate = sample_rate
+        self.method = method
+        self.frame_length = frame_length
+        self.hop = frame_length // 2
+        self.n_bins = frame_length // 2 + 1
+        self.alpha = alpha
+        self.floor = floor
+        self.gain_floor = gain_floor
+        self.prior_weight = prior_weight
+        self.min_prior_snr = 10 ** (min_prior_snr_db / 10)
+        self.window_frames = max(1, int(round(min_window * sample_rate / self.hop)))
+        self.smoothing = smoothing
+        self.presence_threshold = presence_threshold
+        self.presence_smoothing = presence_smoothing
+        self.noise_smoothing = noise_smoothing
+        self.min_bias = min_bias
+
+        # 周期汉宁窗的平方根: 50% 重叠时窗的平方和恒为1
+        self.window = np.sqrt(np.hanning(frame_length + 1)[:-1])
+        self.channels = None
+        self.reset()
+
+    def reset(self):
+        """清除所有状态 (下一次 process 视为新的音频流)"""
+        self.frames_processed = 0
+        self.samples_in = 0
+        self.samples_out = 0
+        self._pending = None
+        self._tail = None
+        self._mono = False
+        for name in _STATE_ARRAYS:
+            setattr(self, f"_{name}", None)
+        self._gain = None
+        self._work = None
+        self._buffers = None
+        self._present = None
+
+    def _allocate(self, channels):
+        """按声道数分配逐帧状态和工作数组"""
+        self.channels = channels
+        shape = (channels, self.n_bins)
+        for name in _STATE_ARRAYS:
+            setattr(self, f"_{name}", np.zeros(shape))
+        self._gain = np.ones(shape)
+        self._work = np.empty(shape)
+        # log-MMSE 增益计算的工作数组: 先验信噪比 xi、xi / (1 + xi)、指数积分的自变量 v
+        self._buffers = tuple(np.empty(shape) for _ in range(3))
+        # 本帧是否判为有信号
+        self._present = np.empty(shape, dtype=bool)
+        # 开头补半帧零, 使第一个输出采样对应第一帧的后半部分
+        self._pending = np.zeros((self.hop, channels))
+        self._tail = np.zeros((channels, self.hop))
+
+    @property
+    def noise_psd(self):
+        """当前的噪声功率谱估计, 形如 (channels, n_bins); 尚未处理任何帧时为 None"""
+        return None if self.frames_processed == 0 else self._noise.copy()
+
+    # ---- 逐帧递归 ----
+
+    @staticmethod
+    def _initial_noise(power):
+        """
+        由第一帧估计初始噪声谱: 相邻频点功率的中值 (指数分布的中值为均值的 ln2 倍)
+
+        音频开头即有信号时, 稀疏的谐波/单频成分不影响中值, 不会被当成噪声。
+        """
+        half = _INIT_MEDIAN_BINS // 2
+        padded = np.pad(power, [(0, 0), (half, half)], mode='edge')
+        median = np.median(sliding_window_view(padded, _INIT_MEDIAN_BINS, axis=-1), axis=-1)
+        return np.minimum(median / np.log(2), power)
+
+    def _track_noise(self, power):
+        """MCRA 噪声跟踪 (原地更新状态)"""
+        if self.frames_processed == 0:
+            self._smoothed[...] = power
+            self._noise[...] = self._initial_noise(power)
+            # 最小值从初始噪声谱开始, 第一个搜索窗内的持续信号仍判为有信号
+            self._minimum[...] = self._noise
+            self._minimum_tmp[...] = self._noise
+            return
+
+        smoothed, minimum, minimum_tmp, work = self._smoothed, self._minimum, self._minimum_tmp, self._work
+        smoothed *= self.smoothing
+        np.multiply(power, 1 - self.smoothing, out=work)
+        smoothed += work
+        np.minimum(minimum, smoothed, out=minimum)
+        np.minimum(minimum_tmp, smoothed, out=minimum_tmp)
+        if self.frames_processed % self.window_frames == 0:
+            # 最小值搜索窗滑动: 旧窗口的最小值作废
+            np.minimum(minimum_tmp, smoothed, out=minimum)
+            minimum_tmp[...] = smoothed
+
+        # 平滑功率明显高于最小值 -> 有信号, 噪声谱暂停更新
+        np.multiply(minimum, self.presence_threshold, out=work)
+        np.greater(smoothed, work, out=self._present)
+        self._presence *= self.presence_smoothing
+        np.copyto(work, self._present)
+        work *= 1 - self.presence_smoothing
+        self._presence += work
+        np.multiply(self._presence, 1 - self.noise_smoothing, out=work)
+        work += self.noise_smoothing
+        self._noise *= work
+        work -= 1
+        work *= power
+        self._noise -= work
+        np.multiply(minimum, self.min_bias, out=work)
+        np.minimum(self._noise, work, out=self._noise)
+
+    def _compute_gain(self, power):
+        """由后验信噪比计算本帧增益 (写入 self._gain)"""
+        gain, work = self._gain, self._work
+        # work = 后验信噪比 gamma
+        np.maximum(self._noise, _EPS, out=work)
+        np.divide(power, work, out=work)
+
+        if self.method == 'spectral_subtraction':
+            # |G|^2 = max(1 - alpha / gamma, floor)
+            np.maximum(work, _EPS, out=gain)
+            np.divide(-self.alpha, gain, out=gain)
+            gain += 1
+            np.maximum(gain, self.floor, out=gain)
+            np.sqrt(gain, out=gain)
+            return
+
+        # 判决引导的先验信噪比 xi (全部在预分配的数组中原地计算)
+        prior = self._prior_snr
+        xi, ratio, v = self._buffers
+        if self.frames_processed == 0:
+            prior[...] = 1.0
+        np.subtract(work, 1, out=xi)
+        np.maximum(xi, 0, out=xi)
+        xi *= 1 - self.prior_weight
+        np.multiply(prior, self.prior_weight, out=ratio)
+        xi += ratio
+        np.maximum(xi, self.min_prior_snr, out=xi)
+        # ratio = xi / (1 + xi), v = ratio * gamma
+        np.add(xi, 1, out=ratio)
+        np.divide(xi, ratio, out=ratio)
+        np.multiply(ratio, work, out=v)
+        np.maximum(v, _EPS, out=v)
+        # G = ratio * exp(E1(v) / 2)
+        exp1(v, out=v)
+        v *= 0.5
+        np.exp(v, out=v)
+        np.multiply(ratio, v, out=gain)
+        np.clip(gain, self.gain_floor, 1.0, out=gain)
+        # 下一帧使用的 |G|^2 * gamma
+        np.multiply(gain, gain, out=prior)
+        prior *= work
+
+    # ---- 流式处理 ----
+
+    @profiled
+    def process(self, block):
+        """
+        处理一块采样
+
+        参数:
+            block: 形如 (samples,) 或 (samples, channels) 的采样块
+
+        返回:
+            已完成的输出采样 (形状与输入一致, 长度可能与本块不同)
+        """
+        block = np.asarray(block, dtype=np.float64)
+        mono = block.ndim == 1
+        data = block[:, None] if mono else block
+        if self._pending is None:
+            self._allocate(data.shape[1])
+        elif data.shape[1] != self.channels:
+            raise ValueError(f"声道数 {data.shape[1]} 与之前的 {self.channels} 不一致")
+        self._mono = mono
+        self.samples_in += len(data)
+
+        data = np.concatenate([self._pending, data])
+        n_frames = (len(data) - self.frame_length) // self.hop + 1 if len(data) >= self.frame_length else 0
+        output = self._process_frames(data, n_frames)
+        self._pending = data[n_frames * self.hop:].copy()
+        return self._emit(output, mono)
+
+    def _process_frames(self, data, n_frames):
+        """对 n_frames 帧降噪并重叠相加, 返回 (n_frames * hop, channels)"""
+        if n_frames == 0:
+            return np.zeros((0, self.channels))
+
+        # (n_frames, channels, frame_length), 所有帧和声道一次FFT
+        frames = sliding_window_view(data, self.frame_length, axis=0)[::self.hop][:n_frames]
+        spectra = np.fft.rfft(frames * self.window, axis=-1)
+        power = spectra.real ** 2 + spectra.imag ** 2
+        for i in range(n_frames):
+            self._track_noise(power[i])
+            self._compute_gain(power[i])
+            spectra[i] *= self._gain
+            self.frames_processed += 1
+
+        # 50% 重叠相加: 每帧前半部分加上前一帧的后半部分
+        frames = np.fft.irfft(spectra, n=self.frame_length, axis=-1)
+        frames *= self.window
+        output = frames[..., :self.hop].copy()
+        output[0] += self._tail
+        output[1:] += frames[:-1, :, self.hop:]
+        self._tail[...] = frames[-1, :, self.hop:]
+        return output.transpose(0, 2, 1).reshape(-1, self.channels)
+
+    def _emit(self, output, mono, limit=None):
+        """扣除开头的半帧延迟, 返回与输入对齐的采样"""
+        skip = max(0, self.hop - (self.frames_processed * self.hop - len(output)))
+        output = output[skip:]
+        if limit is not None:
+            output = output[:limit]
+        self.samples_out += len(output)
+        return output[:, 0] if mono else output
+
+    def flush(self):
+        """
+        输出剩余的采样并清除状态
+
+        返回:
+            剩余采样 (与之前各次 process 的输出拼接后与输入等长)
+        """
+        if self._pending is None:
+            self.reset()
+            return np.zeros(0)
+        remaining = self.samples_in - self.samples_out
+        # 补零直到最后一个输入采样所在的帧全部处理完
+        data = np.concatenate([self._pending, np.zeros((self.frame_length, self.channels))])
+        n_frames = (len(data) - self.frame_length) // self.hop + 1
+        output = self._emit(self._process_frames(data, n_frames), self._mono, limit=remaining)
+        self.reset()
+        return output
+
+    # ---- 状态 (用于断点续跑) ----
+
+    def get_state(self):
+        """可JSON序列化的完整状态"""
+        if self._pending is None:
+            return {'channels': None}
+        state = {
+            'channels': self.channels,
+            'mono': self._mono,
+            'frames_processed': self.frames_processed,
+            'samples_in': self.samples_in,
+            'samples_out': self.samples_out,
+            'pending': self._pending.tolist(),
+            'tail': self._tail.tolist(),
+        }
+        for name in _STATE_ARRAYS:
+            state[name] = getattr(self, f"_{name}").tolist()
+        return state
+
+    def set_state(self, state):
+        """恢复 get_state 的结果"""
+        self.reset()
+        if state['channels'] is None:
+            return
+        self._allocate(state['channels'])
+        self._mono = state['mono']
+        self.frames_processed = state['frames_processed']
+        self.samples_in = state['samples_in']
+        self.samples_out = state['samples_out']
+        self._pending = np.asarray(state['pending'], dtype=np.float64).reshape(-1, self.channels)
+        self._tail[...] = state['tail']
+        for name in _STATE_ARRAYS:
+            getattr(self, f"_{name}")[...] = state[name]
+
+
+def spectral_denoise(audio_data, sample_rate, method='log_mmse', block_size=65536, **params):
+    """
+    对整段音频做谱降噪 (按块流式处理)
+
+    参数:
+        audio_data: 形如 (samples,) 或 (samples, channels) 的音频
+        sample_rate: 采样率
+        method: 'spectral_subtraction' 或 'log_mmse'
+        block_size: 每次送入的采样数
+        **params: 传给 SpectralDenoiser 的参数
+
+    返回:
+        降噪后的音频 (与输入等长)
+    """
+    denoiser = SpectralDenoiser(sample_rate, method, **params)
+    output = np.empty(np.shape(audio_data))
+    if len(output) == 0:
+        # 未处理任何采样时 flush 不知道声道数, 直接返回同形的空数组
+        return output
+    position = 0
+    for start in range(0, len(audio_data), block_size):
+        chunk = denoiser.process(audio_data[start:start + block_size])
+        output[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    tail = denoiser.flush()
+    output[position:position + len(tail)] = tail
+    return output
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐采样计算内核
+逐采样 LMS/NLMS、滑动中值和增益平滑。安装了 numba 时用 JIT 编译的循环 (编译结果缓存到磁盘)，
+否则使用 NumPy/SciPy 实现；两种实现的结果一致 (LMS 的点积求和顺序不同, 相差在浮点舍入误差以内)。
+numba 在第一次调用内核时才导入，不增加 import 开销。
+"""
+
+import importlib
+
+import numpy as np
+from scipy.ndimage import median_filter
+from scipy.signal import lfilter
+
+# 可选的实现
+BACKENDS = ('numba', 'numpy')
+
+# numba 是否可用 (首次访问 HAVE_NUMBA 或调用内核时检查)
+_numba = None
+_numba_checked = False
+
+# 函数名 -> 编译后的内核
+_compiled = {}
+
+
+def _load_numba():
+    """导入 numba; 未安装或与当前 NumPy 不兼容时返回 None"""
+    global _numba, _numba_checked
+    if not _numba_checked:
+        try:
+            _numba = importlib.import_module('numba')
+        except ImportError:
+            _numba = None
+        _numba_checked = True
+    return _numba
+
+
+def __getattr__(name):
+    if name == 'HAVE_NUMBA':
+        return _load_numba() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _resolve_backend(backend):
+    """确定使用的实现: None 时有 numba 则用 numba"""
+    if backend is None:
+        return 'numba' if _load_numba() is not None else 'numpy'
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的实现: {backend}, 可选: {BACKENDS}")
+    if backend == 'numba' and _load_numba() is None:
+        raise ValueError("未安装 numba (或与当前 NumPy 版本不兼容)")
+    return backend
+
+
+def _jit(func):
+    """编译循环内核 (每个函数只编译一次, cache=True 时跨进程复用磁盘缓存)"""
+    compiled = _compiled.get(func.__name__)
+    if compiled is None:
+        compiled = _compiled[func.__name__] = _load_numba().njit(cache=True)(func)
+    return compiled
+
+
+# ---- 循环内核 (numba 编译; 未编译时也是正确的纯 Python 实现) ----
+
+def _lms_loop(data, desired, weights, mu, normalized, eps, output, error):
+    n_taps = len(weights)
+    for n in range(len(desired)):
+        window = data[n:n + n_taps]
+        y = np.dot(weights, window)
+        e = desired[n] - y
+        step = mu * e
+        if normalized:
+            step = step / (eps + np.dot(window, window))
+        for k in range(n_taps):
+            weights[k] += step * window[k]
+        output[n] = y
+        error[n] = e
+
+
+def _median_loop(padded, kernel_size, out):
+    half = kernel_size // 2
+    window = np.empty(kernel_size)
+    for ch in range(padded.shape[1]):
+        # 有序窗口: 每步删除移出的采样并插入新采样
+        for j in range(kernel_size):
+            window[j] = padded[j, ch]
+        window.sort()
+        out[0, ch] = window[half]
+        for n in range(1, out.shape[0]):
+            old = padded[n - 1, ch]
+            new = padded[n + kernel_size - 1, ch]
+            i = 0
+            while i < kernel_size - 1 and window[i] != old:
+                i += 1
+            while i > 0 and window[i - 1] > new:
+                window[i] = window[i - 1]
+                i -= 1
+            while i < kernel_size - 1 and window[i + 1] < new:
+                window[i] = window[i + 1]
+                i += 1
+            window[i] = new
+            out[n, ch] = window[half]
+
+
+def _smooth_loop(gain, attack, release, state, out):
+    for ch in range(gain.shape[1]):
+        y = state[ch]
+        for n in range(gain.shape[0]):
+            g = gain[n, ch]
+            c = attack if g < y else release
+            y = c * y + (1.0 - c) * g
+            out[n, ch] = y
+
+
+# ---- 公共接口 ----
+
+def lms_filter(data, desired, weights, mu, normalized=False, eps=1e-8, backend=None):
+    """
+    逐采样 LMS/NLMS 自适应滤波
+
+    第 n 个采样的输入向量为 data[n:n + L] (从旧到新, L = len(weights)),
+    即 data 开头带有 L - 1 个历史采样; 每个采样都更新一次权值。
+
+    参数:
+        data: 参考信号, 长度 len(desired) + L - 1
+        desired: 期望信号 (主通道)
+        weights: 权值 (与输入向量同序, 从旧到新), 原地更新
+        mu: 步长
+        normalized: 是否按输入向量能量归一化 (NLMS)
+        eps: NLMS 归一化时防止除零
+        backend: 'numba'、'numpy' 或 None (自动选择)
+
+    返回:
+        (滤波器输出 y, 误差 e = desired - y)
+    """
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    desired = np.ascontiguousarray(desired, dtype=np.float64)
+    if weights.dtype != np.float64 or not weights.flags.c_contiguous:
+        raise ValueError("weights 必须是连续的 float64 数组")
+    n_taps = len(weights)
+    if len(data) != len(desired) + n_taps - 1:
+        raise ValueError(f"data 长度应为 len(desired) + {n_taps - 1}")
+
+    output = np.empty(len(desired))
+    error = np.empty(len(desired))
+    if _resolve_backend(backend) == 'numba':
+        _jit(_lms_loop)(data, desired, weights, float(mu), bool(normalized), float(eps), output, error)
+        return output, error
+
+    # 递归无法跨采样向量化: 只在抽头维度上用 BLAS 点积, 权值原地更新, 不分配临时数组
+    step_vector = np.empty(n_taps)
+    for n in range(len(desired)):
+        window = data[n:n + n_taps]
+        y = np.dot(weights, window)
+        e = desired[n] - y
+        step = mu * e
+        if normalized:
+            step = step / (eps + np.dot(window, window))
+        np.multiply(window, step, out=step_vector)
+        weights += step_vector
+        output[n] = y
+        error[n] = e
+    return output, error
+
+
+def sliding_median(signal_data, kernel_size, backend=None):
+    """
+    沿时间轴 (axis 0) 的滑动中值, 边界按镜像延拓 (与 scipy.ndimage.median_filter 的 'reflect' 相同)
+
+    参数:
+        signal_data: 形如 (samples,) 或 (samples, channels) 的信号
+        kernel_size: 窗口长度 (奇数)
+        backend: 'numba'、'numpy' 或 None (自动选择)
+
+    返回:
+        与输入同形的滑动中值
+    """
+    signal_data = np.asarray(signal_data, dtype=np.float64)
+    if _resolve_backend(backend) == 'numpy' or len(signal_data) == 0:
+        size = (kernel_size,) + (1,) * (signal_data.ndim - 1)
+        return median_filter(signal_data, size=size, mode='reflect')
+
+    half = kernel_size // 2
+    columns = signal_data.reshape(len(signal_data), -1)
+    padded = np.ascontiguousarray(np.pad(columns, [(half, half), (0, 0)], mode='symmetric'))
+    out = np.empty(columns.shape)
+    _jit(_median_loop)(padded, kernel_size, out)
+    return out.reshape(signal_data.shape)
+
+
+def smooth_gain(gain, attack, release=None, initial=None, backend=None):
+    """
+    逐采样增益平滑 (一阶递归, 增益下降和上升可用不同的系数)
+
+    y[n] = c * y[n-1] + (1 - c) * gain[n], 其中 gain[n] < y[n-1] 时 c = attack, 否则 c = release。
+    分块处理时把上一块输出的最后一个采样作为下一块的 initial, 结果与整段处理相同。
+
+    参数:
+        gain: 形如 (samples,) 或 (samples, channels) 的目标增益
+        attack: 增益下降时的平滑系数 (0 ~ 1, 越大越慢)
+        release: 增益上升时的平滑系数, 默认与 attack 相同
+        initial: 初始增益 (标量或每声道一个值), 默认为第一个采样的目标增益
+        backend: 'numba'、'numpy' 或 None (自动选择)
+
+    返回:
+        与输入同形的平滑增益
+    """
+    release = attack if release is None else release
+    if not (0.0 <= attack < 1.0 and 0.0 <= release < 1.0):
+        raise ValueError("attack 和 release 必须在 [0, 1) 范围内")
+    gain = np.asarray(gain, dtype=np.float64)
+    columns = np.ascontiguousarray(gain.reshape(len(gain), -1))
+    if len(columns) == 0:
+        return gain.copy()
+    if initial is None:
+        state = columns[0].copy()
+    else:
+        state = np.broadcast_to(np.asarray(initial, dtype=np.float64), columns.shape[1:]).copy()
+
+    out = np.empty(columns.shape)
+    if _resolve_backend(backend) == 'numba':
+        _jit(_smooth_loop)(columns, float(attack), float(release), state, out)
+    elif attack == release:
+        # 系数恒定时即一阶IIR, lfilter 的运算与逐采样循环完全相同
+        out[...] = lfilter([1.0 - attack], [1.0, -attack], columns, axis=0, zi=(attack * state)[None])[0]
+    else:
+        # 系数随输出变化, 无法向量化: 逐声道用 Python 浮点数循环 (与 numba 内核的运算相同)
+        for ch in range(columns.shape[1]):
+            y = float(state[ch])
+            values = columns[:, ch].tolist()
+            for n, g in enumerate(values):
+                c = attack if g < y else release
+                y = c * y + (1.0 - c) * g
+                values[n] = y
+            out[:, ch] = values
+    return out.reshape(gain.shape)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量评价指标模块
+对一组信号/声道一次性向量化计算 SNR、分段SNR、PSNR 和 SI-SDR，
+并提供基于累加和的流式计算
+"""
+
+import numpy as np
+
+# 防止除零的极小值
+_EPS = 1e-12
+
+
+def _as_float_pair(original_signal, processed_signal):
+    """检查形状并转换为浮点数组 (不复制已是浮点的数据)"""
+    original_signal = np.asarray(original_signal)
+    processed_signal = np.asarray(processed_signal)
+    if original_signal.shape != processed_signal.shape:
+        raise ValueError(
+            f"信号形状不一致: {original_signal.shape} vs {processed_signal.shape}"
+        )
+    if not np.issubdtype(original_signal.dtype, np.floating):
+        original_signal = original_signal.astype(np.float64)
+    if not np.issubdtype(processed_signal.dtype, np.floating):
+        processed_signal = processed_signal.astype(np.float64)
+    return original_signal, processed_signal
+
+
+def _power_ratio_db(numerator, denominator):
+    """计算功率比 (dB); 分母 (误差能量) 为零时为 inf, 与逐声道的 calculate_snr 一致"""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    ratio = np.full(np.broadcast(numerator, denominator).shape, np.inf)
+    np.divide(numerator, denominator, out=ratio, where=denominator > 0)
+    with np.errstate(divide='ignore'):
+        return 10 * np.log10(ratio)
+
+
+def calculate_snr_batch(original_signal, processed_signal, axis=0):
+    """
+    批量计算信噪比
+
+    参数:
+        original_signal: 原始信号, 形如 (samples,), (samples, channels) 或任意批量形状
+        processed_signal: 处理后/带噪信号, 形状与原始信号相同
+        axis: 采样点所在的轴 (默认0, 与 sf.read 的 (samples, channels) 一致)
+
+    返回:
+        去掉 axis 轴后的信噪比数组 (dB); 一维输入返回标量
+    """
+    original_signal, processed_signal = _as_float_pair(original_signal, processed_signal)
+    signal_energy = np.sum(original_signal ** 2, axis=axis)
+    noise_energy = np.sum((processed_signal - original_signal) ** 2, axis=axis)
+    return _power_ratio_db(signal_energy, noise_energy)
+
+
+def calculate_segmental_snr(original_signal, processed_signal, frame_length=512,
+                            axis=0, min_db=-10.0, max_db=35.0):
+    """
+    批量计算分段信噪比
+
+    参数:
+        original_signal: 原始信号
+        processed_signal: 处理后信号
+        frame_length: 分段长度 (采样点), 末尾不足一段的部分被丢弃
+        axis: 采样点所在的轴
+        min_db: 每段SNR的下限
+        max_db: 每段SNR的上限
+
+    返回:
+        各信号的分段信噪比 (dB)
+    """
+    original_signal, processed_signal = _as_float_pair(original_signal, processed_signal)
+    original_signal = np.moveaxis(original_signal, axis, -1)
+    processed_signal = np.moveaxis(processed_signal, axis, -1)
+
+    n_frames = original_signal.shape[-1] // frame_length
+    if n_frames == 0:
+        raise ValueError(f"信号长度必须不小于分段长度 {frame_length}")
+
+    usable = n_frames * frame_length
+    frame_shape = original_signal.shape[:-1] + (n_frames, frame_length)
+    original_frames = original_signal[..., :usable].reshape(frame_shape)
+    processed_frames = processed_signal[..., :usable].reshape(frame_shape)
+
+    signal_energy = np.sum(original_frames ** 2, axis=-1)
+    noise_energy = np.sum((processed_frames - original_frames) ** 2, axis=-1)
+    frame_snr = np.clip(_power_ratio_db(signal_energy, noise_energy), min_db, max_db)
+
+    return np.mean(frame_snr, axis=-1)
+
+
+def calculate_psnr_batch(original_signal, processed_signal, axis=0):
+    """
+    批量计算峰值信噪比
+
+    参数:
+        original_signal: 原始信号
+        processed_signal: 处理后信号
+        axis: 采样点所在的轴
+
+    返回:
+        各信号的峰值信噪比 (dB)
+    """
+    original_signal, processed_signal = _as_float_pair(original_signal, processed_signal)
+    peak = np.max(np.abs(original_signal), axis=axis)
+    mse = np.mean((original_signal - processed_signal) ** 2, axis=axis)
+    return _power_ratio_db(peak ** 2, mse)
+
+
+def calculate_si_sdr(reference_signal, estimated_signal, axis=0, zero_mean=True):
+    """
+    批量计算尺度不变信号失真比 (SI-SDR)
+
+    参数:
+        reference_signal: 参考 (干净) 信号
+        estimated_signal: 估计 (处理后) 信号
+        axis: 采样点所在的轴
+        zero_mean: 是否先去除均值
+
+    返回:
+        各信号的 SI-SDR (dB)
+    """
+    reference_signal, estimated_signal = _as_float_pair(reference_signal, estimated_signal)
+    if zero_mean:
+        reference_signal = reference_signal - np.mean(reference_signal, axis=axis, keepdims=True)
+        estimated_signal = estimated_signal - np.mean(estimated_signal, axis=axis, keepdims=True)
+
+    ref_energy = np.sum(reference_signal ** 2, axis=axis, keepdims=True)
+    cross = np.sum(reference_signal * estimated_signal, axis=axis, keepdims=True)
+    scale = cross / (ref_energy + _EPS)
+
+    target = scale * reference_signal
+    distortion = estimated_signal - target
+    return _power_ratio_db(
+        np.sum(target ** 2, axis=axis), np.sum(distortion ** 2, axis=axis)
+    )
+
+
+class StreamingMetrics:
+    """
+    流式评价指标
+
+    按块累加能量、互相关和峰值, 不需要保存整段信号即可得到
+    SNR、分段SNR、PSNR 和 SI-SDR。块的形状为 (samples, ...)，
+    采样点轴固定为第0轴。
+    """
+
+    def __init__(self, frame_length=512, min_db=-10.0, max_db=35.0):
+        self.frame_length = frame_length
+        self.min_db = min_db
+        self.max_db = max_db
+        self.reset()
+
+    def reset(self):
+        """清空所有累加量"""
+        self.n_samples = 0
+        self.signal_energy = 0.0
+        self.noise_energy = 0.0
+        self.peak = 0.0
+        self.sum_ref = 0.0
+        self.sum_est = 0.0
+        self.sum_ref_sq = 0.0
+        self.sum_est_sq = 0.0
+        self.sum_cross = 0.0
+        self._segment_sum = 0.0
+        self._segment_count = 0
+        self._pending_ref = None
+        self._pending_est = None
+
+    def update(self, original_block, processed_block):
+        """
+        累加一块数据
+
+        参数:
+            original_block: 原始信号块
+            processed_block: 处理后信号块
+        """
+        original_block, processed_block = _as_float_pair(original_block, processed_block)
+        if original_block.shape[0] == 0:
+            return
+
+        error = processed_block - original_block
+        self.n_samples += original_block.shape[0]
+        self.signal_energy = self.signal_energy + np.sum(original_block ** 2, axis=0)
+        self.noise_energy = self.noise_energy + np.sum(error ** 2, axis=0)
+        self.peak = np.maximum(self.peak, np.max(np.abs(original_block), axis=0))
+        self.sum_ref = self.sum_ref + np.sum(original_block, axis=0)
+        self.sum_est = self.sum_est + np.sum(processed_block, axis=0)
+        self.sum_ref_sq = self.sum_ref_sq + np.sum(original_block ** 2, axis=0)
+        self.sum_est_sq = self.sum_est_sq + np.sum(processed_block ** 2, axis=0)
+        self.sum_cross = self.sum_cross + np.sum(original_block * processed_block, axis=0)
+
+        self._update_segments(original_block, processed_block)
+
+    def _update_segments(self, original_block, processed_block):
+        """按固定分段长度累加分段SNR, 跨块的残余部分留到下次"""
+        if self._pending_ref is not None:
+            original_block = np.concatenate([self._pending_ref, original_block])
+            processed_block = np.concatenate([self._pending_est, processed_block])
+
+        n_frames = original_block.shape[0] // self.frame_length
+        usable = n_frames * self.frame_length
+        if n_frames > 0:
+            frame_shape = (n_frames, self.frame_length) + original_block.shape[1:]
+            ref_frames = original_block[:usable].reshape(frame_shape)
+            est_frames = processed_block[:usable].reshape(frame_shape)
+            frame_snr = np.clip(
+                _power_ratio_db(
+                    np.sum(ref_frames ** 2, axis=1),
+                    np.sum((est_frames - ref_frames) ** 2, axis=1),
+                ),
+                self.min_db, self.max_db,
+            )
+            self._segment_sum = self._segment_sum + np.sum(frame_snr, axis=0)
+            self._segment_count += n_frames
+
+        if usable < original_block.shape[0]:
+            self._pending_ref = original_block[usable:].copy()
+            self._pending_est = processed_block[usable:].copy()
+        else:
+            self._pending_ref = None
+            self._pending_est = None
+
+    @property
+    def snr(self):
+        """当前累计的信噪比 (dB)"""
+        return _power_ratio_db(self.signal_energy, self.noise_energy)
+
+    @property
+    def segmental_snr(self):
+        """当前累计的分段信噪比 (dB)"""
+        if self._segment_count == 0:
+            raise ValueError("尚未累计满一个分段")
+        return self._segment_sum / self._segment_count
+
+    @property
+    def psnr(self):
+        """当前累计的峰值信噪比 (dB)"""
+        mse = self.noise_energy / max(self.n_samples, 1)
+        return _power_ratio_db(self.peak ** 2, mse)
+
+    def si_sdr(self, zero_mean=True):
+        """
+        由累加和计算 SI-SDR
+
+        参数:
+            zero_mean: 是否去除均值 (利用累加和修正, 无需第二遍)
+
+        返回:
+            SI-SDR (dB)
+        """
+        n = max(self.n_samples, 1)
+        ref_sq = self.sum_ref_sq
+        est_sq = self.sum_est_sq
+        cross = self.sum_cross
+        if zero_mean:
+            ref_sq = ref_sq - self.sum_ref ** 2 / n
+            est_sq = est_sq - self.sum_est ** 2 / n
+            cross = cross - self.sum_ref * self.sum_est / n
+
+        scale = cross / (ref_sq + _EPS)
+        target_energy = scale ** 2 * ref_sq
+        distortion_energy = est_sq - 2 * scale * cross + scale ** 2 * ref_sq
+        return _power_ratio_db(target_energy, np.maximum(distortion_energy, 0.0))
+
+    def summary(self):
+        """以字典形式返回全部指标"""
+        result = {
+            'snr': self.snr,
+            'psnr': self.psnr,
+            'si_sdr': self.si_sdr(),
+        }
+        if self._segment_count > 0:
+            result['segmental_snr'] = self.segmental_snr
+        return result
@@ -2,27 +2,45 @@
 # -*- coding: utf-8 -*-
 """
 噪声生成模块
-实现高斯白噪声、窄带高斯噪声和单频干扰的添加
+实现高斯白噪声、窄带高斯噪声、有色噪声和单频干扰的添加
 """
 
 import numpy as np
-from scipy import signal
 
-def add_gaussian_noise(audio_data, snr_db=10):
+from .metrics import calculate_snr_batch
+from .synth import synthesize_noise
+from .profiles import generate_profile_noise
+from .profiling import profiled
+
+def _output_array(audio_data, out):
+    """结果数组: 调用方提供的输出数组, 未提供时新分配 (各函数把结果直接算入其中, 不产生整段临时数组)"""
+    if out is None:
+        return np.empty(audio_data.shape, dtype=np.result_type(audio_data, np.float64))
+    if out.shape != audio_data.shape:
+        raise ValueError(f"输出数组形状 {out.shape} 与输入 {audio_data.shape} 不一致")
+    return out
+
+@profiled
+def add_gaussian_noise(audio_data, snr_db=10, out=None, rng=None):
     """
     添加高斯白噪声
     
     参数:
         audio_data: 原始音频数据
         snr_db: 信噪比 (dB)
+        out: 可选的输出数组 (如共享内存视图), 结果直接写入其中
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
     
     返回:
         带噪音频数据
     """
+    if rng is None:
+        rng = np.random
+    out = _output_array(audio_data, out)
+    
     # 处理立体声音频
     if len(audio_data.shape) > 1:
         # 立体声，对每个声道分别处理
-        noisy_channels = []
         for channel in range(audio_data.shape[1]):
             channel_data = audio_data[:, channel]
             # 计算信号功率
@@ -32,13 +50,12 @@ def add_gaussian_noise(audio_data, snr_db=10):
             noise_power = signal_power / (10 ** (snr_db / 10))
             
             # 生成高斯白噪声
-            noise = np.random.normal(0, np.sqrt(noise_power), len(channel_data))
+            noise = rng.normal(0, np.sqrt(noise_power), len(channel_data))
             
-            # 添加噪声
-            noisy_channel = channel_data + noise
-            noisy_channels.append(noisy_channel)
+            # 添加噪声 (直接写入输出数组的对应声道)
+            np.add(channel_data, noise, out=out[:, channel])
         
-        return np.column_stack(noisy_channels)
+        return out
     else:
         # 单声道
         # 计算信号功率
@@ -48,14 +65,14 @@ def add_gaussian_noise(audio_data, snr_db=10):
         noise_power = signal_power / (10 ** (snr_db / 10))
         
         # 生成高斯白噪声
-        noise = np.random.normal(0, np.sqrt(noise_power), len(audio_data))
+        noise = rng.normal(0, np.sqrt(noise_power), len(audio_data))
         
         # 添加噪声
-        noisy_signal = audio_data + noise
-        
-        return noisy_signal
+        return np.add(audio_data, noise, out=out)
 
-def add_narrowband_noise(audio_data, sample_rate, low_freq=1000, high_freq=2000, snr_db=15):
+@profiled
+def add_narrowband_noise(audio_data, sample_rate, low_freq=1000, high_freq=2000, snr_db=15, out=None,
+                         rng=None):
     """
     添加窄带高斯噪声
     
@@ -65,61 +82,100 @@ def add_narrowband_noise(audio_data, sample_rate, low_freq=1000, high_freq=2000,
         low_freq: 低频截止频率
         high_freq: 高频截止频率
         snr_db: 信噪比 (dB)
+        out: 可选的输出数组 (如共享内存视图), 结果直接写入其中
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
     
     返回:
         带噪音频数据
     """
+    if rng is None:
+        rng = np.random
+    out = _output_array(audio_data, out)
+    
     # 处理立体声音频
     if len(audio_data.shape) > 1:
         # 立体声，对每个声道分别处理
-        noisy_channels = []
         for channel in range(audio_data.shape[1]):
-            channel_data = audio_data[:, channel]
-            noisy_channel = _add_narrowband_noise_single_channel(
-                channel_data, sample_rate, low_freq, high_freq, snr_db
+            _add_narrowband_noise_single_channel(
+                audio_data[:, channel], sample_rate, low_freq, high_freq, snr_db, rng, out[:, channel]
             )
-            noisy_channels.append(noisy_channel)
-        
-        return np.column_stack(noisy_channels)
+        return out
     else:
         # 单声道
         return _add_narrowband_noise_single_channel(
-            audio_data, sample_rate, low_freq, high_freq, snr_db
+            audio_data, sample_rate, low_freq, high_freq, snr_db, rng, out
         )
 
-def _add_narrowband_noise_single_channel(audio_data, sample_rate, low_freq, high_freq, snr_db):
-    """为单声道添加窄带噪声"""
+def _add_narrowband_noise_single_channel(audio_data, sample_rate, low_freq, high_freq, snr_db, rng, out):
+    """为单声道添加窄带噪声 (结果写入 out)"""
     # 计算信号功率
     signal_power = np.mean(audio_data ** 2)
     
     # 根据信噪比计算噪声功率
     noise_power = signal_power / (10 ** (snr_db / 10))
     
-    # 生成高斯白噪声
-    white_noise = np.random.normal(0, 1, len(audio_data))
+    # 在频域直接合成带内噪声, 功率由 Parseval 定理精确给定, 无需滤波和再次测量
+    narrowband_noise = synthesize_noise(
+        len(audio_data), sample_rate, [(low_freq, high_freq)], power=noise_power, rng=rng
+    )
     
-    # 设计带通滤波器
-    nyquist = sample_rate / 2
-    low_norm = low_freq / nyquist
-    high_norm = high_freq / nyquist
+    # 添加噪声
+    return np.add(audio_data, narrowband_noise, out=out)
+
+@profiled
+def add_colored_noise(audio_data, sample_rate, shape='pink', snr_db=10, out=None, rng=None):
+    """
+    添加任意谱形的噪声
     
-    # 使用巴特沃斯滤波器
-    b, a = signal.butter(4, [low_norm, high_norm], btype='band')
+    参数:
+        audio_data: 原始音频数据
+        sample_rate: 采样率
+        shape: 谱形 ('pink', 'brown', 频带列表, (freqs, psd) 实测噪声谱等, 见 synth.shape_psd)
+        snr_db: 信噪比 (dB)
+        out: 可选的输出数组 (如共享内存视图), 结果直接写入其中
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
     
-    # 滤波得到窄带噪声
-    narrowband_noise = signal.filtfilt(b, a, white_noise)
+    返回:
+        带噪音频数据
+    """
+    # 各声道按自身功率确定噪声功率, 一次合成所有声道
+    signal_power = np.mean(audio_data ** 2, axis=0)
+    noise_power = signal_power / (10 ** (snr_db / 10))
+    channels = audio_data.shape[1] if audio_data.ndim > 1 else None
     
-    # 调整噪声功率
-    current_power = np.mean(narrowband_noise ** 2)
-    scale_factor = np.sqrt(noise_power / current_power)
-    narrowband_noise = narrowband_noise * scale_factor
+    noise = synthesize_noise(len(audio_data), sample_rate, shape, power=noise_power,
+                             channels=channels, rng=rng)
     
-    # 添加噪声
-    noisy_signal = audio_data + narrowband_noise
+    return np.add(audio_data, noise, out=_output_array(audio_data, out))
+
+@profiled
+def add_profile_noise(audio_data, sample_rate, profile, snr_db=10, method='psd', out=None, rng=None):
+    """
+    添加与实测噪声谱匹配的噪声
     
-    return noisy_signal
+    参数:
+        audio_data: 原始音频数据
+        sample_rate: 采样率
+        profile: NoiseProfile对象 (见 profiles.capture_noise_profile / NoiseProfileLibrary)
+        snr_db: 信噪比 (dB)
+        method: 'psd' 按功率谱合成, 'loop' 循环回放保存的噪声片段
+        out: 可选的输出数组 (如共享内存视图), 结果直接写入其中
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
+    
+    返回:
+        带噪音频数据
+    """
+    signal_power = np.mean(audio_data ** 2, axis=0)
+    noise_power = signal_power / (10 ** (snr_db / 10))
+    channels = audio_data.shape[1] if audio_data.ndim > 1 else None
+    
+    noise = generate_profile_noise(profile, len(audio_data), sample_rate, power=noise_power,
+                                   channels=channels, rng=rng, method=method)
+    
+    return np.add(audio_data, noise, out=_output_array(audio_data, out))
 
-def add_single_frequency_interference(audio_data, sample_rate, frequency=1500, amplitude=0.3):
+@profiled
+def add_single_frequency_interference(audio_data, sample_rate, frequency=1500, amplitude=0.3, out=None):
     """
     添加单频干扰 (正弦波)
     
@@ -128,75 +184,49 @@ def add_single_frequency_interference(audio_data, sample_rate, frequency=1500, a
         sample_rate: 采样率
         frequency: 干扰频率
         amplitude: 干扰幅度
+        out: 可选的输出数组 (如共享内存视图), 结果直接写入其中
     
     返回:
         带噪音频数据
     """
     # 生成时间轴
     t = np.arange(len(audio_data)) / sample_rate
+    out = _output_array(audio_data, out)
+    
+    # 生成正弦波干扰 (所有声道相同)
+    interference = amplitude * np.sin(2 * np.pi * frequency * t)
     
     # 处理立体声音频
     if len(audio_data.shape) > 1:
-        # 立体声，对每个声道分别处理
-        noisy_channels = []
+        # 立体声，对每个声道分别添加干扰
         for channel in range(audio_data.shape[1]):
-            channel_data = audio_data[:, channel]
-            # 生成正弦波干扰
-            interference = amplitude * np.sin(2 * np.pi * frequency * t)
-            # 添加干扰
-            noisy_channel = channel_data + interference
-            noisy_channels.append(noisy_channel)
-        
-        return np.column_stack(noisy_channels)
+            np.add(audio_data[:, channel], interference, out=out[:, channel])
+        return out
     else:
         # 单声道
-        # 生成正弦波干扰
-        interference = amplitude * np.sin(2 * np.pi * frequency * t)
-        # 添加干扰
-        noisy_signal = audio_data + interference
-        
-        return noisy_signal
+        return np.add(audio_data, interference, out=out)
 
-def calculate_snr(original_signal, noisy_signal):
+@profiled
+def calculate_snr(original_signal, noisy_signal, segments=None):
     """
     计算信噪比
     
     参数:
         original_signal: 原始信号
         noisy_signal: 带噪信号
+        segments: SegmentIndex, 提供时只统计有声段
     
     返回:
         信噪比 (dB)
     """
-    # 处理立体声音频
-    if len(original_signal.shape) > 1:
-        # 立体声，计算所有声道的平均SNR
-        snrs = []
-        for channel in range(original_signal.shape[1]):
-            orig_channel = original_signal[:, channel]
-            noisy_channel = noisy_signal[:, channel]
-            snr = _calculate_snr_single_channel(orig_channel, noisy_channel)
-            snrs.append(snr)
-        return np.mean(snrs)
-    else:
-        # 单声道
-        return _calculate_snr_single_channel(original_signal, noisy_signal)
-
-def _calculate_snr_single_channel(original_signal, noisy_signal):
-    """计算单声道信噪比"""
-    # 计算信号功率
-    signal_power = np.mean(original_signal ** 2)
-    
-    # 计算噪声功率
-    noise = noisy_signal - original_signal
-    noise_power = np.mean(noise ** 2)
-    
-    # 计算信噪比
-    snr = 10 * np.log10(signal_power / noise_power)
-    
-    return snr
+    if segments is not None:
+        original_signal = segments.gather(original_signal)
+        noisy_signal = segments.gather(noisy_signal)
+    # 立体声返回所有声道的平均SNR, 各声道在一次向量化调用中计算
+    return np.mean(calculate_snr_batch(original_signal, noisy_signal, axis=0))
 
-def add_impulse_noise(audio_data, probability=0.01, amplitude=0.5):
+@profiled
+def add_impulse_noise(audio_data, probability=0.01, amplitude=0.5, out=None, rng=None):
     """
     添加脉冲噪声 (可选功能)
     
@@ -204,34 +234,60 @@ def add_impulse_noise(audio_data, probability=0.01, amplitude=0.5):
         audio_data: 原始音频数据
         probability: 脉冲出现概率
         amplitude: 脉冲幅度
+        out: 可选的输出数组 (如共享内存视图), 结果直接写入其中
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
     
     返回:
         带噪音频数据
     """
+    if rng is None:
+        rng = np.random
+    
+    out = _output_array(audio_data, out)
+    
     # 处理立体声音频
     if len(audio_data.shape) > 1:
         # 立体声，对每个声道分别处理
-        noisy_channels = []
         for channel in range(audio_data.shape[1]):
-            channel_data = audio_data[:, channel]
-            noisy_channel = _add_impulse_noise_single_channel(
-                channel_data, probability, amplitude
+            _add_impulse_noise_single_channel(
+                audio_data[:, channel], probability, amplitude, rng, out[:, channel]
             )
-            noisy_channels.append(noisy_channel)
-        
-        return np.column_stack(noisy_channels)
+        return out
     else:
         # 单声道
-        return _add_impulse_noise_single_channel(audio_data, probability, amplitude)
+        return _add_impulse_noise_single_channel(audio_data, probability, amplitude, rng, out)
 
-def _add_impulse_noise_single_channel(audio_data, probability, amplitude):
-    """为单声道添加脉冲噪声"""
-    noisy_signal = audio_data.copy()
+def _sparse_impulse_positions(n_samples, probability, rng):
+    """
+    稀疏生成脉冲位置
+    
+    相邻脉冲的间隔服从几何分布, 与逐点伯努利试验等价,
+    但只需生成约 n_samples * probability 个随机数
+    """
+    if probability <= 0 or n_samples == 0:
+        return np.empty(0, dtype=np.int64)
+    if probability >= 1:
+        return np.arange(n_samples)
     
-    # 随机生成脉冲位置
-    impulse_positions = np.random.random(len(audio_data)) < probability
+    expected = n_samples * probability
+    batch = int(expected + 5 * np.sqrt(expected)) + 16
+    positions = np.cumsum(rng.geometric(probability, size=batch)) - 1
+    # 极少数情况下一批间隔不够覆盖整个信号, 继续生成
+    while positions[-1] < n_samples:
+        more = positions[-1] + np.cumsum(rng.geometric(probability, size=batch))
+        positions = np.concatenate([positions, more])
+    
+    return positions[:np.searchsorted(positions, n_samples)]
+
+def _add_impulse_noise_single_channel(audio_data, probability, amplitude, rng, out):
+    """为单声道添加脉冲噪声 (结果写入 out)"""
+    noisy_signal = out
+    noisy_signal[...] = audio_data
+    
+    # 稀疏生成脉冲位置
+    impulse_positions = _sparse_impulse_positions(len(audio_data), probability, rng)
     
     # 添加脉冲噪声
-    noisy_signal[impulse_positions] += amplitude * np.random.choice([-1, 1], size=np.sum(impulse_positions))
+    noisy_signal[impulse_positions] += amplitude * rng.choice([-1, 1], size=len(impulse_positions))
     
-    return noisy_signal 
\ No newline at end of file
+    return noisy_signal
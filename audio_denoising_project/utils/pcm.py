@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+整数PCM音频模块
+以 int16/int32 原样保存 PCM 采样和缩放系数 (16位音频只占 float64 的 1/4 内存)，
+只在处理时按块转换为浮点，写回 PCM 时也按块量化，不产生整段浮点中间数组
+"""
+
+import numpy as np
+import soundfile as sf
+
+# 每次转换的帧数
+DEFAULT_BLOCK_SIZE = 65536
+
+# 支持的整数类型 -> 默认写出的采样格式
+_DEFAULT_SUBTYPES = {
+    np.dtype(np.int16): 'PCM_16',
+    np.dtype(np.int32): 'PCM_32',
+}
+
+
+class PCMArray:
+    """
+    整数PCM音频
+
+    data 为形如 (frames,) 或 (frames, channels) 的 int16/int32 数组,
+    浮点值 = data * scale (scale = 1 / 2^(位数-1), 与 soundfile 读取浮点时的归一化一致)。
+    np.asarray(pcm) 得到 float64 的完整副本, 便于传给只接受浮点数组的函数。
+    """
+
+    def __init__(self, data, sample_rate, subtype=None):
+        """
+        参数:
+            data: int16 或 int32 数组
+            sample_rate: 采样率
+            subtype: 源文件的采样格式 (如 'PCM_24'), 默认由整数类型决定
+        """
+        data = np.asarray(data)
+        if data.dtype not in _DEFAULT_SUBTYPES:
+            raise ValueError(f"PCM数据必须是 int16 或 int32, 实际为 {data.dtype}")
+        self.data = data
+        self.sample_rate = sample_rate
+        self.subtype = subtype or _DEFAULT_SUBTYPES[data.dtype]
+        self.scale = 1.0 / (np.iinfo(data.dtype).max + 1)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        """按帧切片, 返回共享数据的 PCMArray"""
+        return PCMArray(self.data[index], self.sample_rate, self.subtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def ndim(self):
+        return self.data.ndim
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def channels(self):
+        return self.data.shape[1] if self.data.ndim > 1 else 1
+
+    def blocks(self, block_size=DEFAULT_BLOCK_SIZE, dtype=np.float32):
+        """
+        按块产出浮点数据
+
+        参数:
+            block_size: 每块帧数
+            dtype: 浮点类型
+
+        返回:
+            生成器, 产出 (起始帧, 浮点块); 各块复用同一缓冲区, 下一次迭代前有效
+        """
+        buffer = np.empty((min(block_size, len(self)),) + self.data.shape[1:], dtype=dtype)
+        for start in range(0, len(self), block_size):
+            chunk = self.data[start:start + block_size]
+            out = buffer[:len(chunk)]
+            out[...] = chunk
+            out *= self.scale
+            yield start, out
+
+    def to_float(self, dtype=np.float32, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        转换为浮点数组 (直接写入目标数组, 不经过 float64 中间结果)
+
+        参数:
+            dtype: 浮点类型
+            block_size: 每块帧数
+
+        返回:
+            浮点数组
+        """
+        out = np.empty(self.data.shape, dtype=dtype)
+        for start in range(0, len(self), block_size):
+            block = out[start:start + block_size]
+            block[...] = self.data[start:start + block_size]
+            block *= self.scale
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_float(np.float64 if dtype is None else dtype)
+
+    @classmethod
+    def from_float(cls, data, sample_rate, dtype=np.int16, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        把浮点音频按块量化为PCM (超出 [-1, 1) 的部分限幅)
+
+        与 libsndfile 写整数格式的结果逐采样一致: 先按32位取整, 16位再舍去低16位 (向下取整)。
+
+        参数:
+            data: 浮点音频
+            sample_rate: 采样率
+            dtype: 目标整数类型
+            block_size: 每块帧数
+
+        返回:
+            PCMArray对象
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in _DEFAULT_SUBTYPES:
+            raise ValueError(f"PCM数据必须是 int16 或 int32, 实际为 {dtype}")
+        int32 = np.iinfo(np.int32)
+        shift = 2.0 ** (32 - np.iinfo(dtype).bits)
+
+        out = np.empty(data.shape, dtype=dtype)
+        buffer = np.empty((min(block_size, len(data)),) + data.shape[1:], dtype=np.float64)
+        for start in range(0, len(data), block_size):
+            block = buffer[:len(data[start:start + block_size])]
+            np.multiply(data[start:start + block_size], 2.0 ** 31, out=block)
+            np.rint(block, out=block)
+            np.clip(block, int32.min, int32.max, out=block)
+            if shift > 1:
+                block /= shift
+                np.floor(block, out=block)
+            out[start:start + len(block)] = block
+        return cls(out, sample_rate)
+
+
+def load_pcm(path, dtype='int16', start=0, stop=None):
+    """
+    以整数PCM读取音频文件 (不经过浮点)
+
+    参数:
+        path: 音频文件路径
+        dtype: 'int16' 或 'int32' (24/32位源文件应使用 int32 以免损失精度)
+        start: 起始帧
+        stop: 结束帧, 默认到结尾
+
+    返回:
+        PCMArray对象
+    """
+    if np.dtype(dtype) not in _DEFAULT_SUBTYPES:
+        raise ValueError(f"不支持的PCM类型: {dtype}, 可选: 'int16', 'int32'")
+    data, sample_rate = sf.read(str(path), dtype=dtype, start=start, stop=stop)
+    return PCMArray(data, sample_rate, sf.info(str(path)).subtype)
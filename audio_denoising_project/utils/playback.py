@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频播放模块
+用单个 sd.OutputStream 的回调连续播放队列中的音频：
+同一片段的多个版本 (原始/带噪/滤波后) 共用一个播放位置，可即时 A/B 切换、跳转，
+队列中的片段之间无缝衔接，不需要反复调用 sd.play/sd.wait 重新提交整段数组
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class _QueueItem:
+    """队列中的一个片段: 若干等长版本共用播放位置"""
+
+    def __init__(self, tracks, label):
+        self.tracks = tracks
+        self.label = label
+        self.length = max(len(data) for data in tracks.values())
+
+
+class PlaybackEngine:
+    """
+    基于回调的播放引擎
+
+    回调只在锁内做切片拷贝, 控制操作 (切换、跳转、入队) 随时可从其他线程调用,
+    下一个音频块即生效。不打开音频流时也可以直接调用 callback() 取数据 (便于测试)。
+    """
+
+    def __init__(self, sample_rate, channels=None, blocksize=1024, device=None):
+        """
+        参数:
+            sample_rate: 采样率 (所有片段必须一致)
+            channels: 输出声道数, 默认取打开音频流时队列中最多的声道数
+            blocksize: 每次回调的帧数
+            device: 输出设备 (sounddevice 设备编号或名称)
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.device = device
+
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._current = None
+        self._selected = None
+        self._position = 0
+        self._paused = False
+        self._finished = threading.Event()
+        self._finished.set()
+        self._stream = None
+        self.underflows = 0
+
+    # ---- 数据准备 ----
+
+    def _prepare(self, data):
+        """转换为 (frames, channels) float32 (已是 float32 时不拷贝)"""
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim == 1:
+            data = data[:, None]
+        if data.ndim != 2:
+            raise ValueError(f"音频数据必须是一维或二维数组, 实际为 {data.ndim} 维")
+        if self.channels is not None and data.shape[1] not in (1, self.channels):
+            raise ValueError(f"声道数 {data.shape[1]} 与输出声道数 {self.channels} 不匹配")
+        return data
+
+    def _make_item(self, tracks, label):
+        if not isinstance(tracks, dict):
+            tracks = {'default': tracks}
+        if not tracks:
+            raise ValueError("没有可播放的音频")
+        return _QueueItem({name: self._prepare(data) for name, data in tracks.items()}, label)
+
+    def _variant(self, item):
+        """当前选中的版本, 片段中没有该版本时使用第一个版本"""
+        data = item.tracks.get(self._selected)
+        if data is None:
+            data = next(iter(item.tracks.values()))
+        return data
+
+    def _advance(self):
+        """切换到队列中的下一个片段 (需持有锁)"""
+        self._position = 0
+        self._current = self._queue.popleft() if self._queue else None
+        if self._current is None:
+            self._finished.set()
+
+    # ---- 音频回调 ----
+
+    def callback(self, outdata, frames, time_info, status):
+        """
+        sounddevice 输出回调: 从当前位置拷贝 frames 帧到 outdata, 片段结束时无缝衔接下一个
+
+        参数:
+            outdata: 形如 (frames, channels) 的输出缓冲
+            frames: 帧数
+            time_info: 时间信息 (未使用)
+            status: 回调状态 (统计欠载次数)
+        """
+        if status:
+            self.underflows += 1
+        written = 0
+        with self._lock:
+            while written < frames and self._current is not None and not self._paused:
+                item = self._current
+                data = self._variant(item)
+                n = min(frames - written, item.length - self._position)
+                chunk = data[self._position:self._position + n]
+                # 单声道数据广播到所有输出声道; 较短的版本用静音补齐
+                outdata[written:written + len(chunk)] = chunk
+                outdata[written + len(chunk):written + n] = 0
+                written += n
+                self._position += n
+                if self._position >= item.length:
+                    self._advance()
+        outdata[written:] = 0
+
+    # ---- 播放控制 ----
+
+    def enqueue(self, tracks, label=None):
+        """
+        把片段加入播放队列末尾 (与前一个片段无缝衔接)
+
+        参数:
+            tracks: 音频数组, 或 {版本名: 音频数组} 字典 (同一片段的不同版本)
+            label: 片段名称
+
+        返回:
+            加入后队列中等待的片段数
+        """
+        item = self._make_item(tracks, label)
+        with self._lock:
+            if self._current is None:
+                self._current = item
+                self._position = 0
+            else:
+                self._queue.append(item)
+            self._finished.clear()
+            return len(self._queue)
+
+    def play(self, tracks, variant=None, label=None):
+        """
+        清空队列并立即播放
+
+        参数:
+            tracks: 音频数组或 {版本名: 音频数组} 字典
+            variant: 初始播放的版本名, 默认为第一个
+            label: 片段名称
+        """
+        item = self._make_item(tracks, label)
+        with self._lock:
+            self._queue.clear()
+            self._current = item
+            self._position = 0
+            self._selected = variant if variant is not None else next(iter(item.tracks))
+            self._paused = False
+            self._finished.clear()
+        self.start()
+
+    def select(self, variant):
+        """
+        切换播放版本 (A/B 对比), 保持当前播放位置
+
+        参数:
+            variant: 版本名
+        """
+        with self._lock:
+            if self._current is not None and variant not in self._current.tracks:
+                raise ValueError(f"当前片段没有版本: {variant}, 可选: {list(self._current.tracks)}")
+            self._selected = variant
+
+    def seek(self, seconds):
+        """
+        跳转到当前片段的指定时间
+
+        参数:
+            seconds: 时间 (秒), 超出范围时截断到片段内
+        """
+        with self._lock:
+            if self._current is None:
+                return
+            frame = int(round(seconds * self.sample_rate))
+            self._position = min(max(frame, 0), self._current.length - 1)
+
+    def pause(self):
+        """暂停 (输出静音, 保持位置)"""
+        with self._lock:
+            self._paused = True
+
+    def resume(self):
+        """继续播放"""
+        with self._lock:
+            self._paused = False
+
+    def stop(self):
+        """停止播放并清空队列 (音频流保持打开, 下次播放无需重新打开)"""
+        with self._lock:
+            self._queue.clear()
+            self._current = None
+            self._position = 0
+            self._paused = False
+            self._finished.set()
+
+    def wait(self, timeout=None):
+        """
+        等待队列播放完毕
+
+        参数:
+            timeout: 超时时间 (秒), None 表示一直等待
+
+        返回:
+            播放是否已结束
+        """
+        return self._finished.wait(timeout)
+
+    # ---- 状态 ----
+
+    @property
+    def is_playing(self):
+        return self._current is not None and not self._paused
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @property
+    def position(self):
+        """当前片段的播放位置 (秒)"""
+        return self._position / self.sample_rate
+
+    @property
+    def duration(self):
+        """当前片段时长 (秒)"""
+        current = self._current
+        return 0.0 if current is None else current.length / self.sample_rate
+
+    @property
+    def selected(self):
+        return self._selected
+
+    @property
+    def current_label(self):
+        current = self._current
+        return None if current is None else current.label
+
+    @property
+    def variants(self):
+        """当前片段的版本名列表"""
+        current = self._current
+        return [] if current is None else list(current.tracks)
+
+    # ---- 音频流 ----
+
+    def start(self):
+        """打开并启动输出流 (已打开时不做任何事)"""
+        if self._stream is not None:
+            return
+        # 仅在播放时导入, 无PortAudio的环境也能使用其余功能
+        import sounddevice as sd
+
+        if self.channels is None:
+            with self._lock:
+                items = ([self._current] if self._current is not None else []) + list(self._queue)
+            self.channels = max((data.shape[1] for item in items for data in item.tracks.values()),
+                                default=1)
+        self._stream = sd.OutputStream(
+            samplerate=self.sample_rate, channels=self.channels, dtype='float32',
+            blocksize=self.blocksize, device=self.device, callback=self.callback
+        )
+        self._stream.start()
+
+    def close(self):
+        """停止播放并关闭输出流"""
+        self.stop()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
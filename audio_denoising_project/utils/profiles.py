@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+噪声谱库模块
+从录音中截取真实噪声 (功率谱密度和/或短循环片段)，以紧凑的带索引格式保存，
+并按保存的噪声谱快速生成任意长度的噪声用于数据增强
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+from scipy import signal
+
+from .synth import NoiseStream, synthesize_noise
+
+# 每个噪声谱缓存的频谱整形数组个数
+_SHAPING_CACHE_SIZE = 8
+
+# 超过该长度时改用重叠相加流式生成, 避免超长FFT
+_MAX_DIRECT_SAMPLES = 2 ** 21
+
+
+class NoiseProfile:
+    """
+    噪声谱
+
+    frequencies/psd 为 Welch 估计的单边功率谱密度；
+    loop 为可选的原始噪声片段 (单声道 float32)，用于循环回放。
+    """
+
+    def __init__(self, name, sample_rate, frequencies, psd, loop=None, metadata=None):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.frequencies = np.asarray(frequencies, dtype=np.float32)
+        self.psd = np.asarray(psd, dtype=np.float32)
+        self.loop = None if loop is None else np.asarray(loop, dtype=np.float32)
+        self.metadata = dict(metadata or {})
+        self._shaping_cache = OrderedDict()
+
+    @property
+    def power(self):
+        """噪声谱对应的平均功率 (Welch 频点等间隔)"""
+        if len(self.frequencies) < 2:
+            return 0.0
+        return float(np.sum(self.psd, dtype=np.float64) * (self.frequencies[1] - self.frequencies[0]))
+
+    def shaping_psd(self, n_fft, sample_rate):
+        """
+        把噪声谱插值到长度为 n_fft 的 rFFT 频点网格 (结果按 (n_fft, 采样率) 缓存)
+
+        参数:
+            n_fft: FFT长度
+            sample_rate: 目标采样率
+
+        返回:
+            长度为 n_fft // 2 + 1 的功率权重
+        """
+        key = (n_fft, sample_rate)
+        cached = self._shaping_cache.get(key)
+        if cached is not None:
+            self._shaping_cache.move_to_end(key)
+            return cached
+
+        grid = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+        psd = np.interp(grid, self.frequencies, self.psd, left=0, right=0)
+        psd.setflags(write=False)
+        self._shaping_cache[key] = psd
+        if len(self._shaping_cache) > _SHAPING_CACHE_SIZE:
+            self._shaping_cache.popitem(last=False)
+        return psd
+
+
+def capture_noise_profile(audio_data, sample_rate, name, start=0.0, end=None, nperseg=2048,
+                          loop_seconds=None, source=None):
+    """
+    从录音中截取噪声谱
+
+    参数:
+        audio_data: 音频数据 (多声道取平均)
+        sample_rate: 采样率
+        name: 噪声谱名称
+        start: 噪声段起始时间 (秒)
+        end: 噪声段结束时间 (秒), 默认到结尾
+        nperseg: Welch 估计的分段长度 (决定频率分辨率)
+        loop_seconds: 同时保存的循环片段时长 (秒), None 表示不保存
+        source: 来源说明 (如文件名)
+
+    返回:
+        NoiseProfile对象
+    """
+    if audio_data.ndim > 1:
+        audio_data = audio_data.mean(axis=1)
+    stop = len(audio_data) if end is None else int(end * sample_rate)
+    segment = np.asarray(audio_data[int(start * sample_rate):stop], dtype=np.float64)
+    if len(segment) < nperseg:
+        raise ValueError(f"噪声段太短: {len(segment)} 个采样, 至少需要 {nperseg} 个")
+
+    frequencies, psd = signal.welch(segment, sample_rate, nperseg=nperseg)
+
+    loop = None
+    if loop_seconds is not None:
+        loop = segment[:int(loop_seconds * sample_rate)]
+
+    metadata = {
+        'source': source,
+        'start': start,
+        'end': end,
+        'nperseg': nperseg,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return NoiseProfile(name, sample_rate, frequencies, psd, loop, metadata)
+
+
+def _resample(data, sample_rate, target_rate):
+    """多相重采样循环片段"""
+    if sample_rate == target_rate:
+        return data
+    divisor = gcd(int(sample_rate), int(target_rate))
+    return signal.resample_poly(data, int(target_rate) // divisor, int(sample_rate) // divisor)
+
+
+def generate_profile_noise(profile, n_samples, sample_rate, power=None, channels=None, rng=None,
+                           method='psd'):
+    """
+    生成与噪声谱匹配的任意长度噪声
+
+    参数:
+        profile: NoiseProfile对象
+        n_samples: 采样点数
+        sample_rate: 目标采样率
+        power: 目标平均功率, 默认为噪声谱本身的功率
+        channels: 声道数, None 表示一维输出
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
+        method: 'psd' 按功率谱在频域合成; 'loop' 从循环片段的随机位置开始循环回放
+
+    返回:
+        形如 (n_samples,) 或 (n_samples, channels) 的噪声
+    """
+    if rng is None:
+        rng = np.random
+    if power is None:
+        power = profile.power
+
+    if method == 'loop':
+        if profile.loop is None:
+            raise ValueError(f"噪声谱 {profile.name} 没有保存循环片段")
+        loop = _resample(profile.loop, profile.sample_rate, sample_rate)
+        n_channels = 1 if channels is None else channels
+        offsets = (rng.random(n_channels) * len(loop)).astype(np.int64)
+        index = (np.arange(n_samples)[:, None] + offsets) % len(loop)
+        noise = loop[index].astype(np.float64)
+        noise *= np.sqrt(np.asarray(power) / np.mean(noise ** 2, axis=0))
+        return noise[:, 0] if channels is None else noise
+
+    if method != 'psd':
+        raise ValueError(f"不支持的生成方式: {method}, 可选: 'psd', 'loop'")
+
+    if n_samples <= _MAX_DIRECT_SAMPLES:
+        shape = profile.shaping_psd(n_samples, sample_rate)
+        return synthesize_noise(n_samples, sample_rate, shape, power=power, channels=channels,
+                                rng=rng)
+
+    # 超长输出: 以固定帧长重叠相加, 整形数组同样来自缓存
+    frame_size = 8192
+    stream = NoiseStream(sample_rate, profile.shaping_psd(frame_size, sample_rate), power=power,
+                         frame_size=frame_size, channels=channels, rng=rng)
+    return stream.read(n_samples)
+
+
+class NoiseProfileLibrary:
+    """
+    噪声谱库
+
+    目录中每个噪声谱保存为一个 .npz 文件 (float32 功率谱和循环片段)，
+    index.json 记录名称、采样率、功率等信息，无需打开 .npz 即可列出和筛选。
+    """
+
+    def __init__(self, root='assets/noise_profiles'):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / 'index.json'
+        self.index = {}
+        if self.index_path.exists():
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        # 已载入的噪声谱 (同一对象复用其整形缓存)
+        self._loaded = {}
+
+    def _write_index(self):
+        """先写临时文件再原子替换"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def names(self):
+        """所有噪声谱名称"""
+        return sorted(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    @staticmethod
+    def _file_name(name):
+        """噪声谱名称对应的文件名; 名称用作文件名, 不能含路径分隔符或指向上级目录"""
+        if (not isinstance(name, str) or name.strip() in ('', '.', '..')
+                or any(char in name for char in '/\\:\0')):
+            raise ValueError(f"噪声谱名称不能用作文件名 (不能为空、'.'、'..' 或包含 / \\ :): {name!r}")
+        return f"{name}.npz"
+
+    def save(self, profile):
+        """
+        保存噪声谱 (同名覆盖)
+
+        参数:
+            profile: NoiseProfile对象
+        """
+        file_name = self._file_name(profile.name)
+        arrays = {'frequencies': profile.frequencies, 'psd': profile.psd}
+        if profile.loop is not None:
+            arrays['loop'] = profile.loop
+        np.savez_compressed(self.root / file_name, **arrays)
+
+        self.index[profile.name] = {
+            'file': file_name,
+            'sample_rate': profile.sample_rate,
+            'power': profile.power,
+            'bins': len(profile.psd),
+            'loop_samples': 0 if profile.loop is None else len(profile.loop),
+            'metadata': profile.metadata,
+        }
+        self._write_index()
+        self._loaded[profile.name] = profile
+
+    def load(self, name):
+        """
+        读取噪声谱
+
+        参数:
+            name: 噪声谱名称
+
+        返回:
+            NoiseProfile对象
+        """
+        if name in self._loaded:
+            return self._loaded[name]
+        entry = self.index.get(name)
+        if entry is None:
+            raise ValueError(f"噪声谱不存在: {name}")
+        with np.load(self.root / entry['file']) as data:
+            profile = NoiseProfile(
+                name, entry['sample_rate'], data['frequencies'], data['psd'],
+                data['loop'] if 'loop' in data else None, entry['metadata']
+            )
+        self._loaded[name] = profile
+        return profile
+
+    def remove(self, name):
+        """删除噪声谱"""
+        entry = self.index.pop(name, None)
+        if entry is None:
+            return
+        self._loaded.pop(name, None)
+        (self.root / entry['file']).unlink(missing_ok=True)
+        self._write_index()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析模块
+用 @profiled 标记需要统计的函数, 在 profile_calls() 上下文中记录调用次数、累计/自身耗时、
+处理的采样数和分配的内存, 可导出为表格、JSON 或 cProfile (pstats) 格式。
+未启用时被标记的函数只多一次全局变量判断。
+"""
+
+import functools
+import json
+import marshal
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+# 是否正在记录 (由 profile_calls() 设置)
+_enabled = False
+_active_profiler = None
+_trace_memory = False
+
+
+class FunctionStats:
+    """单个函数的统计"""
+
+    __slots__ = ('name', 'key', 'calls', 'primitive_calls', 'total_time', 'own_time',
+                 'samples', 'bytes', 'peak_bytes', 'callers')
+
+    def __init__(self, name, key):
+        self.name = name
+        # (文件名, 行号, 函数名), 与 pstats 的键格式一致
+        self.key = key
+        self.calls = 0
+        self.primitive_calls = 0
+        self.total_time = 0.0
+        self.own_time = 0.0
+        self.samples = 0
+        self.bytes = 0
+        self.peak_bytes = 0
+        # 调用者键 -> [调用次数, 非递归调用次数, 自身耗时, 累计耗时]
+        self.callers = {}
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'total_time': self.total_time,
+            'own_time': self.own_time,
+            'time_per_call': self.total_time / self.calls if self.calls else 0.0,
+            'samples': self.samples,
+            'samples_per_second': self.samples / self.total_time if self.total_time > 0 else 0.0,
+            'bytes': self.bytes,
+            'peak_bytes': self.peak_bytes,
+        }
+
+
+class _Frame:
+    """调用栈中的一帧"""
+
+    __slots__ = ('stats', 'start', 'child_time', 'memory_start', 'memory_peak', 'recursive')
+
+    def __init__(self, stats, recursive):
+        self.stats = stats
+        self.recursive = recursive
+        self.child_time = 0.0
+        self.memory_start = 0
+        self.memory_peak = 0
+        self.start = 0.0
+
+
+class Profiler:
+    """
+    统计结果容器
+
+    同一个 Profiler 可以在多次 profile_calls() 中重复使用, 统计会累加。
+    调用栈按线程分别维护；开启内存跟踪时 tracemalloc 是全局的,
+    多线程同时运行会把其他线程的分配也计入。
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _get_stats(self, name, key):
+        stats = self.stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault(key, FunctionStats(name, key))
+        return stats
+
+    def _enter(self, name, key, trace_memory):
+        stack = self._stack()
+        stats = self._get_stats(name, key)
+        frame = _Frame(stats, any(parent.stats is stats for parent in stack))
+        if trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak 会清掉外层的峰值, 先把它记到外层帧上
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+            tracemalloc.reset_peak()
+            frame.memory_start = current
+            frame.memory_peak = current
+        stack.append(frame)
+        frame.start = time.perf_counter()
+        return frame
+
+    def _exit(self, frame, samples, trace_memory):
+        elapsed = time.perf_counter() - frame.start
+        stack = self._stack()
+        stack.pop()
+        stats = frame.stats
+        own = elapsed - frame.child_time
+
+        allocated = 0
+        if trace_memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            frame.memory_peak = max(frame.memory_peak, peak)
+            allocated = frame.memory_peak - frame.memory_start
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, frame.memory_peak)
+
+        caller = stack[-1].stats.key if stack else None
+        with self._lock:
+            stats.calls += 1
+            stats.own_time += own
+            stats.samples += samples
+            stats.bytes += allocated
+            stats.peak_bytes = max(stats.peak_bytes, allocated)
+            # 递归调用的耗时已包含在外层调用中
+            if not frame.recursive:
+                stats.primitive_calls += 1
+                stats.total_time += elapsed
+            if caller is not None:
+                edge = stats.callers.setdefault(caller, [0, 0, 0.0, 0.0])
+                edge[0] += 1
+                edge[2] += own
+                if not frame.recursive:
+                    edge[1] += 1
+                    edge[3] += elapsed
+        if stack:
+            stack[-1].child_time += elapsed
+
+    def clear(self):
+        """清空统计"""
+        with self._lock:
+            self.stats.clear()
+
+    def to_dict(self):
+        """
+        导出统计
+
+        返回:
+            函数名 -> 统计字典 (calls, total_time, own_time, time_per_call, samples,
+            samples_per_second, bytes, peak_bytes)
+        """
+        return {stats.name: stats.to_dict() for stats in self.stats.values()}
+
+    def to_json(self, path=None):
+        """
+        导出为 JSON
+
+        参数:
+            path: 保存路径, None 表示只返回字符串
+
+        返回:
+            JSON字符串
+        """
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def report(self, sort='total_time', limit=None):
+        """
+        生成文本表格
+
+        参数:
+            sort: 排序字段 (to_dict 中的任一数值字段)
+            limit: 最多显示的行数
+
+        返回:
+            表格字符串
+        """
+        rows = sorted(self.to_dict().values(), key=lambda row: row[sort], reverse=True)
+        if limit is not None:
+            rows = rows[:limit]
+        lines = [f"{'函数':<48} {'调用':>8} {'累计(s)':>10} {'自身(s)':>10} "
+                 f"{'采样数':>12} {'采样/秒':>12} {'分配(MB)':>10}"]
+        for row in rows:
+            lines.append(
+                f"{row['name']:<48} {row['calls']:>8d} {row['total_time']:>10.4f} "
+                f"{row['own_time']:>10.4f} {row['samples']:>12d} "
+                f"{row['samples_per_second']:>12.3g} {row['bytes'] / 1e6:>10.2f}"
+            )
+        return "\n".join(lines)
+
+    def pstats_dict(self):
+        """转换为 pstats.Stats 使用的字典格式"""
+        result = {}
+        for stats in self.stats.values():
+            callers = {key: tuple(edge) for key, edge in stats.callers.items()}
+            result[stats.key] = (stats.primitive_calls, stats.calls, stats.own_time,
+                                 stats.total_time, callers)
+        return result
+
+    def dump_stats(self, path):
+        """
+        以 cProfile 的格式保存, 可用 pstats.Stats(path) 或 snakeviz 等工具查看
+
+        参数:
+            path: 保存路径
+        """
+        with open(path, 'wb') as f:
+            marshal.dump(self.pstats_dict(), f)
+
+
+def _count_samples(args):
+    """第一个数组参数的采样数 (行数)"""
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            return arg.shape[0] if arg.ndim else 1
+    return 0
+
+
+def profiled(func=None, *, name=None):
+    """
+    标记需要统计的函数 (装饰器)
+
+    参数:
+        func: 被装饰的函数
+        name: 报告中显示的名称, 默认为 "模块.限定名"
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    label = name or f"{func.__module__}.{func.__qualname__}"
+    code = getattr(func, '__code__', None)
+    key = ((code.co_filename, code.co_firstlineno, func.__qualname__) if code is not None
+           else ('~', 0, label))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        profiler = _active_profiler
+        trace_memory = _trace_memory
+        frame = profiler._enter(label, key, trace_memory)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler._exit(frame, _count_samples(args), trace_memory)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+@contextmanager
+def profile_calls(profiler=None, trace_memory=False):
+    """
+    在 with 块内记录被标记函数的统计
+
+    参数:
+        profiler: Profiler对象, 默认新建
+        trace_memory: 是否统计内存分配
+
+    示例:
+        with profile_calls() as prof:
+            processor.apply_filters()
+        print(prof.report())
+    """
+    global _enabled, _active_profiler, _trace_memory
+    previous = (_enabled, _active_profiler, _trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _active_profiler = profiler or Profiler()
+    _trace_memory = trace_memory
+    _enabled = True
+    try:
+        yield _active_profiler
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _enabled, _active_profiler, _trace_memory = previous
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滤波器响应分析模块
+在同一频率网格上一次计算大量滤波器的频率响应 (按滤波器缓存)，
+并直接给出群延迟、-3 dB 点和阻带衰减等指标，不需要绘图
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+def frequency_grid(sample_rate, n_points=1024, log=False, f_min=10.0):
+    """
+    生成频率网格
+
+    参数:
+        sample_rate: 采样率
+        n_points: 频点数
+        log: 是否对数间隔 (从 f_min 到奈奎斯特频率)
+        f_min: 对数网格的起始频率 (Hz)
+
+    返回:
+        频率数组 (Hz); 线性网格与 freqz 一致, 为 [0, fs/2) 上的等间隔点
+    """
+    nyquist = sample_rate / 2
+    if log:
+        return np.geomspace(f_min, nyquist, n_points)
+    return np.arange(n_points) * (nyquist / n_points)
+
+
+def _sections(filter_obj):
+    """滤波器的各个 (b, a) 节: 有 sos 属性时按二阶节, 否则整体作为一节"""
+    sos = getattr(filter_obj, 'sos', None)
+    if sos is not None:
+        return [(section[:3], section[3:]) for section in np.asarray(sos, dtype=np.float64)]
+    return [(np.atleast_1d(np.asarray(filter_obj.b, dtype=np.float64)),
+             np.atleast_1d(np.asarray(filter_obj.a, dtype=np.float64)))]
+
+
+def filter_key(filter_obj):
+    """由系数和采样率计算滤波器的缓存键"""
+    digest = hashlib.sha1()
+    for b, a in _sections(filter_obj):
+        digest.update(b.tobytes())
+        digest.update(b'|')
+        digest.update(a.tobytes())
+        digest.update(b';')
+    digest.update(repr(filter_obj.sample_rate).encode())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """按 (滤波器, 频率网格) 缓存复数频率响应和群延迟, 超过容量时淘汰最久未用的条目"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 默认缓存
+_default_cache = ResponseCache()
+
+
+def _evaluate(filters, frequencies, sample_rate):
+    """
+    一次计算多个滤波器的响应
+
+    所有滤波器的所有节的分子/分母系数补零后堆叠成矩阵, 与复指数矩阵
+    E[k, w] = exp(-j*w*k) 相乘得到各节在每个频点的多项式值; 群延迟由
+    sum(k * c_k * e^{-jwk}) / sum(c_k * e^{-jwk}) 的实部解析求得。
+    """
+    sections = [_sections(f) for f in filters]
+    counts = [len(s) for s in sections]
+    flat = [section for s in sections for section in s]
+    length = max(max(len(b), len(a)) for b, a in flat)
+
+    numerators = np.zeros((len(flat), length))
+    denominators = np.zeros((len(flat), length))
+    for i, (b, a) in enumerate(flat):
+        numerators[i, :len(b)] = b
+        denominators[i, :len(a)] = a
+
+    omega = 2 * np.pi * np.asarray(frequencies, dtype=np.float64) / sample_rate
+    k = np.arange(length)
+    exponentials = np.exp(-1j * np.outer(k, omega))
+    weighted = k[:, None] * exponentials
+
+    num = numerators @ exponentials
+    den = denominators @ exponentials
+    # 防止在零点上除零
+    tiny = np.finfo(np.float64).tiny
+    num_safe = np.where(np.abs(num) < tiny, tiny, num)
+    den_safe = np.where(np.abs(den) < tiny, tiny, den)
+    delay = np.real((numerators @ weighted) / num_safe) - np.real((denominators @ weighted) / den_safe)
+    response = num / den_safe
+
+    # 同一滤波器的各节相乘 (群延迟相加)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return (np.multiply.reduceat(response, starts, axis=0),
+            np.add.reduceat(delay, starts, axis=0))
+
+
+def batch_frequency_response(filters, frequencies=None, sample_rate=None, n_points=1024, log=False,
+                             cache=None):
+    """
+    在同一频率网格上计算多个滤波器的频率响应
+
+    参数:
+        filters: Filter / FilterChain 对象列表 (采样率需一致)
+        frequencies: 频率网格 (Hz), 默认由 frequency_grid 生成
+        sample_rate: 采样率, 默认取滤波器的采样率
+        n_points: 默认网格的频点数
+        log: 默认网格是否对数间隔
+        cache: ResponseCache, 默认使用模块级缓存; 传 False 不缓存
+
+    返回:
+        (frequencies, response, group_delay):
+        response 为形如 (n_filters, n_points) 的复数响应, group_delay 为同形状的群延迟 (采样点)
+    """
+    filters = list(filters)
+    if not filters:
+        raise ValueError("滤波器列表为空")
+    if sample_rate is None:
+        rates = {f.sample_rate for f in filters}
+        if len(rates) > 1:
+            raise ValueError(f"滤波器采样率不一致: {sorted(rates)}, 请指定 sample_rate")
+        sample_rate = rates.pop()
+    if frequencies is None:
+        frequencies = frequency_grid(sample_rate, n_points, log)
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    if cache is None:
+        cache = _default_cache
+
+    response = np.empty((len(filters), len(frequencies)), dtype=complex)
+    group_delay = np.empty((len(filters), len(frequencies)))
+
+    if cache is False:
+        response[:], group_delay[:] = _evaluate(filters, frequencies, sample_rate)
+        return frequencies, response, group_delay
+
+    grid_key = hashlib.sha1(frequencies.tobytes() + repr(sample_rate).encode()).hexdigest()
+    missing = []
+    for i, f in enumerate(filters):
+        cached = cache.get((filter_key(f), grid_key))
+        if cached is None:
+            missing.append(i)
+        else:
+            response[i], group_delay[i] = cached
+
+    if missing:
+        computed_response, computed_delay = _evaluate([filters[i] for i in missing],
+                                                      frequencies, sample_rate)
+        for row, i in enumerate(missing):
+            response[i] = computed_response[row]
+            group_delay[i] = computed_delay[row]
+            cache.put((filter_key(filters[i]), grid_key),
+                      (computed_response[row], computed_delay[row]))
+
+    return frequencies, response, group_delay
+
+
+def _crossings(frequencies, values, level):
+    """values 穿过 level 的频率 (线性插值)"""
+    above = values >= level
+    index = np.nonzero(above[1:] != above[:-1])[0]
+    f0, f1 = frequencies[index], frequencies[index + 1]
+    v0, v1 = values[index], values[index + 1]
+    return f0 + (level - v0) * (f1 - f0) / (v1 - v0)
+
+
+def response_metrics(frequencies, response, group_delay, sample_rate, stopband=None):
+    """
+    由频率响应计算指标
+
+    参数:
+        frequencies: 频率网格
+        response: 单个滤波器的复数响应
+        group_delay: 单个滤波器的群延迟 (采样点)
+        sample_rate: 采样率
+        stopband: 阻带范围 (low, high) 或范围列表; 提供时计算阻带最小衰减
+
+    返回:
+        字典, 包含 peak_db, cutoff_3db (所有 -3 dB 点, Hz), passband (-3 dB 以内的频率范围),
+        group_delay_ms (通带内平均群延迟), max_group_delay_ms, max_attenuation_db,
+        以及 stopband_attenuation_db (给定 stopband 时)
+    """
+    magnitude_db = 20 * np.log10(np.abs(response) + 1e-12)
+    peak_db = float(magnitude_db.max())
+    passband = magnitude_db >= peak_db - 3
+
+    delay_ms = group_delay / sample_rate * 1000
+    metrics = {
+        'peak_db': peak_db,
+        'cutoff_3db': [float(f) for f in _crossings(frequencies, magnitude_db, peak_db - 3)],
+        'passband': (float(frequencies[passband].min()), float(frequencies[passband].max())),
+        'group_delay_ms': float(np.mean(delay_ms[passband])),
+        'max_group_delay_ms': float(np.max(delay_ms[passband])),
+        'max_attenuation_db': float(peak_db - magnitude_db.min()),
+    }
+
+    if stopband is not None:
+        bands = [stopband] if np.isscalar(stopband[0]) else stopband
+        in_stopband = np.zeros(len(frequencies), dtype=bool)
+        for low, high in bands:
+            in_stopband |= (frequencies >= low) & (frequencies <= high)
+        if not in_stopband.any():
+            raise ValueError(f"阻带 {stopband} 内没有频点")
+        metrics['stopband_attenuation_db'] = float(peak_db - magnitude_db[in_stopband].max())
+
+    return metrics
+
+
+def analyze_filters(filters, sample_rate=None, n_points=1024, log=False, stopband=None, cache=None):
+    """
+    批量分析滤波器 (不绘图)
+
+    参数:
+        filters: Filter / FilterChain 对象列表
+        sample_rate: 采样率, 默认取滤波器的采样率
+        n_points: 频点数
+        log: 是否使用对数频率网格
+        stopband: 阻带范围 (对所有滤波器使用同一阻带)
+        cache: ResponseCache
+
+    返回:
+        每个滤波器一个指标字典 (见 response_metrics), 附加 filter_type 字段
+    """
+    filters = list(filters)
+    frequencies, response, group_delay = batch_frequency_response(
+        filters, sample_rate=sample_rate, n_points=n_points, log=log, cache=cache
+    )
+    sample_rate = sample_rate or filters[0].sample_rate
+
+    results = []
+    for i, f in enumerate(filters):
+        metrics = response_metrics(frequencies, response[i], group_delay[i], sample_rate, stopband)
+        metrics['filter_type'] = f.filter_type
+        results.append(metrics)
+    return results
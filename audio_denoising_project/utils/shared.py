@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存数组模块
+基于 multiprocessing.shared_memory 的 NumPy 数组容器，
+在进程之间只传递共享内存名称，实现音频数据的零拷贝读写
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _open_shared_memory(name):
+    """挂载已有的共享内存块 (Python 3.13+ 不再重复登记到资源跟踪器)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedAudioArray:
+    """
+    共享内存音频数组
+
+    创建者 (owner) 负责 unlink；其他进程通过 attach 或直接反序列化挂载。
+    pickle 时只序列化 (名称, 形状, 类型)，因此可以直接作为
+    ProcessPoolExecutor 任务参数传递而不复制数据。
+    """
+
+    def __init__(self, shape, dtype=np.float64, name=None):
+        self.shape = tuple(int(n) for n in np.atleast_1d(shape))
+        self.dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+        else:
+            self._shm = _open_shared_memory(name)
+            self.owner = False
+
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        创建共享数组并复制数据
+
+        参数:
+            array: 源数组
+
+        返回:
+            SharedAudioArray对象 (当前进程为owner)
+        """
+        array = np.asarray(array)
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, name, shape, dtype):
+        """挂载其他进程创建的共享数组"""
+        return cls(tuple(shape), dtype, name=name)
+
+    @property
+    def name(self):
+        """共享内存名称"""
+        return self._shm.name
+
+    @property
+    def spec(self):
+        """挂载所需的描述 (名称, 形状, 类型)"""
+        return (self.name, self.shape, self.dtype.str)
+
+    def __reduce__(self):
+        return (SharedAudioArray.attach, self.spec)
+
+    def close(self):
+        """关闭本进程的映射, 关闭后 array 不可再访问"""
+        if self._shm is None:
+            return
+        self.array = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+        self._shm = None
+
+    @property
+    def closed(self):
+        return self._shm is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        state = "closed" if self.closed else self.name
+        return f"SharedAudioArray({state}, shape={self.shape}, dtype={self.dtype})"
+
+
+def _apply_to_channel(func, source, dest, channel, kwargs):
+    """工作进程: 对一个声道调用 func 并写回共享输出"""
+    try:
+        if source.array.ndim > 1:
+            func(source.array[:, channel], out=dest.array[:, channel], **kwargs)
+        else:
+            func(source.array, out=dest.array, **kwargs)
+    finally:
+        source.close()
+        dest.close()
+    return channel
+
+
+def map_channels(func, source, dest, max_workers=None, **kwargs):
+    """
+    多进程逐声道处理共享数组
+
+    参数:
+        func: 形如 func(channel_data, out=..., **kwargs) 的可序列化函数,
+              例如 Filter.filter 或 add_*_noise
+        source: 输入 SharedAudioArray
+        dest: 输出 SharedAudioArray, 形状与输入相同
+        max_workers: 进程数, 默认 min(CPU核数, 声道数)
+        **kwargs: 传给 func 的其他参数
+
+    返回:
+        dest.array
+    """
+    if source.shape != dest.shape:
+        raise ValueError(f"输入输出形状不一致: {source.shape} vs {dest.shape}")
+
+    n_channels = source.shape[1] if len(source.shape) > 1 else 1
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, n_channels)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_apply_to_channel, func, source, dest, ch, kwargs)
+            for ch in range(n_channels)
+        ]
+        for future in futures:
+            future.result()
+
+    return dest.array
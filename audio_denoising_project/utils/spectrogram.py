@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频谱图引擎
+按块增量计算STFT帧, 以 float16 dB 或 uint8 量化格式存入可内存映射的文件,
+并按显示分辨率降采样后用 imshow 绘制, 使长达数小时的频谱图可行
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+from scipy import signal
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .channels import check_channel_mode, combine_channels
+
+# 转换为dB时防止log(0)
+_POWER_FLOOR = 1e-10
+
+# 支持的存储编码
+ENCODINGS = ('float16', 'uint8')
+
+
+class StreamingSTFT:
+    """
+    增量STFT
+
+    每次送入一块采样, 返回这块数据新凑齐的所有帧的功率谱密度 (dB)；
+    不足一帧的尾部保留到下一块。多声道输入默认按块取平均后再分析 (channel_mode='mix')；
+    'per_channel' / 'mid_side' 模式下所有声道的帧在一次批量FFT中计算, 中/侧由频谱直接组合。
+    谱密度的缩放与 scipy.signal.spectrogram(scaling='density') 一致。
+    """
+
+    def __init__(self, sample_rate, nperseg=1024, hop=512, window='hann', channel_mode='mix'):
+        if not 0 < hop <= nperseg:
+            raise ValueError("hop 必须在 (0, nperseg] 范围内")
+        check_channel_mode(channel_mode)
+        self.channel_mode = channel_mode
+        self.sample_rate = sample_rate
+        self.nperseg = nperseg
+        self.hop = hop
+        self.window = signal.get_window(window, nperseg)
+
+        # 单边功率谱密度的缩放系数
+        self._scale = np.full(nperseg // 2 + 1, 2.0 / (sample_rate * np.sum(self.window ** 2)))
+        self._scale[0] /= 2
+        if nperseg % 2 == 0:
+            self._scale[-1] /= 2
+
+        self._pending = np.zeros(0)
+        self.frames_emitted = 0
+
+    @property
+    def frequencies(self):
+        """各频点的频率 (Hz)"""
+        return np.fft.rfftfreq(self.nperseg, 1 / self.sample_rate)
+
+    @property
+    def n_bins(self):
+        return self.nperseg // 2 + 1
+
+    def frame_times(self, start, stop):
+        """第 start 到 stop 帧的中心时间 (秒)"""
+        return (np.arange(start, stop) * self.hop + self.nperseg / 2) / self.sample_rate
+
+    def empty_frames(self, n_channels=1):
+        """没有新帧时的空结果 (形状与 process 的输出一致)"""
+        if self.channel_mode == 'mix':
+            return np.empty((0, self.n_bins), dtype=np.float32)
+        n_outputs = 2 if self.channel_mode == 'mid_side' else n_channels
+        return np.empty((0, n_outputs, self.n_bins), dtype=np.float32)
+
+    def process(self, block):
+        """
+        处理一块采样
+
+        参数:
+            block: 形如 (samples,) 或 (samples, channels) 的采样块
+
+        返回:
+            形如 (n_frames, n_bins) 的 float32 功率谱密度 (dB/Hz);
+            'per_channel' / 'mid_side' 模式下形如 (n_frames, n_outputs, n_bins)
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if self.channel_mode == 'mix':
+            if block.ndim > 1:
+                block = block.mean(axis=1)
+        elif block.ndim == 1:
+            block = block[:, None]
+
+        data = np.concatenate([self._pending, block]) if len(self._pending) else block
+        if len(data) < self.nperseg:
+            self._pending = data.copy()
+            return self.empty_frames(data.shape[1] if data.ndim > 1 else 1)
+
+        # 多声道时帧形如 (n_frames, channels, nperseg), 所有声道一次FFT
+        frames = sliding_window_view(data, self.nperseg, axis=0)[::self.hop]
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)
+        if self.channel_mode == 'mid_side':
+            spectrum = combine_channels(spectrum, 'mid_side', axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+
+        consumed = len(frames) * self.hop
+        self._pending = data[consumed:].copy()
+        self.frames_emitted += len(frames)
+
+        return (10 * np.log10(power + _POWER_FLOOR)).astype(np.float32)
+
+
+class SpectrogramStore:
+    """
+    磁盘上的频谱图
+
+    帧数据以原始二进制逐帧追加到 <path>，元数据写入 <path>.json；
+    读取时以 np.memmap 打开, 不需要整体载入内存。
+    uint8 编码把 [min_db, max_db] 线性量化为 0-255。
+    """
+
+    def __init__(self, path, n_bins, sample_rate, hop, nperseg, encoding='float16',
+                 min_db=-160.0, max_db=0.0):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"不支持的编码: {encoding}, 可选: {ENCODINGS}")
+        self.path = Path(path)
+        self.meta = {
+            'n_bins': int(n_bins),
+            'n_frames': 0,
+            'sample_rate': sample_rate,
+            'hop': int(hop),
+            'nperseg': int(nperseg),
+            'encoding': encoding,
+            'min_db': float(min_db),
+            'max_db': float(max_db),
+        }
+        self._file = open(self.path, 'wb')
+
+    def _encode(self, frames_db):
+        if self.meta['encoding'] == 'float16':
+            return frames_db.astype(np.float16)
+        min_db, max_db = self.meta['min_db'], self.meta['max_db']
+        scaled = (frames_db - min_db) * (255.0 / (max_db - min_db))
+        return np.clip(np.rint(scaled), 0, 255).astype(np.uint8)
+
+    def append(self, frames_db):
+        """追加若干帧 (dB)"""
+        if len(frames_db) == 0:
+            return
+        self._file.write(self._encode(frames_db).tobytes())
+        self.meta['n_frames'] += len(frames_db)
+
+    def close(self):
+        """写完数据并保存元数据"""
+        if not self._file.closed:
+            self._file.close()
+            with open(f"{self.path}.json", 'w', encoding='utf-8') as f:
+                json.dump(self.meta, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def open(path):
+        """
+        以内存映射方式打开已保存的频谱图
+
+        返回:
+            StoredSpectrogram对象
+        """
+        with open(f"{path}.json", encoding='utf-8') as f:
+            meta = json.load(f)
+        return StoredSpectrogram(path, meta)
+
+
+class StoredSpectrogram:
+    """已保存频谱图的只读视图"""
+
+    def __init__(self, path, meta):
+        self.path = Path(path)
+        self.meta = meta
+        self.sample_rate = meta['sample_rate']
+        self.hop = meta['hop']
+        self.nperseg = meta['nperseg']
+        shape = (meta['n_frames'], meta['n_bins'])
+        if meta['n_frames'] == 0:
+            self.frames = np.zeros(shape, dtype=meta['encoding'])
+        else:
+            self.frames = np.memmap(self.path, dtype=meta['encoding'], mode='r', shape=shape)
+
+    def __len__(self):
+        return self.meta['n_frames']
+
+    @property
+    def frequencies(self):
+        return np.fft.rfftfreq(self.nperseg, 1 / self.sample_rate)
+
+    @property
+    def duration(self):
+        """频谱图覆盖的时长 (秒)"""
+        return (len(self) * self.hop + self.nperseg - self.hop) / self.sample_rate
+
+    def decode(self, frames):
+        """把存储格式的帧还原为 float32 dB"""
+        if self.meta['encoding'] == 'float16':
+            return frames.astype(np.float32)
+        min_db, max_db = self.meta['min_db'], self.meta['max_db']
+        return frames.astype(np.float32) * ((max_db - min_db) / 255.0) + min_db
+
+    def to_db(self, start=0, stop=None):
+        """读取第 start 到 stop 帧 (dB)"""
+        return self.decode(self.frames[start:stop])
+
+
+def compute_spectrogram(signal_data, sample_rate, nperseg=1024, hop=512, block_size=262144,
+                        store_path=None, encoding='float16', channel_mode='mix'):
+    """
+    增量计算整段信号的频谱图
+
+    参数:
+        signal_data: 信号数据
+        sample_rate: 采样率
+        nperseg: 每帧长度
+        hop: 帧移
+        block_size: 每次送入STFT的采样数
+        store_path: 保存路径; 提供时帧数据直接写入磁盘
+        encoding: 磁盘存储编码 ('float16' 或 'uint8')
+        channel_mode: 声道模式 ('mix', 'per_channel', 'mid_side'), 磁盘存储只支持 'mix'
+
+    返回:
+        无 store_path 时返回 (frequencies, times, spec_db), spec_db 形如 (n_frames, n_bins),
+        非 'mix' 模式下形如 (n_frames, n_outputs, n_bins);
+        否则返回以内存映射打开的 StoredSpectrogram
+    """
+    stft = StreamingSTFT(sample_rate, nperseg, hop, channel_mode=channel_mode)
+    blocks = (signal_data[i:i + block_size] for i in range(0, len(signal_data), block_size))
+
+    if store_path is not None:
+        if channel_mode != 'mix':
+            raise ValueError("磁盘存储的频谱图只支持 'mix' 声道模式")
+        with SpectrogramStore(store_path, stft.n_bins, sample_rate, hop, nperseg, encoding) as store:
+            for block in blocks:
+                store.append(stft.process(block))
+        return SpectrogramStore.open(store_path)
+
+    chunks = [stft.process(block) for block in blocks]
+    n_channels = signal_data.shape[1] if np.ndim(signal_data) > 1 else 1
+    spec_db = np.concatenate(chunks) if chunks else stft.empty_frames(n_channels)
+    return stft.frequencies, stft.frame_times(0, len(spec_db)), spec_db
+
+
+def stream_file_spectrogram(audio_path, store_path, nperseg=1024, hop=512, block_size=262144,
+                            encoding='uint8'):
+    """
+    从音频文件逐块读取并计算频谱图, 整个过程不载入完整音频
+
+    参数:
+        audio_path: 音频文件路径
+        store_path: 频谱图保存路径
+        nperseg: 每帧长度
+        hop: 帧移
+        block_size: 每次读取的帧数
+        encoding: 存储编码
+
+    返回:
+        StoredSpectrogram对象
+    """
+    import soundfile as sf
+
+    sample_rate = sf.info(str(audio_path)).samplerate
+    stft = StreamingSTFT(sample_rate, nperseg, hop)
+    with SpectrogramStore(store_path, stft.n_bins, sample_rate, hop, nperseg, encoding) as store:
+        for block in sf.blocks(str(audio_path), blocksize=block_size):
+            store.append(stft.process(block))
+    return SpectrogramStore.open(store_path)
+
+
+def downsample_spectrogram(frames, max_columns=2000, max_rows=1024, decode=None,
+                           chunk_frames=65536):
+    """
+    把频谱图降采样到显示分辨率 (按块取最大值, 保留短时峰值)
+
+    参数:
+        frames: 形如 (n_frames, n_bins) 的数组或内存映射
+        max_columns: 时间方向最多保留的列数
+        max_rows: 频率方向最多保留的行数
+        decode: 把存储格式转换为 dB 的函数
+        chunk_frames: 每次读入的帧数上限
+
+    返回:
+        形如 (rows, columns) 的 float32 dB 图像 (低频在第0行)
+    """
+    n_frames, n_bins = frames.shape
+    t_factor = max(1, int(np.ceil(n_frames / max_columns)))
+    f_factor = max(1, int(np.ceil(n_bins / max_rows)))
+    if decode is None:
+        def decode(x):
+            return np.asarray(x, dtype=np.float32)
+
+    chunk_frames = max(t_factor, chunk_frames // t_factor * t_factor)
+    columns = []
+    for start in range(0, n_frames, chunk_frames):
+        chunk = decode(frames[start:start + chunk_frames])
+        n_cols = int(np.ceil(len(chunk) / t_factor))
+        padded_len = n_cols * t_factor
+        if padded_len != len(chunk):
+            pad = np.full((padded_len - len(chunk), n_bins), -np.inf, dtype=np.float32)
+            chunk = np.concatenate([chunk, pad])
+        columns.append(chunk.reshape(n_cols, t_factor, n_bins).max(axis=1))
+
+    image = np.concatenate(columns) if columns else np.zeros((0, n_bins), dtype=np.float32)
+
+    n_rows = int(np.ceil(n_bins / f_factor))
+    padded_bins = n_rows * f_factor
+    if padded_bins != n_bins:
+        image = np.pad(image, ((0, 0), (0, padded_bins - n_bins)), constant_values=-np.inf)
+    image = image.reshape(len(image), n_rows, f_factor).max(axis=2)
+
+    return image.T
+
+
+def render_spectrogram(spec, sample_rate=None, ax=None, max_columns=2000, max_rows=1024,
+                       vmin=None, vmax=None):
+    """
+    用 imshow 绘制频谱图
+
+    参数:
+        spec: StoredSpectrogram 或 compute_spectrogram 返回的 (frequencies, times, spec_db)
+        sample_rate: 采样率 (spec 为元组时需要)
+        ax: matplotlib 坐标轴, 默认当前坐标轴
+        max_columns: 时间方向的显示分辨率
+        max_rows: 频率方向的显示分辨率
+        vmin, vmax: 颜色范围 (dB), 默认取图像的 [max-100, max]
+
+    返回:
+        AxesImage对象
+    """
+    import matplotlib.pyplot as plt
+
+    if isinstance(spec, StoredSpectrogram):
+        image = downsample_spectrogram(spec.frames, max_columns, max_rows, decode=spec.decode)
+        sample_rate = spec.sample_rate
+        duration = spec.duration
+    else:
+        frequencies, times, spec_db = spec
+        image = downsample_spectrogram(spec_db, max_columns, max_rows)
+        # 帧时间为帧中心, 最后一帧结束于 times[-1] + times[0]
+        duration = times[-1] + times[0] if len(times) else 0.0
+
+    if ax is None:
+        ax = plt.gca()
+
+    finite = image[np.isfinite(image)]
+    if vmax is None:
+        vmax = float(finite.max()) if finite.size else 0.0
+    if vmin is None:
+        vmin = vmax - 100
+
+    return ax.imshow(image, origin='lower', aspect='auto', interpolation='nearest',
+                     extent=[0, duration, 0, sample_rate / 2], vmin=vmin, vmax=vmax)
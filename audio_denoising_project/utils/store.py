@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+处理结果指标库
+用 SQLite (WAL 模式) 按行记录每个文件、每种噪声、每个滤波器的 SNR/PSNR/耗时，
+以及每次运行生成的输出文件清单。文件路径只存一次 (整数编号)，
+写入先缓冲再用 executemany 在一个事务内提交；多个进程各自打开连接即可并发追加，
+按文件、噪声类型、滤波器筛选和汇总的列建有索引。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 每行指标的数值列
+METRIC_COLUMNS = ('snr_noisy', 'snr_filtered', 'psnr_noisy', 'psnr_filtered',
+                  'noise_seconds', 'filter_seconds', 'samples', 'sample_rate')
+
+# summary() 可以分组的列
+_GROUP_COLUMNS = ('run_id', 'file', 'noise_type', 'filter_name')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    label TEXT,
+    params TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    noise_type TEXT NOT NULL,
+    filter_name TEXT NOT NULL,
+    snr_noisy REAL,
+    snr_filtered REAL,
+    psnr_noisy REAL,
+    psnr_filtered REAL,
+    noise_seconds REAL,
+    filter_seconds REAL,
+    samples INTEGER,
+    sample_rate INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_file ON metrics(file_id);
+CREATE INDEX IF NOT EXISTS idx_metrics_noise_filter ON metrics(noise_type, filter_name);
+CREATE INDEX IF NOT EXISTS idx_metrics_run ON metrics(run_id);
+CREATE TABLE IF NOT EXISTS outputs (
+    run_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_outputs_run ON outputs(run_id);
+CREATE INDEX IF NOT EXISTS idx_outputs_file ON outputs(file_id);
+CREATE VIEW IF NOT EXISTS metrics_view AS
+    SELECT metrics.*, files.path AS file FROM metrics JOIN files USING (file_id);
+CREATE VIEW IF NOT EXISTS outputs_view AS
+    SELECT outputs.*, files.path AS file FROM outputs JOIN files USING (file_id);
+"""
+
+
+class MetricsStore:
+    """
+    指标库
+
+    同一进程内的多个线程可以共用一个对象 (写入和提交由锁保护)。
+    对象可以传给子进程 (按路径重新打开, 未提交的缓冲不随之传递)。
+    """
+
+    def __init__(self, path, buffer_size=1000, timeout=30.0):
+        """
+        参数:
+            path: 数据库文件路径
+            buffer_size: 缓冲多少行后自动提交
+            timeout: 其他进程占用写锁时的等待时间 (秒)
+        """
+        self.path = str(path)
+        self.buffer_size = buffer_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._outputs = []
+        self._file_ids = {}
+
+        self._conn = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL: 读不阻塞写, 多个进程追加时只在提交时短暂加锁
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def __reduce__(self):
+        return (MetricsStore, (self.path, self.buffer_size, self.timeout))
+
+    # ---- 写入 ----
+
+    def start_run(self, label=None, params=None):
+        """
+        登记一次运行
+
+        参数:
+            label: 运行名称
+            params: 运行参数 (可JSON序列化的字典)
+
+        返回:
+            运行编号
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO runs (created, label, params) VALUES (?, ?, ?)',
+                (time.time(), label, json.dumps(params or {}, ensure_ascii=False, default=str))
+            )
+        return cursor.lastrowid
+
+    def add_metrics(self, run_id, file, noise_type, filter_name, **values):
+        """
+        追加一行指标 (缓冲, 满 buffer_size 行时提交)
+
+        参数:
+            run_id: 运行编号
+            file: 输入文件
+            noise_type: 噪声类型
+            filter_name: 滤波器名称
+            **values: METRIC_COLUMNS 中的数值, 缺省为空
+        """
+        unknown = set(values) - set(METRIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知的指标: {sorted(unknown)}, 可选: {METRIC_COLUMNS}")
+        row = (run_id, str(file), noise_type, filter_name) + tuple(
+            None if values.get(column) is None else values[column] for column in METRIC_COLUMNS
+        )
+        with self._lock:
+            self._metrics.append(row)
+            pending = len(self._metrics) + len(self._outputs)
+        if pending >= self.buffer_size:
+            self.flush()
+
+    def add_output(self, run_id, file, name, path):
+        """
+        登记一个输出文件
+
+        参数:
+            run_id: 运行编号
+            file: 对应的输入文件
+            name: 输出名称 (如 'audio/gaussian_filtered')
+            path: 输出文件路径 (存在时记录大小)
+        """
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        with self._lock:
+            self._outputs.append((run_id, str(file), name, str(path), size))
+            pending = len(self._metrics) + len(self._outputs)
+        if pending >= self.buffer_size:
+            self.flush()
+
+    def _file_id(self, path):
+        """文件路径的编号 (需持有锁且处于事务中)"""
+        file_id = self._file_ids.get(path)
+        if file_id is None:
+            self._conn.execute('INSERT OR IGNORE INTO files (path) VALUES (?)', (path,))
+            file_id = self._conn.execute('SELECT file_id FROM files WHERE path = ?', (path,)).fetchone()[0]
+            self._file_ids[path] = file_id
+        return file_id
+
+    def flush(self):
+        """在一个事务内提交所有缓冲的行"""
+        with self._lock:
+            if not self._metrics and not self._outputs:
+                return
+            metrics, self._metrics = self._metrics, []
+            outputs, self._outputs = self._outputs, []
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO metrics (run_id, file_id, noise_type, filter_name, "
+                        f"{', '.join(METRIC_COLUMNS)}) VALUES ({', '.join('?' * (4 + len(METRIC_COLUMNS)))})",
+                        [(row[0], self._file_id(row[1])) + row[2:] for row in metrics]
+                    )
+                    self._conn.executemany(
+                        'INSERT INTO outputs (run_id, file_id, name, path, bytes) VALUES (?, ?, ?, ?, ?)',
+                        [(row[0], self._file_id(row[1])) + row[2:] for row in outputs]
+                    )
+            except BaseException:
+                # 事务已回滚: 新分配的文件编号作废, 缓冲的行放回以便重试
+                self._file_ids.clear()
+                self._metrics[:0] = metrics
+                self._outputs[:0] = outputs
+                raise
+
+    # ---- 查询 ----
+
+    @staticmethod
+    def _where(**conditions):
+        """由非空条件生成 WHERE 子句和参数"""
+        items = [(column, value) for column, value in conditions.items() if value is not None]
+        if not items:
+            return '', ()
+        return ' WHERE ' + ' AND '.join(f"{column} = ?" for column, _ in items), tuple(v for _, v in items)
+
+    def _select(self, sql, params):
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def query(self, file=None, noise_type=None, filter_name=None, run_id=None):
+        """
+        按条件查询指标行
+
+        返回:
+            字典列表 (含 file 路径)
+        """
+        where, params = self._where(file=None if file is None else str(file), noise_type=noise_type,
+                                    filter_name=filter_name, run_id=run_id)
+        return self._select(
+            f"SELECT * FROM metrics_view{where} ORDER BY run_id, file, noise_type, filter_name", params
+        )
+
+    def summary(self, group_by=('noise_type', 'filter_name'), run_id=None):
+        """
+        分组汇总
+
+        参数:
+            group_by: 分组列 (run_id, file, noise_type, filter_name 的组合)
+            run_id: 只汇总某次运行
+
+        返回:
+            字典列表, 含行数、平均SNR/PSNR、平均SNR提升和滤波总耗时
+        """
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        invalid = set(group_by) - set(_GROUP_COLUMNS)
+        if invalid:
+            raise ValueError(f"不支持的分组列: {sorted(invalid)}, 可选: {_GROUP_COLUMNS}")
+        columns = ', '.join(group_by)
+        where, params = self._where(run_id=run_id)
+        return self._select(
+            f"SELECT {columns}, COUNT(*) AS n, AVG(snr_noisy) AS snr_noisy, "
+            f"AVG(snr_filtered) AS snr_filtered, AVG(snr_filtered - snr_noisy) AS snr_gain, "
+            f"AVG(psnr_noisy) AS psnr_noisy, AVG(psnr_filtered) AS psnr_filtered, "
+            f"SUM(filter_seconds) AS filter_seconds "
+            f"FROM metrics_view{where} GROUP BY {columns} ORDER BY {columns}",
+            params
+        )
+
+    def outputs(self, run_id=None, file=None):
+        """
+        查询输出文件清单
+
+        返回:
+            字典列表 (run_id, file, name, path, bytes)
+        """
+        where, params = self._where(run_id=run_id, file=None if file is None else str(file))
+        return self._select(
+            f"SELECT run_id, file, name, path, bytes FROM outputs_view{where} ORDER BY run_id, file, name",
+            params
+        )
+
+    def close(self):
+        """提交缓冲并关闭连接"""
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滤波器参数扫描模块
+对 design_*_filter 的参数网格进行多进程评估，按SNR提升排序
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .filters import (
+    design_lowpass_filter,
+    design_highpass_filter,
+    design_bandpass_filter,
+    design_bandstop_filter,
+    design_notch_filter
+)
+from .metrics import calculate_snr_batch
+from .shared import SharedAudioArray
+
+# 可扫描的滤波器设计函数
+FILTER_DESIGNERS = {
+    'lowpass': design_lowpass_filter,
+    'highpass': design_highpass_filter,
+    'bandpass': design_bandpass_filter,
+    'bandstop': design_bandstop_filter,
+    'notch': design_notch_filter,
+}
+
+# 工作进程中挂载的共享输入
+_worker_inputs = {}
+
+
+def make_filter_grid(design, **param_grid):
+    """
+    生成参数网格
+
+    参数:
+        design: 滤波器设计名称 ('lowpass', 'highpass', 'bandpass', 'bandstop', 'notch')
+        **param_grid: design_*_filter 的参数, 取值为单个值或值的列表
+
+    返回:
+        候选列表, 每项为 {'design': ..., 'params': {...}}
+
+    示例:
+        make_filter_grid('lowpass', cutoff_freq=[2000, 3000, 4000],
+                         order=[2, 4, 6], filter_type=['butterworth', 'elliptic'])
+    """
+    if design not in FILTER_DESIGNERS:
+        raise ValueError(f"不支持的滤波器设计: {design}")
+
+    names = list(param_grid.keys())
+    values = [v if isinstance(v, (list, tuple, np.ndarray)) else [v]
+              for v in param_grid.values()]
+
+    return [
+        {'design': design, 'params': dict(zip(names, combo))}
+        for combo in itertools.product(*values)
+    ]
+
+
+def _evaluate_candidate(candidate, noisy_signal, clean_signal, sample_rate, baseline_snr):
+    """评估单个候选滤波器"""
+    result = {
+        'design': candidate['design'],
+        'params': candidate['params'],
+    }
+    try:
+        start = time.perf_counter()
+        filter_obj = FILTER_DESIGNERS[candidate['design']](
+            sample_rate=sample_rate, **candidate['params']
+        )
+        design_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        filtered = filter_obj.filter(noisy_signal)
+        filter_time = time.perf_counter() - start
+
+        snr = float(np.mean(calculate_snr_batch(clean_signal, filtered)))
+        result.update({
+            'snr': snr,
+            'snr_gain': snr - baseline_snr,
+            'order': filter_obj.order,
+            'design_time': design_time,
+            'filter_time': filter_time,
+        })
+    except Exception as e:
+        result.update({'snr': np.nan, 'snr_gain': np.nan, 'error': str(e)})
+    return result
+
+
+def _init_worker(noisy_shared, clean_shared, sample_rate, baseline_snr):
+    """工作进程初始化: 挂载带噪/干净信号, 只传递共享内存名称而不是数组本身"""
+    _worker_inputs.update({
+        'handles': (noisy_shared, clean_shared),
+        'noisy': noisy_shared.array,
+        'clean': clean_shared.array,
+        'sample_rate': sample_rate,
+        'baseline_snr': baseline_snr,
+    })
+
+
+def _evaluate_in_worker(candidate):
+    """工作进程中评估候选滤波器"""
+    return _evaluate_candidate(
+        candidate,
+        _worker_inputs['noisy'],
+        _worker_inputs['clean'],
+        _worker_inputs['sample_rate'],
+        _worker_inputs['baseline_snr'],
+    )
+
+
+def run_filter_sweep(noisy_signal, clean_signal, sample_rate, candidates, max_workers=None):
+    """
+    并行评估参数网格
+
+    参数:
+        noisy_signal: 带噪信号
+        clean_signal: 干净 (原始) 信号
+        sample_rate: 采样率
+        candidates: make_filter_grid 生成的候选列表 (可拼接多个网格)
+        max_workers: 进程数, 默认CPU核数; 为1时在当前进程串行执行
+
+    返回:
+        按SNR提升从高到低排序的结果列表, 每项包含
+        rank, design, params, snr, snr_gain, order, design_time, filter_time;
+        设计或滤波失败的候选排在最后并带有 error 字段
+    """
+    noisy_signal = np.ascontiguousarray(noisy_signal)
+    clean_signal = np.ascontiguousarray(clean_signal)
+    baseline_snr = float(np.mean(calculate_snr_batch(clean_signal, noisy_signal)))
+
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, len(candidates))
+
+    if max_workers <= 1 or len(candidates) <= 1:
+        results = [
+            _evaluate_candidate(c, noisy_signal, clean_signal, sample_rate, baseline_snr)
+            for c in candidates
+        ]
+    else:
+        with SharedAudioArray.from_array(noisy_signal) as noisy_shared, \
+                SharedAudioArray.from_array(clean_signal) as clean_shared:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(noisy_shared, clean_shared, sample_rate, baseline_snr),
+            ) as executor:
+                chunksize = max(1, len(candidates) // (max_workers * 4))
+                results = list(executor.map(_evaluate_in_worker, candidates, chunksize=chunksize))
+
+    results.sort(key=lambda r: (np.isnan(r['snr_gain']), -np.nan_to_num(r['snr_gain'])))
+    for rank, result in enumerate(results, start=1):
+        result['rank'] = rank
+        result['baseline_snr'] = baseline_snr
+
+    return results
+
+
+def format_sweep_table(results, limit=None):
+    """
+    把扫描结果格式化为文本表格
+
+    参数:
+        results: run_filter_sweep 的返回值
+        limit: 最多显示的行数
+
+    返回:
+        表格字符串
+    """
+    rows = results if limit is None else results[:limit]
+    header = f"{'排名':>4}  {'滤波器':<10} {'SNR(dB)':>9} {'提升(dB)':>9} {'阶数':>4} {'耗时(ms)':>9}  参数"
+    lines = [header, '-' * len(header)]
+    for r in rows:
+        params = ', '.join(f"{k}={v}" for k, v in r['params'].items())
+        if 'error' in r:
+            lines.append(f"{r['rank']:>4}  {r['design']:<10} {'失败':>9} {'-':>9} {'-':>4} {'-':>9}  {params} ({r['error']})")
+        else:
+            lines.append(
+                f"{r['rank']:>4}  {r['design']:<10} {r['snr']:>9.2f} {r['snr_gain']:>9.2f} "
+                f"{r['order']:>4} {r['filter_time'] * 1000:>9.2f}  {params}"
+            )
+    return '\n'.join(lines)
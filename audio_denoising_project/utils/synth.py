@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频域噪声合成模块
+直接在 rFFT 频域生成随机频谱 (随机相位/幅度) 并按目标谱形加权,
+一次逆变换得到任意谱形的噪声; 目标功率由 Parseval 定理在频域精确确定,
+不需要再对时域信号测量功率。长输出可通过重叠相加流式生成。
+"""
+
+import numpy as np
+
+# 预定义的谱形 (功率谱密度随频率的变化)
+NAMED_SHAPES = ('white', 'pink', 'brown', 'blue', 'violet')
+
+
+def shape_psd(shape, frequencies):
+    """
+    计算各频点的相对功率谱密度
+
+    参数:
+        shape: 谱形, 可以是
+               - 'white' / 'pink' (1/f) / 'brown' (1/f^2) / 'blue' (f) / 'violet' (f^2)
+               - 频带列表 [(low, high), (low, high, gain_db), ...], 多个频带叠加
+               - 实测噪声谱 (freqs, psd) 元组, 线性插值到目标频点
+               - 可调用对象 f -> psd
+               - 与 frequencies 等长的一维数组 (已在该频点网格上计算好的谱)
+        frequencies: 频点 (Hz)
+
+    返回:
+        与 frequencies 等长的非负功率权重
+    """
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+
+    if isinstance(shape, str):
+        if shape not in NAMED_SHAPES:
+            raise ValueError(f"不支持的谱形: {shape}, 可选: {NAMED_SHAPES}")
+        exponent = {'white': 0, 'pink': -1, 'brown': -2, 'blue': 1, 'violet': 2}[shape]
+        psd = np.zeros_like(frequencies)
+        nonzero = frequencies > 0
+        psd[nonzero] = frequencies[nonzero] ** exponent
+        if exponent == 0:
+            psd[:] = 1.0
+        return psd
+
+    if isinstance(shape, np.ndarray):
+        if shape.shape != frequencies.shape:
+            raise ValueError(f"谱数组长度 {shape.shape} 与频点数 {frequencies.shape} 不一致")
+        return np.clip(shape.astype(np.float64), 0, None)
+
+    if callable(shape):
+        return np.clip(np.asarray(shape(frequencies), dtype=np.float64), 0, None)
+
+    if isinstance(shape, tuple) and len(shape) == 2 and np.ndim(shape[0]) == 1:
+        profile_freqs, profile_psd = (np.asarray(x, dtype=np.float64) for x in shape)
+        return np.clip(np.interp(frequencies, profile_freqs, profile_psd, left=0, right=0), 0, None)
+
+    # 多频带
+    psd = np.zeros_like(frequencies)
+    for band in shape:
+        low, high = band[0], band[1]
+        gain = 10 ** (band[2] / 10) if len(band) > 2 else 1.0
+        if not 0 <= low < high:
+            raise ValueError(f"频带范围无效: {band}")
+        psd[(frequencies >= low) & (frequencies <= high)] += gain
+    return psd
+
+
+def _parseval_weights(n_fft):
+    """irfft 输出的均方值 = sum(weights * |X|^2)"""
+    weights = np.full(n_fft // 2 + 1, 2.0 / n_fft ** 2)
+    weights[0] /= 2
+    if n_fft % 2 == 0:
+        weights[-1] /= 2
+    return weights
+
+
+def _random_spectrum(n_bins, channels, amplitude, rng, random_magnitude):
+    """生成随机频谱: 复高斯 (瑞利幅度 + 均匀相位) 或固定幅度 + 随机相位"""
+    shape = (n_bins,) if channels is None else (n_bins, channels)
+    if random_magnitude:
+        spectrum = rng.standard_normal(shape) + 1j * rng.standard_normal(shape)
+    else:
+        spectrum = np.exp(2j * np.pi * rng.random(shape))
+    if channels is not None:
+        amplitude = amplitude[:, None]
+    return spectrum * amplitude
+
+
+def synthesize_noise(n_samples, sample_rate, shape='white', power=1.0, channels=None,
+                     rng=None, random_magnitude=True):
+    """
+    在频域合成指定谱形的噪声
+
+    参数:
+        n_samples: 采样点数
+        sample_rate: 采样率
+        shape: 谱形 (见 shape_psd)
+        power: 目标平均功率 (均方值); 多声道时可为每个声道的数组
+        channels: 声道数, None 表示输出一维信号
+        rng: 随机数生成器 (np.random.Generator), 默认使用全局 np.random
+        random_magnitude: True 时幅度服从瑞利分布 (高斯噪声), False 时幅度严格等于谱形
+
+    返回:
+        形如 (n_samples,) 或 (n_samples, channels) 的噪声, 均方值精确等于 power
+    """
+    if rng is None:
+        rng = np.random
+
+    frequencies = np.fft.rfftfreq(n_samples, 1 / sample_rate)
+    psd = shape_psd(shape, frequencies)
+    if not np.any(psd > 0):
+        raise ValueError("谱形在 (0, 采样率/2] 内没有能量")
+
+    spectrum = _random_spectrum(len(frequencies), channels, np.sqrt(psd), rng, random_magnitude)
+
+    # 直流和奈奎斯特频点必须为实数
+    spectrum[0] = spectrum[0].real
+    if n_samples % 2 == 0:
+        spectrum[-1] = spectrum[-1].real
+
+    # 由 Parseval 定理在频域得到时域功率, 一次缩放即可精确达到目标功率
+    weights = _parseval_weights(n_samples)
+    current_power = np.tensordot(weights, np.abs(spectrum) ** 2, axes=(0, 0))
+    spectrum *= np.sqrt(np.asarray(power, dtype=np.float64) / current_power)
+
+    return np.fft.irfft(spectrum, n=n_samples, axis=0)
+
+
+class NoiseStream:
+    """
+    流式噪声生成器 (重叠相加)
+
+    每帧在频域独立合成噪声, 乘以平方和为常数的正弦窗后以50%重叠相加,
+    输出平稳且长度不受限制; 平均功率在期望意义上等于目标功率。
+    """
+
+    def __init__(self, sample_rate, shape='white', power=1.0, frame_size=8192,
+                 channels=None, rng=None):
+        """
+        参数:
+            sample_rate: 采样率
+            shape: 谱形 (见 shape_psd)
+            power: 目标平均功率
+            frame_size: 合成帧长 (偶数, 决定频率分辨率)
+            channels: 声道数, None 表示一维输出
+            rng: 随机数生成器
+        """
+        if frame_size % 2:
+            raise ValueError("frame_size 必须为偶数")
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop = frame_size // 2
+        self.channels = channels
+        self.rng = np.random if rng is None else rng
+
+        # 正弦窗在50%重叠下平方和恒为1, 保持输出方差不变
+        self.window = np.sin(np.pi * (np.arange(frame_size) + 0.5) / frame_size)
+        if channels is not None:
+            self.window = self.window[:, None]
+
+        frequencies = np.fft.rfftfreq(frame_size, 1 / sample_rate)
+        psd = shape_psd(shape, frequencies)
+        psd[0] = 0
+        if not np.any(psd > 0):
+            raise ValueError("谱形在 (0, 采样率/2] 内没有能量")
+        # 复高斯频谱每个频点的期望能量为 2*psd
+        expected_power = np.sum(_parseval_weights(frame_size) * 2 * psd)
+        self._amplitude = np.sqrt(psd * power / expected_power)
+
+        tail_shape = (self.hop,) if channels is None else (self.hop, channels)
+        self._tail = np.zeros(tail_shape)
+        self._ready = np.zeros((0,) + tail_shape[1:])
+
+    def _next_hop(self):
+        """合成一帧并返回完成重叠相加的 hop 个采样"""
+        spectrum = _random_spectrum(len(self._amplitude), self.channels,
+                                    self._amplitude, self.rng, True)
+        spectrum[-1] = spectrum[-1].real
+        frame = np.fft.irfft(spectrum, n=self.frame_size, axis=0) * self.window
+        output = self._tail + frame[:self.hop]
+        self._tail = frame[self.hop:].copy()
+        return output
+
+    def read(self, n_samples):
+        """
+        读取接下来的 n_samples 个采样
+
+        返回:
+            形如 (n_samples,) 或 (n_samples, channels) 的噪声
+        """
+        needed = n_samples - len(self._ready)
+        if needed > 0:
+            n_hops = -(-needed // self.hop)
+            self._ready = np.concatenate([self._ready] + [self._next_hop() for _ in range(n_hops)])
+        output, self._ready = self._ready[:n_samples], self._ready[n_samples:]
+        return output
+
+    def __iter__(self):
+        while True:
+            yield self._next_hop()
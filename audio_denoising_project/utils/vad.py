@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音/声音活动检测模块
+按短时能量和频谱平坦度把音频分为有声段和静音段，得到可在各处理阶段之间复用的
+段索引：滤波只处理有声段，信噪比和频谱分析只统计有声段
+"""
+
+import hashlib
+
+import numpy as np
+
+# 防止 log(0)
+_EPS = 1e-12
+
+
+class SegmentIndex:
+    """
+    有声段索引
+
+    starts/ends 为各段的起止采样点 (左闭右开, 按时间排序且互不重叠)。
+    索引只依赖检测所用的原始音频，同一索引可用于带噪、滤波后等等长信号。
+    """
+
+    def __init__(self, starts, ends, n_samples, sample_rate):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        if self.starts.shape != self.ends.shape:
+            raise ValueError("起点和终点数量不一致")
+        self.n_samples = int(n_samples)
+        self.sample_rate = sample_rate
+        self._mask = None
+
+    @classmethod
+    def from_mask(cls, mask, sample_rate):
+        """
+        由逐采样点的布尔掩码创建索引
+
+        参数:
+            mask: 布尔数组, True 表示有声
+            sample_rate: 采样率
+        """
+        mask = np.asarray(mask, dtype=bool)
+        starts, ends = _runs(mask)
+        return cls(starts, ends, len(mask), sample_rate)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.ends.tolist())
+
+    @property
+    def active_samples(self):
+        """有声采样点数"""
+        return int(np.sum(self.ends - self.starts))
+
+    @property
+    def active_ratio(self):
+        """有声部分占比"""
+        return self.active_samples / self.n_samples if self.n_samples else 0.0
+
+    @property
+    def mask(self):
+        """逐采样点的布尔掩码 (首次访问时生成)"""
+        if self._mask is None:
+            mask = np.zeros(self.n_samples, dtype=bool)
+            for start, end in self:
+                mask[start:end] = True
+            mask.setflags(write=False)
+            self._mask = mask
+        return self._mask
+
+    @property
+    def key(self):
+        """索引内容的哈希 (用作缓存键的一部分)"""
+        digest = hashlib.sha1(self.starts.tobytes())
+        digest.update(self.ends.tobytes())
+        digest.update(repr((self.n_samples, self.sample_rate)).encode())
+        return digest.hexdigest()
+
+    def _check(self, data):
+        if len(data) != self.n_samples:
+            raise ValueError(f"信号长度 {len(data)} 与段索引长度 {self.n_samples} 不一致")
+
+    def gather(self, data):
+        """
+        取出所有有声段并拼接 (沿第0轴)
+
+        参数:
+            data: 与索引等长的信号
+
+        返回:
+            有声采样点组成的数组; 只有一段时返回视图
+        """
+        self._check(data)
+        if len(self) == 0:
+            return data[:0]
+        if len(self) == 1:
+            return data[self.starts[0]:self.ends[0]]
+        return np.concatenate([data[start:end] for start, end in self])
+
+    def apply(self, func, data, context=0, fill=0.0, out=None):
+        """
+        只对有声段执行处理函数
+
+        每段前后各多取 context 个采样点一起处理, 只保留段内结果,
+        使滤波器在段边界处的瞬态落在保留范围之外。
+
+        参数:
+            func: 处理函数, 输入一段信号, 返回等长结果
+            data: 与索引等长的信号
+            context: 每段两侧附带的上下文采样点数
+            fill: 静音段的输出值; None 表示原样复制输入
+            out: 输出数组, 默认新建
+
+        返回:
+            处理后的信号
+        """
+        self._check(data)
+        if out is None:
+            out = np.empty(data.shape, dtype=np.result_type(data.dtype, np.float64))
+        if fill is None:
+            out[:] = data
+        else:
+            out[:] = fill
+
+        for start, end in self:
+            low = max(0, start - context)
+            high = min(self.n_samples, end + context)
+            out[start:end] = func(data[low:high])[start - low:end - low]
+        return out
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return {
+            'starts': self.starts.tolist(),
+            'ends': self.ends.tolist(),
+            'n_samples': self.n_samples,
+            'sample_rate': self.sample_rate,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict 的结果恢复索引"""
+        return cls(data['starts'], data['ends'], data['n_samples'], data['sample_rate'])
+
+
+def _runs(mask):
+    """布尔掩码中连续 True 区间的起点和终点"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _merge_runs(starts, ends, min_gap):
+    """合并间隔小于 min_gap 的相邻段"""
+    if len(starts) == 0:
+        return starts, ends
+    keep = starts[1:] - ends[:-1] >= max(min_gap, 1)
+    return (np.concatenate((starts[:1], starts[1:][keep])),
+            np.concatenate((ends[:-1][keep], ends[-1:])))
+
+
+def detect_voice_activity(audio_data, sample_rate, frame_duration=0.02, energy_margin_db=12.0,
+                          min_energy_db=-60.0, flatness_threshold=0.3, min_active=0.05,
+                          min_silence=0.2, padding=0.05):
+    """
+    检测有声段
+
+    逐帧 (不重叠) 计算能量: 低于 min_energy_db 的帧为静音, 高于噪声底
+    (能量的第10百分位) energy_margin_db 以上的帧为有声; 介于两者之间的帧
+    只对这部分计算频谱平坦度, 平坦度低 (有音调结构) 的判为有声, 接近白噪声的判为静音。
+    最后去掉过短的有声段, 两侧各扩展 padding, 并合并间隔过短的段。
+
+    参数:
+        audio_data: 音频数据 (多声道取平均)
+        sample_rate: 采样率
+        frame_duration: 帧长 (秒)
+        energy_margin_db: 高于噪声底多少 dB 直接判为有声
+        min_energy_db: 绝对静音门限 (dBFS)
+        flatness_threshold: 频谱平坦度门限 (0~1)
+        min_active: 最短有声段 (秒)
+        min_silence: 最短静音间隔 (秒), 更短的间隔并入两侧有声段
+        padding: 有声段两侧扩展的时长 (秒)
+
+    返回:
+        SegmentIndex对象
+    """
+    mono = audio_data.mean(axis=1) if audio_data.ndim > 1 else np.asarray(audio_data, dtype=np.float64)
+    n_samples = len(mono)
+    frame_length = max(1, int(frame_duration * sample_rate))
+    n_frames = -(-n_samples // frame_length)
+    if n_frames == 0:
+        return SegmentIndex([], [], 0, sample_rate)
+
+    # 不足一帧的结尾补零后单独成帧
+    usable = (n_samples // frame_length) * frame_length
+    frames = mono[:usable].reshape(-1, frame_length)
+    if usable < n_samples:
+        tail = np.zeros((1, frame_length))
+        tail[0, :n_samples - usable] = mono[usable:]
+        frames = np.concatenate((frames, tail))
+
+    energy_db = 10 * np.log10(np.einsum('ij,ij->i', frames, frames) / frame_length + _EPS)
+    noise_floor = np.percentile(energy_db, 10)
+    active = energy_db > max(noise_floor + energy_margin_db, min_energy_db)
+
+    # 只对能量不确定的帧计算频谱平坦度
+    uncertain = np.flatnonzero(~active & (energy_db > min_energy_db))
+    if uncertain.size:
+        window = np.hanning(frame_length)
+        spectrum = np.abs(np.fft.rfft(frames[uncertain] * window, axis=1)) ** 2 + _EPS
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+        active[uncertain] = flatness < flatness_threshold
+
+    # 去掉过短的段, 扩展两侧后合并间隔过短的段
+    starts, ends = _runs(active)
+    frames_per_second = sample_rate / frame_length
+    keep = ends - starts >= max(1, int(round(min_active * frames_per_second)))
+    starts, ends = starts[keep], ends[keep]
+    pad = int(round(padding * frames_per_second))
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, n_frames)
+    starts, ends = _merge_runs(starts, ends, int(round(min_silence * frames_per_second)))
+
+    return SegmentIndex(starts * frame_length, np.minimum(ends * frame_length, n_samples),
+                        n_samples, sample_rate)